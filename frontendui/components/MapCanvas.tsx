@@ -119,6 +119,34 @@ export function MapCanvas({ mapState, onNodeClick, isLoading, fogLevel = 5 }: Ma
           );
         })}
 
+        {/* Collapsed branches in a level-of-detail view */}
+        {mapState.lod?.collapsed.map((branch) => {
+          const position = nodePositions.get(branch.nodeId);
+          if (!position) return null;
+
+          return (
+            <div
+              key={`collapsed-${branch.nodeId}`}
+              title={`${branch.hiddenCount} hidden nodes${branch.conflicts ? `, ${branch.conflicts} in conflict` : ""}`}
+              style={{
+                position: "absolute",
+                left: `${position.pixelX}px`,
+                top: `${position.pixelY - 38}px`,
+                transform: "translateX(-50%)",
+                padding: "1px 6px",
+                borderRadius: "8px",
+                fontSize: "10px",
+                color: branch.conflicts ? "rgba(251, 191, 36, 0.9)" : "rgba(255, 255, 255, 0.6)",
+                backgroundColor: "rgba(20, 20, 30, 0.9)",
+                pointerEvents: "none",
+                zIndex: 150,
+              }}
+            >
+              +{branch.hiddenCount}
+            </div>
+          );
+        })}
+
         {/* Loading indicator for active node */}
         {isLoading && mapState.activeNodeId && (
           <LoadingDots
@@ -18,6 +18,7 @@ export interface Constraint {
   value: string
   answeredAt: string
   timelineIndex: number
+  confidence?: "high" | "medium" | "low" | null // set when extracted from a multi-dimension answer
 }
 
 export interface OracleNode {
@@ -38,10 +39,36 @@ export interface OracleEdge {
   targetId: string
 }
 
+/** Visible region of the canvas on the 0–100 plane */
+export interface Viewport {
+  x0: number
+  y0: number
+  x1: number
+  y1: number
+  maxDepth?: number | null
+}
+
+/** Hidden descendants of a shown node (level-of-detail views) */
+export interface CollapsedBranch {
+  nodeId: string
+  hiddenChildren: number
+  hiddenCount: number
+  conflicts: number
+  categories: Partial<Record<NodeCategory, number>>
+}
+
+export interface MapLod {
+  totalNodes: number
+  totalEdges: number
+  viewport: Viewport
+  collapsed: CollapsedBranch[]
+}
+
 export interface MapState {
   nodes: OracleNode[]
   edges: OracleEdge[]
   activeNodeId: string | null
+  lod?: MapLod // present when a large map was sent as a view; fetch the rest from /sessions/{id}/map
 }
 
 export interface HistoryEntry {
@@ -86,6 +113,7 @@ export interface OracleState {
 
   // Map
   mapState: MapState
+  viewport?: Viewport | null // large maps are sent as a view of this region
 
   // Exploration history + branching
   explorationHistory: HistoryEntry[]
@@ -100,9 +128,11 @@ export interface OracleState {
 
   // Expansion context (set before calling expander)
   expandNodeId: string
+  expandNodeIds?: string[] // batch expand in one generation (multi_expander)
 
-  // CopilotKit message list
+  // CopilotKit message list (recent window) + condensed text of older turns
   messages?: any[]
+  conversationSummary?: string
 }
 
 /** Default empty state used before first backend sync */
@@ -0,0 +1,109 @@
+"""
+Cold tier for idle sessions.
+Sessions idle past a threshold are moved out of Redis into compressed records
+in append-only segment files on local disk. An index maps each session to its
+(segment, offset, length); reads go through mmap so only the record's pages
+are touched.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+
+
+class SessionArchive:
+    """Append-only segment files + JSON index. Thread-safe; call via asyncio.to_thread."""
+
+    def __init__(self, directory: str | Path, segment_max_bytes: int = 64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._maps: dict[int, mmap.mmap] = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_path = self.directory / INDEX_FILE
+        self._index: dict[str, list[int]] = (
+            json.loads(index_path.read_text()) if index_path.exists() else {}
+        )
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"segment-{segment:05d}.seg"
+
+    def _active_segment(self) -> int:
+        segments = sorted(
+            int(p.stem.split("-")[1]) for p in self.directory.glob("segment-*.seg")
+        )
+        if not segments:
+            return 1
+        last = segments[-1]
+        if self._segment_path(last).stat().st_size >= self.segment_max_bytes:
+            return last + 1
+        return last
+
+    def _write_index(self) -> None:
+        tmp = self.directory / f"{INDEX_FILE}.tmp"
+        tmp.write_text(json.dumps(self._index))
+        os.replace(tmp, self.directory / INDEX_FILE)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def put_many(self, records: dict[str, dict]) -> None:
+        """Append one compressed record per session and publish them in the index."""
+        if not records:
+            return
+        with self._lock:
+            segment = self._active_segment()
+            path = self._segment_path(segment)
+            with open(path, "ab") as f:
+                for session_id, record in records.items():
+                    blob = zlib.compress(json.dumps(record).encode(), 6)
+                    offset = f.tell()
+                    f.write(blob)
+                    self._index[session_id] = [segment, offset, len(blob)]
+                f.flush()
+                os.fsync(f.fileno())
+            # The segment grew — drop its stale mapping
+            stale = self._maps.pop(segment, None)
+            if stale is not None:
+                stale.close()
+            self._write_index()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._index.get(session_id)
+            if entry is None:
+                return None
+            segment, offset, length = entry
+            view = self._maps.get(segment)
+            if view is None:
+                with open(self._segment_path(segment), "rb") as f:
+                    view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = view
+            blob = view[offset:offset + length]
+        return json.loads(zlib.decompress(blob))
+
+    def remove(self, session_id: str) -> None:
+        """Drop a session from the index. Its bytes stay in the segment until compaction."""
+        with self._lock:
+            if self._index.pop(session_id, None) is not None:
+                self._write_index()
+
+    def close(self) -> None:
+        with self._lock:
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
@@ -0,0 +1,107 @@
+"""
+Copy-on-write branch storage.
+Map nodes are interned once in a content-addressed `nodePool`; branches keep
+node keys for their fork point plus only the nodes they changed, so forking
+no longer copies whole maps into every branch and checkpoint. The pool lives
+in the checkpoint only: state snapshots sent to the frontend leave it out,
+and a branch's full map is served on demand (agent/map_api.py).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Optional
+
+
+def node_key(node: dict) -> str:
+    """Content hash of a node — identical nodes share one pool entry."""
+    canonical = json.dumps(node, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
+def intern_nodes(pool: dict, nodes: list[dict]) -> tuple[dict, list[str]]:
+    """
+    Add nodes to the pool. Returns (pool, keys).
+    The pool is only copied (shallowly) when a new node is actually added,
+    so callers can tell from identity whether a state update is needed.
+    """
+    keys: list[str] = []
+    new_pool = pool
+    for node in nodes:
+        key = node_key(node)
+        if key not in new_pool:
+            if new_pool is pool:
+                new_pool = dict(pool)
+            new_pool[key] = node
+        keys.append(key)
+    return new_pool, keys
+
+
+def resolve_nodes(pool: dict, keys: list[str]) -> list[dict]:
+    return [pool[k] for k in keys if k in pool]
+
+
+def edges_for(nodes: list[dict]) -> list[dict]:
+    """Edges are derived from parentId links — every map edge runs parent → child."""
+    ids = {n["id"] for n in nodes}
+    return [
+        {"sourceId": n["parentId"], "targetId": n["id"]}
+        for n in nodes
+        if n.get("parentId") in ids
+    ]
+
+
+def diff_map(pool: dict, base_keys: list[str], nodes: list[dict]) -> tuple[dict, dict]:
+    """
+    Record `nodes` as a divergence from the map at `base_keys`.
+    Returns (pool, delta) where delta = {"addedRefs", "removedIds"}: keys of
+    new/changed nodes, and ids of base nodes the new map no longer has.
+    """
+    pool, keys = intern_nodes(pool, nodes)
+    base = set(base_keys)
+    added = [k for k in keys if k not in base]
+    current_ids = {n["id"] for n in nodes}
+    added_ids = {pool[k]["id"] for k in added}
+    removed = [
+        pool[k]["id"] for k in base_keys
+        if k in pool and (pool[k]["id"] not in current_ids or pool[k]["id"] in added_ids)
+    ]
+    return pool, {"addedRefs": added, "removedIds": removed}
+
+
+def collect_pool(pool: dict, branches: list[dict]) -> dict:
+    """Drop pool entries no branch references any more (e.g. a regenerated branch's old nodes)."""
+    live = set()
+    for branch in branches:
+        live.update(branch.get("baseRefs", []))
+        live.update(branch.get("addedRefs", []))
+    if live.issuperset(pool):
+        return pool
+    return {k: v for k, v in pool.items() if k in live}
+
+
+def without_pool(state: dict) -> dict:
+    """`state` minus the node pool, for snapshots sent to the frontend."""
+    if "nodePool" not in state:
+        return state
+    return {k: v for k, v in state.items() if k != "nodePool"}
+
+
+def materialize_branch_map(state: dict, branch_id: str) -> Optional[dict]:
+    """
+    Rebuild a branch's full map (nodes, edges) from its fork point and delta.
+    Falls back to the branch's stored mapSnapshot for branches written
+    before nodes were pooled. None if there is no such branch.
+    """
+    pool = state.get("nodePool") or {}
+    for branch in state.get("branches") or []:
+        if branch["branchId"] != branch_id:
+            continue
+        if not branch.get("baseRefs") and not branch.get("addedRefs"):
+            return branch.get("mapSnapshot") or {}
+        removed = set(branch.get("removedIds", []))
+        nodes = [n for n in resolve_nodes(pool, branch.get("baseRefs", [])) if n["id"] not in removed]
+        nodes += resolve_nodes(pool, branch.get("addedRefs", []))
+        return {"nodes": nodes, "edges": edges_for(nodes), "activeNodeId": None}
+    return None
@@ -16,7 +16,7 @@ from config import REDIS_URL
 from agent.state import OracleState
 from agent.nodes.interrogator import interrogator
 from agent.nodes.map_generator import map_generator
-from agent.nodes.expander import expander
+from agent.nodes.expander import expander, multi_expander
 from agent.nodes.fork_regenerator import fork_regenerator
 
 logger = logging.getLogger(__name__)
@@ -48,6 +48,8 @@ def route_entry(state: dict) -> str:
     elif phase == "exploration":
         if state.get("forkIndex", -1) >= 0 and state.get("forkNewAnswer"):
             return "fork_regenerator"
+        if state.get("expandNodeIds"):
+            return "multi_expander"
         if state.get("expandNodeId") or state.get("mapState", {}).get("activeNodeId"):
             return "expander"
         return END
@@ -68,6 +70,7 @@ def build_graph():
     graph.add_node("interrogator", interrogator)
     graph.add_node("map_generator", map_generator)
     graph.add_node("expander", expander)
+    graph.add_node("multi_expander", multi_expander)
     graph.add_node("fork_regenerator", fork_regenerator)
 
     # Entry: route to the appropriate node based on current phase
@@ -88,6 +91,7 @@ def build_graph():
 
     # After expander: stop (wait for next click)
     graph.add_edge("expander", END)
+    graph.add_edge("multi_expander", END)
 
     # After fork_regenerator: stop (show new branch)
     graph.add_edge("fork_regenerator", END)
@@ -0,0 +1,264 @@
+"""
+Per-session serializer for graph runs.
+Runs on one thread execute one at a time, in arrival order, instead of
+racing on the checkpoint:
+
+- A node click arriving while another run is in flight waits. Clicks that
+  pile up meanwhile are merged into one multi-node expansion (expandNodeIds)
+  — one checkpoint read and one write instead of one per click. The merged
+  requests finish when that run does. If it fails they fail with it; if it
+  is cancelled before finishing (its client went away), they queue again.
+- Any other action (an answer, a fork) supersedes the run in flight and
+  everything queued: their tasks are cancelled, the cancellation unwinds
+  through LangGraph into the node's Claude call and closes its HTTP request.
+  LangGraph commits a step's writes only once the step has finished, so
+  whatever a cancelled step was computing never reaches the checkpoint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from typing import Any, AsyncIterator, Callable, Optional
+
+from config import CANCEL_SUPERSEDED_RUNS
+
+logger = logging.getLogger(__name__)
+
+
+class Superseded(Exception):
+    """Raised from stream() when a newer action cancelled this run."""
+
+
+class Merged(Exception):
+    """Raised from stream() once the run this click was merged into has finished."""
+
+
+class MergedRunFailed(Exception):
+    """Raised from stream() when the run this click was merged into raised an error."""
+
+
+# How a run's task ended
+_DONE = "done"
+_FAILED = "failed"
+_CANCELLED = "cancelled"
+
+
+class _Run:
+    __slots__ = ("input", "targets", "task", "superseded", "queued", "merged_into", "turn", "finished", "outcome")
+
+    def __init__(self, input: Any, targets: Optional[list[str]]):
+        self.input = input
+        self.targets = targets  # node ids for a click, None for any other action
+        self.task: Optional[asyncio.Task] = None
+        self.superseded = False
+        self.queued = False  # waited behind another run, so the client's map is stale
+        self.merged_into: Optional[_Run] = None
+        self.turn = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.outcome = _CANCELLED  # until its task finishes
+
+
+class _Session:
+    __slots__ = ("running", "waiting")
+
+    def __init__(self):
+        self.running: Optional[_Run] = None
+        self.waiting: list[_Run] = []
+
+
+# The run the current task belongs to; node tasks and hedged requests inherit it
+_current: contextvars.ContextVar[Optional[_Run]] = contextvars.ContextVar("oracle_run", default=None)
+
+# session key → its running and waiting runs
+_sessions: dict[str, _Session] = {}
+
+inflight_stats = {"runs": 0, "superseded": 0, "merged": 0, "llm_calls_cancelled": 0, "seconds_saved": 0.0}
+
+
+def click_targets(state: Optional[dict]) -> Optional[list[str]]:
+    """The node ids a run would expand (mirrors graph.route_entry), or None if it isn't a click."""
+    if not state or state.get("phase") != "exploration":
+        return None
+    if state.get("forkIndex", -1) >= 0 and state.get("forkNewAnswer"):
+        return None
+    ids = state.get("expandNodeIds") or [
+        state.get("expandNodeId") or (state.get("mapState") or {}).get("activeNodeId")
+    ]
+    ids = [i for i in ids if i]
+    return ids or None
+
+
+def superseded() -> bool:
+    """True inside a run that a newer action has cancelled."""
+    run = _current.get()
+    return run is not None and run.superseded
+
+
+def queued() -> bool:
+    """True inside a run that waited behind another one on its session."""
+    run = _current.get()
+    return run is not None and run.queued
+
+
+def record_cancelled_call(elapsed: float, typical: Optional[float]) -> None:
+    """Count a Claude request closed by supersession; `typical` is the node's median latency."""
+    inflight_stats["llm_calls_cancelled"] += 1
+    if typical is not None:
+        inflight_stats["seconds_saved"] += max(0.0, typical - elapsed)
+
+
+def _supersede(session_key: str, session: _Session) -> None:
+    for run in session.waiting:
+        run.superseded = True
+        run.turn.set()
+    inflight_stats["superseded"] += len(session.waiting)
+    session.waiting.clear()
+    running = session.running
+    if running is not None and not running.superseded:
+        running.superseded = True
+        inflight_stats["superseded"] += 1
+        if running.task is not None:
+            logger.info("Cancelling superseded run on %s", session_key)
+            running.task.cancel()
+
+
+def _merge_clicks(batch: list[_Run]) -> _Run:
+    """Fold queued clicks into the newest one, which expands all their nodes."""
+    leader = batch[-1]
+    targets: list[str] = []
+    for run in batch:
+        targets.extend(t for t in run.targets if t not in targets)
+    for run in batch[:-1]:
+        run.merged_into = leader
+        run.turn.set()
+    inflight_stats["merged"] += len(batch) - 1
+    leader.targets = targets
+    leader.input.state["expandNodeIds"] = targets
+    return leader
+
+
+def _advance(session_key: str, session: _Session) -> None:
+    """Start the next waiting run if nothing is running."""
+    if session.running is not None:
+        return
+    if not session.waiting:
+        _sessions.pop(session_key, None)
+        return
+    run = session.waiting.pop(0)
+    if run.targets is not None:
+        batch = [run]
+        while session.waiting and session.waiting[0].targets is not None:
+            batch.append(session.waiting.pop(0))
+        if len(batch) > 1:
+            run = _merge_clicks(batch)
+    session.running = run
+    run.turn.set()
+
+
+def _finish(session_key: str, session: _Session, run: _Run) -> None:
+    run.finished.set()
+    if session.running is run:
+        session.running = None
+        _advance(session_key, session)
+
+
+async def stream(
+    session_key: str, input: Any, start: Callable[[Any], AsyncIterator]
+) -> AsyncIterator:
+    """
+    Run `start(input)` (a run's event stream) when it is this run's turn on
+    the session, yielding its events. Raises Superseded if a newer action
+    cancelled it, Merged if it was folded into another click's run. Closing
+    this iterator early (the client went away) cancels the run.
+    """
+    session = _sessions.setdefault(session_key, _Session())
+    run = _Run(input, click_targets(input.state))
+    inflight_stats["runs"] += 1
+    running = session.running
+    if run.targets is None:
+        if CANCEL_SUPERSEDED_RUNS:
+            _supersede(session_key, session)
+    elif (
+        running is not None and running.targets is not None and not running.superseded
+        and not session.waiting and set(run.targets) <= set(running.targets)
+    ):
+        # Clicked again on a node that is being expanded right now
+        run.merged_into = running
+        inflight_stats["merged"] += 1
+        run.turn.set()
+    if run.merged_into is None:
+        run.queued = session.running is not None or bool(session.waiting)
+        session.waiting.append(run)
+        _advance(session_key, session)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump() -> None:
+        async for event in start(run.input):
+            queue.put_nowait(event)
+
+    def on_done(task: asyncio.Task) -> None:
+        if not task.cancelled():
+            run.outcome = _FAILED if task.exception() is not None else _DONE
+        queue.put_nowait(done)
+        _finish(session_key, session, run)
+
+    try:
+        await run.turn.wait()
+        while run.merged_into is not None:
+            leader = run.merged_into
+            await leader.finished.wait()
+            if leader.superseded or run.superseded:
+                raise Superseded(session_key)
+            if leader.outcome == _DONE:
+                raise Merged(session_key)
+            if leader.outcome == _FAILED:
+                raise MergedRunFailed(session_key)
+            # The run was cancelled before expanding this click — queue it again
+            session = _sessions.setdefault(session_key, _Session())
+            run.merged_into = None
+            run.queued = True
+            # The cancelled run's expandNodeIds may have reached the checkpoint; don't inherit them
+            run.input.state["expandNodeIds"] = run.targets if len(run.targets) > 1 else []
+            run.turn.clear()
+            session.waiting.append(run)
+            _advance(session_key, session)
+            await run.turn.wait()
+        if run.superseded:
+            raise Superseded(session_key)
+
+        context = contextvars.copy_context()
+        context.run(_current.set, run)
+        run.task = asyncio.get_running_loop().create_task(pump(), context=context)
+        # Runs even if the task is cancelled before it starts
+        run.task.add_done_callback(on_done)
+        while (event := await queue.get()) is not done:
+            yield event
+        if run.superseded:
+            raise Superseded(session_key)
+        run.task.result()
+    finally:
+        if run.task is not None:
+            if not run.task.done():
+                run.task.cancel()
+        elif run in session.waiting:
+            session.waiting.remove(run)
+            _advance(session_key, session)
+        elif session.running is run:
+            _finish(session_key, session, run)  # given its turn but never started
+
+
+def report() -> dict:
+    """Serializer summary for /metrics."""
+    return {
+        "sessions": len(_sessions),
+        "queued": sum(len(s.waiting) for s in _sessions.values()),
+        "runs": inflight_stats["runs"],
+        "superseded": inflight_stats["superseded"],
+        "merged": inflight_stats["merged"],
+        "llmCallsCancelled": inflight_stats["llm_calls_cancelled"],
+        "llmSecondsSaved": round(inflight_stats["seconds_saved"], 2),
+    }
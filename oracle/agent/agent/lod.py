@@ -0,0 +1,186 @@
+"""
+Level-of-detail views of large maps.
+Once a map has more than MAP_LOD_MIN_NODES nodes, state snapshots sent to the
+frontend carry a view instead of the whole map. The view holds the nodes
+inside the client's viewport down to a depth limit, plus the roots and the
+active node's ancestry. Each shown node with hidden descendants gets a
+collapsed aggregate (count, categories, conflicts) for a "+N" marker, and
+hidden branches are fetched on demand (agent/map_api.py). The checkpoint
+always keeps the full map; views are cut only at the AG-UI edge.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Optional
+
+from config import MAP_LOD_ENABLED, MAP_LOD_MAX_DEPTH, MAP_LOD_MAX_NODES, MAP_LOD_MIN_NODES
+from agent.spatial import GridIndex
+
+FULL_VIEWPORT = {"x0": 0.0, "y0": 0.0, "x1": 100.0, "y1": 100.0}
+
+
+def as_dict(value: Any) -> Optional[dict]:
+    if value is None or isinstance(value, dict):
+        return value
+    return value.model_dump()
+
+
+class _Tree:
+    def __init__(self, nodes: list[dict]):
+        self.by_id = {n["id"]: n for n in nodes}
+        self.children: dict[str, list[str]] = {}
+        self.roots: list[str] = []
+        for n in nodes:
+            parent = n.get("parentId")
+            if parent in self.by_id and parent != n["id"]:
+                self.children.setdefault(parent, []).append(n["id"])
+            else:
+                self.roots.append(n["id"])
+
+    def show(self, node_id: str, shown: set[str]) -> None:
+        """Add a node and its ancestors, so every shown node stays connected."""
+        while node_id in self.by_id and node_id not in shown:
+            shown.add(node_id)
+            node_id = self.by_id[node_id].get("parentId")
+
+    def collapsed(self, shown: set[str]) -> list[dict]:
+        """One aggregate per shown node whose children are (partly) hidden."""
+        out = []
+        for node_id in self.by_id:
+            if node_id not in shown:
+                continue
+            hidden = [c for c in self.children.get(node_id, ()) if c not in shown]
+            if not hidden:
+                continue
+            # Hidden subtrees are disjoint, so this walks each hidden node once
+            count = conflicts = 0
+            categories: Counter[str] = Counter()
+            stack = list(hidden)
+            while stack:
+                node = self.by_id[stack.pop()]
+                count += 1
+                conflicts += bool(node.get("conflictFlag"))
+                if node.get("category"):
+                    categories[node["category"]] += 1
+                stack.extend(self.children.get(node["id"], ()))
+            out.append({
+                "nodeId": node_id,
+                "hiddenChildren": len(hidden),
+                "hiddenCount": count,
+                "conflicts": conflicts,
+                "categories": dict(categories),
+            })
+        return out
+
+
+def _cut(map_state: dict, tree: _Tree, shown: set[str]) -> tuple[list[dict], list[dict]]:
+    nodes = [n for n in map_state.get("nodes") or [] if n["id"] in shown]
+    edges = [
+        e for e in map_state.get("edges") or []
+        if e["sourceId"] in shown and e["targetId"] in shown
+    ]
+    return nodes, edges
+
+
+def build_view(
+    map_state: dict,
+    viewport: Optional[dict] = None,
+    max_depth: int = MAP_LOD_MAX_DEPTH,
+    max_nodes: int = MAP_LOD_MAX_NODES,
+    index: Optional[GridIndex] = None,
+) -> dict:
+    """
+    The part of the map worth sending for `viewport` ({x0, y0, x1, y1} on the
+    0–100 plane, optional maxDepth). Returns a mapState-shaped dict with an
+    extra "lod" entry: totals, the viewport used and collapsed aggregates.
+    With a spatial `index` synced to the map, the viewport is a range query.
+    """
+    tree = _Tree(map_state.get("nodes") or [])
+    vp = {**FULL_VIEWPORT, **{k: v for k, v in (viewport or {}).items() if v is not None}}
+    depth_limit = int(vp.pop("maxDepth", max_depth))
+    cx, cy = (vp["x0"] + vp["x1"]) / 2, (vp["y0"] + vp["y1"]) / 2
+
+    if index is not None:
+        in_viewport = [tree.by_id[i] for i in index.range(vp["x0"], vp["y0"], vp["x1"], vp["y1"]) if i in tree.by_id]
+    else:
+        in_viewport = [
+            n for n in tree.by_id.values()
+            if vp["x0"] <= n.get("x", 50.0) <= vp["x1"] and vp["y0"] <= n.get("y", 50.0) <= vp["y1"]
+        ]
+    candidates = [n for n in in_viewport if n.get("depth", 0) <= depth_limit]
+    # Shallow nodes first, nearest the viewport centre within a depth, so an
+    # over-budget view keeps the top of the tree
+    candidates.sort(key=lambda n: (n.get("depth", 0), (n.get("x", 50.0) - cx) ** 2 + (n.get("y", 50.0) - cy) ** 2))
+
+    shown: set[str] = set()
+    for node_id in tree.roots:
+        tree.show(node_id, shown)
+    if map_state.get("activeNodeId"):
+        tree.show(map_state["activeNodeId"], shown)
+    for node in candidates:
+        if len(shown) >= max_nodes:
+            break
+        tree.show(node["id"], shown)
+
+    nodes, edges = _cut(map_state, tree, shown)
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "activeNodeId": map_state.get("activeNodeId"),
+        "lod": {
+            "totalNodes": len(tree.by_id),
+            "totalEdges": len(map_state.get("edges") or []),
+            "viewport": {**vp, "maxDepth": depth_limit},
+            "collapsed": tree.collapsed(shown),
+        },
+    }
+
+
+def subtree(map_state: dict, node_id: str, depth: Optional[int] = None, max_nodes: int = MAP_LOD_MAX_NODES) -> Optional[dict]:
+    """
+    `node_id` and its descendants down to `depth` levels below it (all levels
+    when None), breadth-first up to `max_nodes`. None if the node is unknown.
+    """
+    tree = _Tree(map_state.get("nodes") or [])
+    if node_id not in tree.by_id:
+        return None
+    shown = {node_id}
+    level = [node_id]
+    remaining = depth
+    while level and (remaining is None or remaining > 0) and len(shown) < max_nodes:
+        next_level = []
+        for parent in level:
+            for child in tree.children.get(parent, ()):
+                if len(shown) >= max_nodes:
+                    break
+                shown.add(child)
+                next_level.append(child)
+        level = next_level
+        remaining = None if remaining is None else remaining - 1
+
+    nodes, edges = _cut(map_state, tree, shown)
+    return {"nodeId": node_id, "nodes": nodes, "edges": edges, "collapsed": tree.collapsed(shown)}
+
+
+def view_state(state: dict) -> dict:
+    """`state` as sent to the frontend: mapState is replaced by a view once the map is large."""
+    map_state = as_dict(state.get("mapState"))
+    if not MAP_LOD_ENABLED or not map_state or len(map_state.get("nodes") or []) <= MAP_LOD_MIN_NODES:
+        return state
+    return {**state, "mapState": build_view(map_state, as_dict(state.get("viewport")))}
+
+
+def restore_map_state(incoming: Any, full: Any, stale: bool = False) -> Any:
+    """
+    The mapState to run the graph on. A client that was sent a view sends it
+    back; the full map comes from the checkpoint, with the client's activeNodeId.
+    `stale` does the same for a whole map the checkpoint has moved past.
+    """
+    incoming = as_dict(incoming)
+    full = as_dict(full)
+    if not incoming or ("lod" not in incoming and not stale):
+        return incoming
+    if not full:
+        return {k: v for k, v in incoming.items() if k != "lod"}
+    return {**full, "activeNodeId": incoming.get("activeNodeId")}
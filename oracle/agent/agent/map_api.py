@@ -0,0 +1,78 @@
+"""
+Map view HTTP API.
+Companion to the level-of-detail snapshots (agent/lod.py): the canvas fetches
+a view for a new viewport, a collapsed node's subtree, or a fork branch's map
+(rebuilt from the node pool, agent/branch_store.py) without a graph run.
+`session_id` is the AG-UI thread id; maps are read from the graph checkpoint.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from config import MAP_LOD_MAX_DEPTH, MAP_LOD_MAX_NODES
+from agent import branch_store, lod, spatial
+from agent.graph import oracle_graph
+
+router = APIRouter(prefix="/sessions/{session_id}/map", tags=["map"])
+
+MAX_NODES_LIMIT = 5000  # per request
+
+
+async def _load_values(session_id: str) -> dict:
+    snapshot = await oracle_graph.aget_state({"configurable": {"thread_id": session_id}})
+    return snapshot.values or {}
+
+
+async def _load_map(session_id: str) -> dict:
+    map_state = lod.as_dict((await _load_values(session_id)).get("mapState"))
+    if not map_state or not map_state.get("nodes"):
+        raise HTTPException(status_code=404, detail="No map for this session")
+    return map_state
+
+
+@router.get("/view")
+async def get_view(
+    session_id: str,
+    x0: float = Query(0.0),
+    y0: float = Query(0.0),
+    x1: float = Query(100.0),
+    y1: float = Query(100.0),
+    depth: int = Query(MAP_LOD_MAX_DEPTH, ge=0),
+    limit: int = Query(MAP_LOD_MAX_NODES, ge=1, le=MAX_NODES_LIMIT),
+) -> dict:
+    """The nodes to draw for a viewport, with collapsed aggregates for what is left out."""
+    map_state = await _load_map(session_id)
+    index = spatial.index_for(session_id, map_state["nodes"])
+    return lod.build_view(map_state, {"x0": x0, "y0": y0, "x1": x1, "y1": y1}, depth, limit, index)
+
+
+@router.get("/subtree/{node_id}")
+async def get_subtree(
+    session_id: str,
+    node_id: str,
+    depth: Optional[int] = Query(None, ge=1),
+    limit: int = Query(MAP_LOD_MAX_NODES, ge=1, le=MAX_NODES_LIMIT),
+) -> dict:
+    """A node's descendants (`depth` levels, default all) for expanding a collapsed branch."""
+    map_state = await _load_map(session_id)
+    result = lod.subtree(map_state, node_id, depth, limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return result
+
+
+@router.get("/branches/{branch_id}")
+async def get_branch_map(session_id: str, branch_id: str) -> dict:
+    """A fork branch's full map. Snapshots don't carry branch maps or the node pool they are built from."""
+    values = await _load_values(session_id)
+    state = {
+        "branches": [lod.as_dict(b) for b in values.get("branches") or []],
+        "nodePool": {k: lod.as_dict(n) for k, n in (values.get("nodePool") or {}).items()},
+    }
+    map_state = branch_store.materialize_branch_map(state, branch_id)
+    if map_state is None:
+        raise HTTPException(status_code=404, detail="Branch not found")
+    return map_state
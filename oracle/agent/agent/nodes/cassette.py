@@ -0,0 +1,218 @@
+"""
+Record/replay cassettes for Claude calls.
+Record mode passes every call through to Claude and appends the response,
+token usage and measured latency to a JSONL cassette, keyed by a hash of the
+prompt. Replay mode serves those responses back — streamed in chunks when
+the caller streams — after the recorded latency (optionally scaled), with no
+API calls. Full graph flows then run offline and deterministically, so
+latency and throughput regressions in our own code show up in a benchmark.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from config import LLM_CASSETTE_LATENCY_SCALE, LLM_CASSETTE_MODE, LLM_CASSETTE_PATH, MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+_MAX_REPLAY_CHUNKS = 40
+
+
+class CassetteMiss(LookupError):
+    """Replay asked for a prompt the cassette has no recording of."""
+
+
+def prompt_key(messages: list, tool: str | None) -> str:
+    payload = json.dumps([MODEL_NAME, tool, [[m.type, m.content] for m in messages]])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str | Path, mode: str, latency_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"cassette mode must be 'record' or 'replay', got {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._records: dict[str, list[dict]] = {}
+        self._cursor: dict[str, int] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "llm_seconds": 0.0}
+        if mode == "replay":
+            for line in self.path.read_text().splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    self._records.setdefault(record["key"], []).append(record)
+            logger.info("Replaying %d recorded calls from %s", sum(map(len, self._records.values())), self.path)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def wrap(self, llm, node: str, tool: str | None) -> "CassetteLLM":
+        """`llm` is the real model when recording; it is unused (may be None) when replaying."""
+        return CassetteLLM(self, llm, node, tool)
+
+    def _append(self, record: dict) -> None:
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self.stats["recorded"] += 1
+
+    def _next(self, key: str, node: str) -> dict:
+        records = self._records.get(key)
+        if not records:
+            raise CassetteMiss(f"no recording for {node} prompt {key[:12]} in {self.path}")
+        # Repeated prompts replay in recorded order; the last one repeats
+        i = self._cursor.get(key, 0)
+        self._cursor[key] = i + 1
+        self.stats["replayed"] += 1
+        return records[min(i, len(records) - 1)]
+
+
+def _response_fields(message) -> dict:
+    return {
+        "content": message.content if message is not None else "",
+        "tool_calls": [
+            {"name": tc["name"], "args": tc["args"], "id": tc.get("id")}
+            for tc in getattr(message, "tool_calls", None) or []
+        ],
+        "usage": dict(getattr(message, "usage_metadata", None) or {}),
+    }
+
+
+def _streamed_text(chunk) -> str:
+    if chunk.tool_call_chunks:
+        return "".join(tc.get("args") or "" for tc in chunk.tool_call_chunks)
+    return chunk.content if isinstance(chunk.content, str) else ""
+
+
+class CassetteLLM:
+    """Stands in for the (structured) ChatAnthropic runnable: ainvoke and astream only."""
+
+    def __init__(self, cassette: Cassette, llm, node: str, tool: str | None):
+        self._cassette = cassette
+        self._llm = llm
+        self.node = node
+        self.tool = tool
+
+    async def ainvoke(self, messages: list) -> AIMessage:
+        key = prompt_key(messages, self.tool)
+        if self._cassette.replaying:
+            record = self._cassette._next(key, self.node)
+            await self._sleep(record["latency"])
+            return AIMessage(
+                content=record["content"],
+                tool_calls=record["tool_calls"],
+                usage_metadata=record["usage"] or None,
+            )
+        start = time.monotonic()
+        response = await self._llm.ainvoke(messages)
+        latency = time.monotonic() - start
+        self._cassette._append({
+            "key": key, "node": self.node, "latency": latency, "ttft": latency,
+            "chunks": 1, "complete": True, **_response_fields(response),
+        })
+        return response
+
+    async def astream(self, messages: list) -> AsyncIterator[AIMessageChunk]:
+        key = prompt_key(messages, self.tool)
+        if self._cassette.replaying:
+            async for chunk in self._replay_stream(self._cassette._next(key, self.node)):
+                yield chunk
+            return
+
+        start = time.monotonic()
+        ttft = None
+        message = None
+        chunks = 0
+        text: list[str] = []
+        complete = False
+        try:
+            async for chunk in self._llm.astream(messages):
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                chunks += 1
+                message = chunk if message is None else message + chunk
+                text.append(_streamed_text(chunk))
+                yield chunk
+            complete = True
+        finally:
+            # Aborted streams are recorded too (with the text streamed so far),
+            # so replay aborts at the same point
+            latency = time.monotonic() - start
+            self._cassette._append({
+                "key": key, "node": self.node, "latency": latency, "ttft": ttft or latency,
+                "chunks": chunks, "complete": complete, "text": "".join(text),
+                **_response_fields(message),
+            })
+
+    async def _replay_stream(self, record: dict) -> AsyncIterator[AIMessageChunk]:
+        call = record["tool_calls"][0] if record["tool_calls"] else None
+        if "text" in record:
+            text = record["text"]
+        elif call is not None:
+            text = json.dumps(call["args"])
+        else:
+            text = record["content"] if isinstance(record["content"], str) else ""
+        n = max(1, min(record.get("chunks") or 1, _MAX_REPLAY_CHUNKS, len(text) or 1))
+        size = -(-len(text) // n) if text else 0
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] if size else [""]
+        ttft = record.get("ttft") or record["latency"]
+        gap = max(0.0, record["latency"] - ttft) / max(1, len(pieces) - 1)
+
+        await self._sleep(ttft)
+        for i, piece in enumerate(pieces):
+            if i:
+                await self._sleep(gap)
+            last = i == len(pieces) - 1
+            usage = (record["usage"] or None) if last else None
+            if call is not None:
+                yield AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{
+                        "name": call["name"] if i == 0 else None,
+                        "args": piece,
+                        "id": call.get("id") if i == 0 else None,
+                        "index": 0,
+                    }],
+                    usage_metadata=usage,
+                )
+            else:
+                yield AIMessageChunk(content=piece, usage_metadata=usage)
+
+    async def _sleep(self, seconds: float) -> None:
+        scaled = seconds * self._cassette.latency_scale
+        self._cassette.stats["llm_seconds"] += scaled
+        if scaled > 0:
+            await asyncio.sleep(scaled)
+
+
+_cassette: Optional[Cassette] = None
+
+
+def use_cassette(path: str | Path, mode: str, latency_scale: float = 1.0) -> Cassette:
+    """Switch the process to recording/replaying `path` (overrides LLM_CASSETTE_* config)."""
+    global _cassette
+    _cassette = Cassette(path, mode, latency_scale)
+    return _cassette
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The active cassette, or None when cassettes are off."""
+    global _cassette
+    if _cassette is None and LLM_CASSETTE_MODE:
+        _cassette = Cassette(LLM_CASSETTE_PATH, LLM_CASSETTE_MODE, LLM_CASSETTE_LATENCY_SCALE)
+    return _cassette
@@ -6,18 +6,26 @@ from __future__ import annotations
 
 import json
 import logging
+from functools import partial
 from pathlib import Path
 
 from langchain_core.runnables import RunnableConfig
 
+from config import DEDUP_ENABLED, NODE_MIN_DISTANCE
+from agent.schemas import ExpanderResponse, MultiExpanderResponse
+from agent import spatial
+from agent.similarity import dedupe_nodes, index_for
 from agent.state import OracleState
-from agent.validation import validate_expander_response
+from agent.stream_validation import expander_stream_validator
+from agent.validation import validate_expander_response, validate_multi_expander_response
 from agent.nodes.llm_caller import call_claude_json
 
 logger = logging.getLogger(__name__)
 
 PROMPT_PATH = Path(__file__).parent.parent / "prompts" / "expander.md"
+MULTI_PROMPT_PATH = Path(__file__).parent.parent / "prompts" / "multi_expander.md"
 _system_prompt: str | None = None
+_multi_system_prompt: str | None = None
 
 
 def _get_system_prompt() -> str:
@@ -27,6 +35,13 @@ def _get_system_prompt() -> str:
     return _system_prompt
 
 
+def _get_multi_system_prompt() -> str:
+    global _multi_system_prompt
+    if _multi_system_prompt is None:
+        _multi_system_prompt = MULTI_PROMPT_PATH.read_text()
+    return _multi_system_prompt
+
+
 def _get_parent_chain(nodes: list[dict], node_id: str) -> list[str]:
     """Walk up the parent chain and return labels from root to node."""
     by_id = {n["id"]: n for n in nodes}
@@ -40,6 +55,68 @@ def _get_parent_chain(nodes: list[dict], node_id: str) -> list[str]:
     return chain
 
 
+def _rename_colliding_ids(nodes: list[dict], parent_id: str, child_nodes: list[dict]) -> None:
+    """Prefix child ids that collide with an existing node or an earlier sibling."""
+    existing_ids = {n["id"] for n in nodes}
+    for child in child_nodes:
+        if child["id"] in existing_ids:
+            base_id = f"{parent_id}_{child['id']}"
+            child["id"] = base_id
+            suffix = 2
+            while child["id"] in existing_ids:
+                child["id"] = f"{base_id}_{suffix}"
+                suffix += 1
+        existing_ids.add(child["id"])
+
+
+def _merge_children(
+    nodes: list[dict],
+    edges: list[dict],
+    parent_id: str,
+    child_nodes: list[dict],
+) -> tuple[list[dict], list[dict]]:
+    """Attach child nodes under parent_id, renaming colliding ids. Returns (nodes, edges)."""
+    _rename_colliding_ids(nodes, parent_id, child_nodes)
+    for child in child_nodes:
+        # Ensure parentId is set
+        child["parentId"] = parent_id
+
+    # Edges always run parent → child, matching potentially renamed IDs
+    final_edges = [{"sourceId": parent_id, "targetId": c["id"]} for c in child_nodes]
+
+    return nodes + child_nodes, edges + final_edges
+
+
+def _session_key(state: dict, config: RunnableConfig) -> str:
+    return (config or {}).get("configurable", {}).get("thread_id") or state.get("sessionId", "")
+
+
+def _drop_duplicate_children(
+    state: dict, config: RunnableConfig, nodes: list[dict], parent_id: str, child_nodes: list[dict]
+) -> list[dict]:
+    """Drop children whose label near-duplicates an existing node or an earlier sibling."""
+    if not DEDUP_ENABLED or not child_nodes:
+        return child_nodes
+    # The label index is keyed by id — a child reusing an existing id would replace that node's entry
+    _rename_colliding_ids(nodes, parent_id, child_nodes)
+    kept, merged = dedupe_nodes(child_nodes, index_for(_session_key(state, config), nodes))
+    if merged:
+        logger.info("Dropped %d near-duplicate children: %s", len(merged), merged)
+    return kept
+
+
+def _place_children(
+    state: dict, config: RunnableConfig, nodes: list[dict], parent: dict, child_nodes: list[dict]
+) -> None:
+    """Fan children that would overlap an existing node (or a sibling) out to free spots."""
+    if NODE_MIN_DISTANCE <= 0 or not child_nodes:
+        return
+    index = spatial.index_for(_session_key(state, config), nodes)
+    moved = spatial.place_children(index, parent, child_nodes, NODE_MIN_DISTANCE)
+    if moved:
+        logger.info("Moved %d overlapping children of '%s'", moved, parent["id"])
+
+
 async def expander(state: OracleState, config: RunnableConfig) -> dict:
     """
     Generate 3-5 child nodes for the clicked node.
@@ -85,39 +162,121 @@ async def expander(state: OracleState, config: RunnableConfig) -> dict:
     )
 
     try:
-        data = call_claude_json(
+        data = await call_claude_json(
             system_prompt=_get_system_prompt(),
             user_message=user_message,
             validator_fn=validate_expander_response,
+            node="expander",
+            schema=ExpanderResponse,
+            stream_validator=expander_stream_validator,
         )
     except Exception:
         logger.exception("expander failed — returning empty children")
         return {}
 
-    child_nodes = data.get("childNodes", [])
-    child_edges = data.get("childEdges", [])
+    child_nodes = _drop_duplicate_children(state, config, nodes, active_id, data.get("childNodes", []))
+    merged_nodes, merged_edges = _merge_children(nodes, edges, active_id, child_nodes)
+    _place_children(state, config, nodes, clicked, child_nodes)
 
-    # Prefix child IDs to prevent collisions
-    existing_ids = {n["id"] for n in nodes}
-    for child in child_nodes:
-        if child["id"] in existing_ids:
-            child["id"] = f"{active_id}_{child['id']}"
-        # Ensure parentId is set
-        child["parentId"] = active_id
+    return {
+        "mapState": {
+            "nodes": merged_nodes,
+            "edges": merged_edges,
+            "activeNodeId": active_id,
+        }
+    }
 
-    # Fix edges to match potentially renamed IDs
-    child_id_set = {c["id"] for c in child_nodes}
-    final_edges = []
-    for child in child_nodes:
-        final_edges.append({"sourceId": active_id, "targetId": child["id"]})
 
-    merged_nodes = nodes + child_nodes
-    merged_edges = edges + final_edges
+async def multi_expander(state: OracleState, config: RunnableConfig) -> dict:
+    """
+    Expand every node in `expandNodeIds` with a single Claude call.
+    Children come back grouped by parent; each group is validated on its own
+    and all valid groups are merged into mapState in one step.
+    """
+    map_state = state.get("mapState", {})
+    nodes = map_state.get("nodes", [])
+    edges = map_state.get("edges", [])
+    by_id = {n["id"]: n for n in nodes}
+
+    # Keep request order, drop unknown and repeated ids
+    parent_ids: list[str] = []
+    for node_id in state.get("expandNodeIds", []):
+        if node_id in by_id and node_id not in parent_ids:
+            parent_ids.append(node_id)
+        elif node_id not in by_id:
+            logger.warning("multi_expander: node '%s' not found", node_id)
+
+    if not parent_ids:
+        logger.warning("multi_expander called with no expandable node ids")
+        return {"expandNodeIds": []}
+
+    constraints = state.get("constraints", [])
+    visited = [n["label"] for n in nodes]
+
+    constraint_text = "\n".join(
+        f"- [{c['dimension']}] ({c['type']}): {c['value']}"
+        for c in constraints
+    )
+
+    parent_blocks = []
+    for node_id in parent_ids:
+        node = by_id[node_id]
+        parent_blocks.append(
+            f"### {node['label']}\n"
+            f"id: {node['id']} | position: ({node['x']}, {node['y']}) | depth: {node['depth']}\n"
+            f"Path from Root: {' → '.join(_get_parent_chain(nodes, node_id))}"
+        )
+
+    user_message = (
+        f"## Nodes to Expand\n" + "\n\n".join(parent_blocks) + "\n\n"
+        f"## Constraints\n{constraint_text}\n\n"
+        f"## Already Visited Nodes (do NOT duplicate)\n{json.dumps(visited)}\n\n"
+        f"Generate 3-5 child nodes for each of the {len(parent_ids)} nodes above."
+    )
+
+    try:
+        data = await call_claude_json(
+            system_prompt=_get_multi_system_prompt(),
+            user_message=user_message,
+            validator_fn=partial(validate_multi_expander_response, parent_ids=parent_ids),
+            node="multi_expander",
+            schema=MultiExpanderResponse,
+            stream_validator=expander_stream_validator,
+        )
+    except Exception:
+        logger.exception("multi_expander failed — returning empty children")
+        return {"expandNodeIds": []}
+
+    merged_nodes, merged_edges = nodes, edges
+    expanded: set[str] = set()
+    for group in data.get("groups", []):
+        parent_id = group.get("parentId")
+        if parent_id not in parent_ids:
+            continue
+        # A response that failed validation on every attempt can still repeat a parent
+        if parent_id in expanded:
+            logger.warning("multi_expander: dropping repeated group '%s'", parent_id)
+            continue
+        is_valid, errors = validate_expander_response(group)
+        if not is_valid:
+            logger.warning("multi_expander: dropping group '%s': %s", parent_id, errors)
+            continue
+        # Syncing against merged_nodes also catches duplicates across groups
+        child_nodes = _drop_duplicate_children(
+            state, config, merged_nodes, parent_id, group.get("childNodes", [])
+        )
+        expanded.add(parent_id)
+        placed_around = merged_nodes
+        merged_nodes, merged_edges = _merge_children(
+            merged_nodes, merged_edges, parent_id, child_nodes
+        )
+        _place_children(state, config, placed_around, by_id[parent_id], child_nodes)
 
     return {
         "mapState": {
             "nodes": merged_nodes,
             "edges": merged_edges,
-            "activeNodeId": active_id,
-        }
+            "activeNodeId": parent_ids[-1],
+        },
+        "expandNodeIds": [],
     }
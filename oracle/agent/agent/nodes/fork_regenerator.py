@@ -1,24 +1,35 @@
 """
-Node 4: Fork Regenerator — regenerates entire map when user forks at a past answer.
+Node 4: Fork Regenerator — regenerates the map when user forks at a past answer.
+In incremental mode only the nodes touched by the changed dimension are regenerated;
+unaffected subtrees (including expanded children) are kept as they are.
 """
 
 from __future__ import annotations
 
 import copy
+import json
 import logging
+from functools import partial
 from pathlib import Path
 
 from langchain_core.runnables import RunnableConfig
 
+from config import DEDUP_ENABLED, FORK_INCREMENTAL, FORK_INCREMENTAL_MAX_AFFECTED
+from agent.branch_store import collect_pool, diff_map
+from agent.schemas import ForkPatchResponse, ForkResponse
+from agent.similarity import LabelIndex, dedupe_nodes
 from agent.state import OracleState
-from agent.validation import validate_fork_response
+from agent.stream_validation import fork_patch_stream_validator, map_stream_validator
+from agent.validation import validate_fork_patch_response, validate_fork_response
 from agent.nodes.llm_caller import call_claude_json
-from agent.nodes.map_generator import _fallback_map
+from agent.nodes.map_generator import _fallback_map, drop_duplicate_nodes
 
 logger = logging.getLogger(__name__)
 
 PROMPT_PATH = Path(__file__).parent.parent / "prompts" / "fork_regenerator.md"
+INCREMENTAL_PROMPT_PATH = Path(__file__).parent.parent / "prompts" / "fork_incremental.md"
 _system_prompt: str | None = None
+_incremental_system_prompt: str | None = None
 
 
 def _get_system_prompt() -> str:
@@ -28,6 +39,124 @@ def _get_system_prompt() -> str:
     return _system_prompt
 
 
+def _get_incremental_system_prompt() -> str:
+    global _incremental_system_prompt
+    if _incremental_system_prompt is None:
+        _incremental_system_prompt = INCREMENTAL_PROMPT_PATH.read_text()
+    return _incremental_system_prompt
+
+
+def _classify_nodes(nodes: list[dict], dimension: str) -> tuple[list[dict], list[dict]]:
+    """
+    Split nodes into (kept, affected).
+    A node is affected if it is tagged with the forked dimension or currently
+    flagged as a conflict; everything below an affected node is affected too.
+    The root is always kept.
+    """
+    children: dict[str, list[dict]] = {}
+    for n in nodes:
+        children.setdefault(n.get("parentId"), []).append(n)
+
+    affected_ids: set[str] = set()
+    stack = [
+        n for n in nodes
+        if n.get("depth", 0) > 0
+        and (n.get("dimension") == dimension or n.get("conflictFlag"))
+    ]
+    while stack:
+        node = stack.pop()
+        if node["id"] in affected_ids:
+            continue
+        affected_ids.add(node["id"])
+        stack.extend(children.get(node["id"], []))
+
+    kept = [n for n in nodes if n["id"] not in affected_ids]
+    affected = [n for n in nodes if n["id"] in affected_ids]
+    return kept, affected
+
+
+def _compact(node: dict) -> dict:
+    return {k: node.get(k) for k in ("id", "label", "depth", "parentId", "x", "y", "dimension")}
+
+
+async def _regenerate_incremental(
+    map_state: dict,
+    problem: str,
+    constraint_text: str,
+    dimension: str,
+    original_answer: str,
+    new_answer: str,
+) -> dict | None:
+    """Regenerate only the affected part of the map. Returns None to request a full regeneration."""
+    nodes = map_state.get("nodes", [])
+    if not nodes or not dimension:
+        return None
+
+    kept, affected = _classify_nodes(nodes, dimension)
+    if not affected:
+        logger.info("fork_regenerator: no nodes affected by '%s' — keeping map", dimension)
+        return {
+            "nodes": nodes,
+            "edges": map_state.get("edges", []),
+            "activeNodeId": None,
+        }
+    if len(affected) > FORK_INCREMENTAL_MAX_AFFECTED * len(nodes):
+        logger.info(
+            "fork_regenerator: %d/%d nodes affected — falling back to full regeneration",
+            len(affected), len(nodes),
+        )
+        return None
+
+    kept_ids = {n["id"] for n in kept}
+    user_message = (
+        f"## Problem\n{problem}\n\n"
+        f"## What Changed\n"
+        f"The user originally answered for '{dimension}': \"{original_answer}\"\n"
+        f"They are now exploring: \"{new_answer}\"\n\n"
+        f"## Full (Modified) Constraints\n{constraint_text}\n\n"
+        f"## Kept Nodes (context only — do NOT output)\n"
+        f"{json.dumps([_compact(n) for n in kept])}\n\n"
+        f"## Affected Nodes (regenerate or re-evaluate)\n{json.dumps(affected)}\n\n"
+        f"Generate replacement nodes for the {len(affected)} affected nodes."
+    )
+
+    data = await call_claude_json(
+        system_prompt=_get_incremental_system_prompt(),
+        user_message=user_message,
+        validator_fn=partial(validate_fork_patch_response, kept_ids=kept_ids),
+        node="fork_regenerator",
+        schema=ForkPatchResponse,
+        stream_validator=fork_patch_stream_validator,
+    )
+    is_valid, errors = validate_fork_patch_response(data, kept_ids=kept_ids)
+    if not is_valid:
+        logger.warning("fork_regenerator: incremental patch invalid (%s) — regenerating fully", errors)
+        return None
+
+    patch = data["nodes"]
+    if DEDUP_ENABLED:
+        # Patch nodes that duplicate a kept node merge into it
+        index = LabelIndex()
+        index.sync(kept)
+        patch, merged = dedupe_nodes(patch, index)
+        if merged:
+            logger.info("Merged %d near-duplicate patch nodes: %s", len(merged), merged)
+    logger.info(
+        "fork_regenerator: kept %d nodes, regenerated %d affected as %d",
+        len(kept), len(affected), len(patch),
+    )
+    kept_edges = [
+        e for e in map_state.get("edges", [])
+        if e.get("sourceId") in kept_ids and e.get("targetId") in kept_ids
+    ]
+    patch_edges = [{"sourceId": n["parentId"], "targetId": n["id"]} for n in patch]
+    return {
+        "nodes": kept + patch,
+        "edges": kept_edges + patch_edges,
+        "activeNodeId": None,
+    }
+
+
 async def fork_regenerator(state: OracleState, config: RunnableConfig) -> dict:
     """
     Regenerate the map after the user forks at a past answer.
@@ -53,43 +182,67 @@ async def fork_regenerator(state: OracleState, config: RunnableConfig) -> dict:
         for c in modified
     )
 
-    user_message = (
-        f"## Problem\n{problem}\n\n"
-        f"## What Changed\n"
-        f"The user originally answered for '{dimension}': \"{original_answer}\"\n"
-        f"They are now exploring: \"{new_answer}\"\n\n"
-        f"## Full (Modified) Constraints\n{constraint_text}\n\n"
-        f"Generate a meaningfully different solution space map."
-    )
-
-    try:
-        data = call_claude_json(
-            system_prompt=_get_system_prompt(),
-            user_message=user_message,
-            validator_fn=validate_fork_response,
+    new_map = None
+    if FORK_INCREMENTAL:
+        try:
+            new_map = await _regenerate_incremental(
+                state.get("mapState", {}),
+                problem,
+                constraint_text,
+                dimension,
+                original_answer,
+                new_answer,
+            )
+        except Exception:
+            logger.exception("fork_regenerator incremental mode failed — regenerating fully")
+
+    if new_map is None:
+        user_message = (
+            f"## Problem\n{problem}\n\n"
+            f"## What Changed\n"
+            f"The user originally answered for '{dimension}': \"{original_answer}\"\n"
+            f"They are now exploring: \"{new_answer}\"\n\n"
+            f"## Full (Modified) Constraints\n{constraint_text}\n\n"
+            f"Generate a meaningfully different solution space map."
         )
-    except Exception:
-        logger.exception("fork_regenerator failed — using fallback map")
-        data = _fallback_map(problem)
 
-    if not data.get("nodes"):
-        data = _fallback_map(problem)
-
-    new_map = {
-        "nodes": data["nodes"],
-        "edges": data.get("edges", []),
-        "activeNodeId": None,
-    }
+        try:
+            data = await call_claude_json(
+                system_prompt=_get_system_prompt(),
+                user_message=user_message,
+                validator_fn=validate_fork_response,
+                node="fork_regenerator",
+                schema=ForkResponse,
+                stream_validator=map_stream_validator,
+            )
+        except Exception:
+            logger.exception("fork_regenerator failed — using fallback map")
+            data = _fallback_map(problem)
+
+        if not data.get("nodes"):
+            data = _fallback_map(problem)
+
+        nodes, edges = drop_duplicate_nodes(data["nodes"], data.get("edges", []))
+        new_map = {
+            "nodes": nodes,
+            "edges": edges,
+            "activeNodeId": None,
+        }
 
-    # Update the branch's mapSnapshot
-    branches = copy.deepcopy(state.get("branches", []))
+    # Record the branch's divergence from its fork point. Only the active
+    # branch entry is replaced; other branches are shared, not copied.
+    pool = state.get("nodePool", {})
+    branches = list(state.get("branches", []))
     active_branch_id = state.get("activeBranchId", "main")
-    for branch in branches:
+    for i, branch in enumerate(branches):
         if branch["branchId"] == active_branch_id:
-            branch["mapSnapshot"] = new_map
+            pool, delta = diff_map(pool, branch.get("baseRefs", []), new_map["nodes"])
+            branches[i] = {**branch, **delta, "mapSnapshot": {}}
             break
 
     return {
         "mapState": new_map,
         "branches": branches,
+        # A regenerated branch's previous delta is no longer referenced
+        "nodePool": collect_pool(pool, branches),
     }
@@ -0,0 +1,117 @@
+"""
+Hedged-request policy for Claude calls.
+Tracks recent latency per node and decides when to fire a second, identical
+request so a single slow response doesn't set the p99.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+
+from config import (
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MAX_RATE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_WINDOW,
+)
+
+
+class LatencyWindow:
+    """Rolling window of recent call latencies (seconds) for one node."""
+
+    def __init__(self, size: int = LLM_HEDGE_WINDOW):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        """Nearest-rank percentile, or None if the window is empty."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+class HedgePolicy:
+    """
+    Decides whether (and after how long) a call should be hedged.
+    Hedging only kicks in once a node has enough latency samples, and the
+    fraction of hedged calls is capped at `max_rate` to bound extra spend.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = LLM_HEDGE_ENABLED,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        max_rate: float = LLM_HEDGE_MAX_RATE,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self._windows: dict[str, LatencyWindow] = {}
+        self.stats = {
+            "calls": 0,
+            "hedged": 0,
+            "primary_wins": 0,
+            "hedge_wins": 0,
+        }
+
+    def window(self, node: str) -> LatencyWindow:
+        if node not in self._windows:
+            self._windows[node] = LatencyWindow()
+        return self._windows[node]
+
+    def record_latency(self, node: str, seconds: float) -> None:
+        self.window(node).record(seconds)
+
+    def hedge_delay(self, node: str) -> float | None:
+        """Seconds to wait before hedging, or None if this call must not hedge."""
+        if not self.enabled:
+            return None
+        window = self.window(node)
+        if len(window) < self.min_samples:
+            return None
+        return window.percentile(self.percentile)
+
+    def can_hedge(self) -> bool:
+        """Budget cap: allow a hedge only if it keeps the hedge rate under max_rate."""
+        calls = max(self.stats["calls"], 1)
+        return (self.stats["hedged"] + 1) / calls <= self.max_rate
+
+    def record_hedge(self) -> None:
+        """Count a hedge when it is fired, so hedges whose caller is cancelled still count against the cap."""
+        self.stats["hedged"] += 1
+
+    def record_outcome(self, hedge_won: bool) -> None:
+        """Which request of a hedged pair returned the response used."""
+        if hedge_won:
+            self.stats["hedge_wins"] += 1
+        else:
+            self.stats["primary_wins"] += 1
+
+    def snapshot(self) -> dict:
+        """Counters, rates and current per-node thresholds, for /metrics."""
+        calls, hedged, hedge_wins = self.stats["calls"], self.stats["hedged"], self.stats["hedge_wins"]
+        resolved = hedge_wins + self.stats["primary_wins"]
+        return {
+            "enabled": self.enabled,
+            "calls": calls,
+            "hedged": hedged,
+            "hedgeRate": round(hedged / calls, 3) if calls else None,
+            "hedgeWins": hedge_wins,
+            "primaryWins": self.stats["primary_wins"],
+            "hedgeWinRate": round(hedge_wins / resolved, 3) if resolved else None,
+            "thresholds": {
+                node: window.percentile(self.percentile)
+                for node, window in self._windows.items()
+            },
+        }
@@ -0,0 +1,149 @@
+"""
+Shared HTTP connection pool for Claude calls.
+ChatAnthropic builds its HTTP client lazily on the first call with SDK
+defaults, so each worker's first requests pay DNS, TCP and TLS setup. Here
+one async client with explicit limits, keep-alive, timeouts and HTTP/2
+(when `h2` is installed) is shared by every ChatAnthropic instance and
+warmed at server startup. Each Claude request carries a connection trace
+hook, so GET /metrics shows how often a pooled connection was reused;
+warm-up requests are left out of those figures.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import ssl
+import time
+from typing import Optional
+
+import anthropic
+
+from config import (
+    LLM_HTTP2,
+    LLM_HTTP_CA_BUNDLE,
+    LLM_HTTP_CONNECT_TIMEOUT,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE,
+    LLM_HTTP_POOL_TIMEOUT,
+    LLM_HTTP_READ_TIMEOUT,
+    LLM_HTTP_WARM_CONNECTIONS,
+    LLM_HTTP_WRITE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Newer anthropic SDKs are built on the httpx2 fork and reject httpx clients
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+pool_stats = {"requests": 0, "connections": 0, "tls_handshakes": 0, "connect_seconds": 0.0, "warmed": 0}
+
+
+class _TracingTransport(httpx.AsyncHTTPTransport):
+    """Counts requests and the connections opened for them, leaving out warm-up requests."""
+
+    async def handle_async_request(self, request):
+        if request.extensions.get("warmup"):
+            return await super().handle_async_request(request)
+        pool_stats["requests"] += 1
+        started = 0.0
+
+        async def trace(event: str, info: dict) -> None:
+            nonlocal started
+            if event == "connection.connect_tcp.started":
+                started = time.monotonic()
+            elif event == "connection.connect_tcp.complete":
+                pool_stats["connections"] += 1
+            elif event == "connection.start_tls.complete":
+                pool_stats["tls_handshakes"] += 1
+                pool_stats["connect_seconds"] += time.monotonic() - started
+
+        request.extensions["trace"] = trace
+        return await super().handle_async_request(request)
+
+
+_transport: Optional[_TracingTransport] = None
+_client = None
+_http2 = False
+
+
+def _timeout():
+    return httpx.Timeout(
+        connect=LLM_HTTP_CONNECT_TIMEOUT,
+        read=LLM_HTTP_READ_TIMEOUT,
+        write=LLM_HTTP_WRITE_TIMEOUT,
+        pool=LLM_HTTP_POOL_TIMEOUT,
+    )
+
+
+def get_client():
+    """The shared async HTTP client, built on first use."""
+    global _client, _transport, _http2
+    if _client is None:
+        _http2 = LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+        if LLM_HTTP2 and not _http2:
+            logger.warning("LLM_HTTP2 is set but the h2 package is missing — using HTTP/1.1")
+        verify = True
+        if LLM_HTTP_CA_BUNDLE:
+            verify = ssl.create_default_context()
+            verify.load_verify_locations(LLM_HTTP_CA_BUNDLE)
+        _transport = _TracingTransport(
+            http2=_http2,
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client = anthropic.DefaultAsyncHttpxClient(transport=_transport, timeout=_timeout())
+    return _client
+
+
+async def warm(base_url: str, connections: int = LLM_HTTP_WARM_CONNECTIONS) -> int:
+    """Open up to `connections` pooled connections to `base_url`. Returns how many requests got through."""
+    client = get_client()
+
+    async def open_one() -> bool:
+        try:
+            await client.head(base_url, extensions={"warmup": True})
+            return True
+        except httpx.HTTPError as e:
+            logger.warning("Could not pre-warm a connection to %s: %s", base_url, e)
+            return False
+
+    opened = sum(await asyncio.gather(*(open_one() for _ in range(connections))))
+    pool_stats["warmed"] += opened
+    logger.info("Pre-warmed %d connection(s) to %s", opened, base_url)
+    return opened
+
+
+async def close() -> None:
+    global _client, _transport
+    if _client is not None:
+        await _client.aclose()
+        _client = _transport = None
+
+
+def report() -> dict:
+    """Pool summary for /metrics."""
+    requests, opened = pool_stats["requests"], pool_stats["connections"]
+    pool = getattr(_transport, "_pool", None)
+    connections = list(getattr(pool, "connections", ()))
+    idle = sum(1 for c in connections if c.is_idle())
+    handshakes = pool_stats["tls_handshakes"]
+    return {
+        "http2": _http2,
+        "requests": requests,
+        "connectionsOpened": opened,
+        "reuseRate": round(1 - opened / requests, 3) if requests else None,
+        "meanConnectMs": round(pool_stats["connect_seconds"] / handshakes * 1000, 1) if handshakes else None,
+        "open": len(connections),
+        "idle": idle,
+        "warmed": pool_stats["warmed"],
+    }
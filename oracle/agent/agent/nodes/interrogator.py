@@ -11,10 +11,15 @@ from pathlib import Path
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 
+from config import MESSAGE_SUMMARY_MAX_CHARS, MESSAGE_WINDOW, SPECULATIVE_MAP_ENABLED
+from agent import speculation
+from agent.token_budget import BudgetExhausted
+from agent.schemas import InterrogatorResponse
 from agent.state import OracleState
-from agent.transitions import update_constraints
+from agent.transitions import update_constraints, window_messages
 from agent.validation import validate_interrogator_response
 from agent.nodes.llm_caller import call_claude_json
+from agent.nodes.map_generator import generate_map
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +34,27 @@ def _get_system_prompt() -> str:
     return _system_prompt
 
 
+# Asked without Claude once the session's token budget is spent
+_FALLBACK_QUESTIONS = {
+    "resources": "What budget, team and other resources can you put into this?",
+    "timeline": "What timeline are you working towards?",
+    "riskTolerance": "How much risk are you willing to take on?",
+    "market": "Who is your target market?",
+    "founderContext": "What experience or advantages do you bring to this?",
+}
+
+
+def _fallback_question(uncovered: list[str], last_dimension: str) -> dict:
+    if not uncovered:
+        # Anything added to the final question is filed under the last dimension asked about
+        return {
+            "question": "Is there anything else I should know before I map this out?",
+            "targetDimension": last_dimension,
+            "isLastQuestion": True,
+        }
+    return {"question": _FALLBACK_QUESTIONS[uncovered[0]], "targetDimension": uncovered[0]}
+
+
 def _get_last_user_text(state: dict) -> str:
     """Get text of the most recent human message."""
     messages = state.get("messages", [])
@@ -40,6 +66,21 @@ def _get_last_user_text(state: dict) -> str:
     return ""
 
 
+def _reply(state: dict, text: str) -> dict:
+    """Messages update adding `text`, with older messages trimmed to the window."""
+    reply = AIMessage(content=text)
+    update = window_messages(
+        state.get("messages", []),
+        state.get("conversationSummary", ""),
+        # Room for the reply, but keep=0 would mean "keep everything"
+        keep=max(MESSAGE_WINDOW - 1, 1) if MESSAGE_WINDOW > 0 else 0,
+        max_summary_chars=MESSAGE_SUMMARY_MAX_CHARS,
+    )
+    if not update:
+        return {"messages": [reply]}
+    return {**update, "messages": update["messages"] + [reply]}
+
+
 async def interrogator(state: OracleState, config: RunnableConfig) -> dict:
     """
     Given the problem and constraints so far, generate the next question.
@@ -56,8 +97,18 @@ async def interrogator(state: OracleState, config: RunnableConfig) -> dict:
     if not problem and last_user_text:
         problem = last_user_text
 
+    # A bare confirmation of the final question ("yes" to "Is this right?", "no"
+    # to "Anything else?") adds no constraint, which
+    # keeps the constraint set identical to the one the speculative map used.
+    # Any reply to the final question moves on to the map, with or without a
+    # target dimension to file it under.
+    final_answer = bool(state.get("isLastQuestion") and last_user_text and state.get("currentQuestion"))
+    confirmed = final_answer and speculation.is_confirmation(
+        last_user_text, state.get("currentQuestion", "")
+    )
+
     # If we already asked a question and the user replied, record the answer as a constraint
-    if prev_dimension and last_user_text and state.get("currentQuestion"):
+    if prev_dimension and last_user_text and state.get("currentQuestion") and not confirmed:
         partial = update_constraints(
             state=state,
             answer=last_user_text,
@@ -69,10 +120,10 @@ async def interrogator(state: OracleState, config: RunnableConfig) -> dict:
 
     # If the LAST question was already asked (previous turn) and the user just answered,
     # record the answer and transition to map generation — don't ask another question.
-    if state.get("isLastQuestion") and last_user_text and prev_dimension:
+    if final_answer:
         logger.info("Final answer received — transitioning to map generation.")
         return {
-            "messages": [AIMessage(content="Thank you! Let me generate your solution map now...")],
+            **_reply(state, "Thank you! Let me generate your solution map now..."),
             "problem": problem,
             "constraints": constraints,
             "dimensionCoverage": coverage,
@@ -104,8 +155,15 @@ async def interrogator(state: OracleState, config: RunnableConfig) -> dict:
         f"## Problem\n{problem}\n\n"
         f"## Constraints Collected So Far\n{constraint_text}\n\n"
         f"## Uncovered Dimensions\n{json.dumps(uncovered)}\n\n"
-        f"Generate the next question."
     )
+    if last_user_text and uncovered:
+        user_message += (
+            f"## Latest User Message\n{last_user_text}\n\n"
+            f"Extract constraints for every uncovered dimension this message also answers, "
+            f"then generate the next question about a dimension that is still uncovered."
+        )
+    else:
+        user_message += "Generate the next question."
 
     if not uncovered:
         user_message += (
@@ -113,23 +171,49 @@ async def interrogator(state: OracleState, config: RunnableConfig) -> dict:
             "Set isLastQuestion to true and ask a brief final confirmation question."
         )
 
-    data = call_claude_json(
-        system_prompt=_get_system_prompt(),
-        user_message=user_message,
-        validator_fn=validate_interrogator_response,
-    )
+    try:
+        data = await call_claude_json(
+            system_prompt=_get_system_prompt(),
+            user_message=user_message,
+            validator_fn=validate_interrogator_response,
+            node="interrogator",
+            schema=InterrogatorResponse,
+        )
+    except BudgetExhausted:
+        logger.warning("Token budget spent — asking a fixed question")
+        data = _fallback_question(uncovered, prev_dimension)
+
+    # Record every other dimension the answer covered, so it isn't asked again
+    extracted = [e for e in data.get("extractedConstraints", []) if e.get("dimension") in uncovered]
+    if extracted:
+        partial = update_constraints(
+            state={"constraints": constraints, "dimensionCoverage": coverage},
+            answer=None,
+            dimension=None,
+            extracted=extracted,
+        )
+        newly = [d for d in partial["dimensionCoverage"] if partial["dimensionCoverage"][d] and not coverage.get(d)]
+        if newly:
+            logger.info("Answer also covered %s — skipping those questions", newly)
+        constraints = partial["constraints"]
+        coverage = partial["dimensionCoverage"]
 
     question = data.get("question", "What else should I know?")
     target_dim = data.get("targetDimension", uncovered[0] if uncovered else "")
     is_last = data.get("isLastQuestion", False)
 
+    # The constraints are settled — start the map while the user reads the question
+    if is_last and SPECULATIVE_MAP_ENABLED:
+        session_key = (config or {}).get("configurable", {}).get("thread_id") or state.get("sessionId", "")
+        speculation.start(session_key, problem, constraints, generate_map)
+
     # Build the assistant message for the chat UI
     assistant_text = question
     if is_last:
         assistant_text += "\n\n_(This is my final question before I generate your solution map.)_"
 
     return {
-        "messages": [AIMessage(content=assistant_text)],
+        **_reply(state, assistant_text),
         "problem": problem,
         "constraints": constraints,
         "dimensionCoverage": coverage,
@@ -1,36 +1,135 @@
 """
 Shared Claude call wrapper used by all agent nodes.
-Handles JSON parsing, validation, and retry with error feedback.
+Handles structured output (forced tool use), JSON parsing, validation,
+retry with error feedback, optional request hedging for tail latency, and
+token accounting with per-node output limits and budgets (agent/token_budget.py).
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
-from typing import Callable
+import time
+from contextlib import aclosing
+from functools import cached_property
+from typing import Any, Callable
+
+import anthropic
 
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
 
-from config import ANTHROPIC_API_KEY, MAX_LLM_RETRIES, MODEL_MAX_TOKENS, MODEL_NAME, MODEL_TEMPERATURE
+from config import (
+    ANTHROPIC_API_KEY,
+    LLM_HTTP_WARM_CONNECTIONS,
+    MAX_LLM_RETRIES,
+    MODEL_MAX_TOKENS,
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+    STREAM_VALIDATION,
+    STRUCTURED_OUTPUT,
+    TOKEN_BUDGET_FALLBACK_MODEL,
+)
+from agent import inflight, token_budget
+from agent.nodes.cassette import get_cassette
+from agent.nodes import http_pool
+from agent.nodes.hedging import HedgePolicy
+from agent.stream_validation import IncrementalNodeValidator
 
 logger = logging.getLogger(__name__)
 
-# Singleton LLM instance
-_llm: ChatAnthropic | None = None
+# Process-wide hedging policy (disabled unless LLM_HEDGE_ENABLED is set)
+hedge_policy = HedgePolicy()
+
+# Mid-stream aborts of responses already known to be invalid
+stream_stats = {"aborted": 0, "seconds_saved": 0.0}
+
+
+def stream_report() -> dict:
+    """Early-abort summary for /metrics: savings are against the node's median latency."""
+    aborted, saved = stream_stats["aborted"], stream_stats["seconds_saved"]
+    return {
+        "enabled": STREAM_VALIDATION,
+        "aborted": aborted,
+        "secondsSaved": round(saved, 2),
+        "meanSecondsSaved": round(saved / aborted, 2) if aborted else None,
+    }
+
+
+# Set as the error of a response cut off at its max_tokens; the retry gets twice the limit
+TRUNCATED_ERROR = "Response was cut off at the output token limit"
+
+class PooledChatAnthropic(ChatAnthropic):
+    """ChatAnthropic that sends its async requests through `http_async_client` when given one."""
+
+    http_async_client: Any = Field(default=None, exclude=True)
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        if self.http_async_client is None:
+            return super()._async_client
+        return anthropic.AsyncClient(
+            api_key=self.anthropic_api_key.get_secret_value(),
+            base_url=self.anthropic_api_url,
+            max_retries=self.max_retries,
+            default_headers=self.default_headers,
+            timeout=self.http_async_client.timeout,
+            http_client=self.http_async_client,
+        )
+
+
+# One LLM instance per model (MODEL_NAME, or the budget fallback model)
+_llms: dict[str, ChatAnthropic] = {}
 
 
-def get_llm() -> ChatAnthropic:
-    global _llm
-    if _llm is None:
-        _llm = ChatAnthropic(
-            model=MODEL_NAME,
+def get_llm(model: str = MODEL_NAME) -> ChatAnthropic:
+    if model not in _llms:
+        _llms[model] = PooledChatAnthropic(
+            model=model,
             anthropic_api_key=ANTHROPIC_API_KEY,
             max_tokens=MODEL_MAX_TOKENS,
             temperature=MODEL_TEMPERATURE,
+            http_async_client=http_pool.get_client(),
         )
-    return _llm
+    return _llms[model]
+
+
+async def warm_connections() -> int:
+    """Open pooled connections to the Anthropic API before the first call needs one."""
+    cassette = get_cassette()
+    if LLM_HTTP_WARM_CONNECTIONS <= 0 or (cassette is not None and cassette.replaying):
+        return 0
+    return await http_pool.warm(str(get_llm()._async_client.base_url))
+
+
+# LLM instances bound to a forced response tool, one per schema and model
+_structured: dict[tuple[type[BaseModel], str], Runnable] = {}
+
+
+def get_structured_llm(schema: type[BaseModel], model: str = MODEL_NAME) -> Runnable:
+    """The LLM with `schema` bound as a tool Claude is required to call."""
+    key = (schema, model)
+    if key not in _structured:
+        _structured[key] = get_llm(model).bind_tools([schema], tool_choice=schema.__name__)
+    return _structured[key]
+
+
+# Runnables with a max_tokens other than MODEL_MAX_TOKENS bound in
+_limited: dict[tuple[type[BaseModel] | None, str, int], Runnable] = {}
+
+
+def _limited_llm(schema: type[BaseModel] | None, model: str, limit: int) -> Runnable:
+    llm = get_structured_llm(schema, model) if schema is not None else get_llm(model)
+    if limit >= MODEL_MAX_TOKENS:
+        return llm
+    key = (schema, model, limit)
+    if key not in _limited:
+        _limited[key] = llm.bind(max_tokens=limit)
+    return _limited[key]
 
 
 def _extract_json(text: str) -> str:
@@ -42,37 +141,233 @@ def _extract_json(text: str) -> str:
     return text.strip()
 
 
-def call_claude_json(
+def _chunk_text(chunk) -> str:
+    """The JSON-bearing text in a streamed chunk: tool-input deltas, else plain text."""
+    if chunk.tool_call_chunks:
+        return "".join(tc.get("args") or "" for tc in chunk.tool_call_chunks)
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        block.get("text", "") for block in chunk.content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
+
+async def _stream(
+    llm: Runnable, messages: list, validator: IncrementalNodeValidator
+) -> tuple[object, str, list[str]]:
+    """
+    Stream a response through an incremental validator.
+    Returns (message, text, fatal_errors). On a fatal error the stream is
+    closed straight away, which cancels the HTTP request; message and text
+    are then what had arrived.
+    """
+    message = None
+    text_parts: list[str] = []
+    async with aclosing(llm.astream(messages)) as stream:
+        async for chunk in stream:
+            message = chunk if message is None else message + chunk
+            piece = _chunk_text(chunk)
+            if not piece:
+                continue
+            text_parts.append(piece)
+            errors = validator.feed(piece)
+            if errors:
+                return message, "".join(text_parts), errors
+    return message, "".join(text_parts), []
+
+
+async def _request(
+    llm: Runnable,
+    messages: list,
+    validator_fn: Callable[[dict], tuple[bool, list[str]]],
+    node: str,
+    stream_validator: Callable[[], IncrementalNodeValidator] | None = None,
+) -> tuple[dict, list[str]]:
+    """
+    One Claude round trip: invoke, read the tool call (or parse JSON text), validate.
+    With a stream_validator the response is streamed and abandoned as soon as
+    it is certain to fail validation.
+    Returns (data, errors) — errors is empty when the response is valid.
+    Raises json.JSONDecodeError if a text response is not JSON.
+    """
+    start = time.monotonic()
+    aborted = cancelled = False
+    try:
+        if stream_validator is None:
+            response = await llm.ainvoke(messages)
+            raw = response.content if isinstance(response.content, str) else str(response.content)
+        else:
+            response, raw, fatal = await _stream(llm, messages, stream_validator())
+            if fatal:
+                aborted = True
+                input_tokens, output_tokens, estimated = token_budget.usage_of(response, raw)
+                token_budget.record(node, input_tokens, output_tokens, complete=False, estimated=estimated)
+                elapsed = time.monotonic() - start
+                typical = hedge_policy.window(node).percentile(50) or elapsed
+                stream_stats["aborted"] += 1
+                stream_stats["seconds_saved"] += max(0.0, typical - elapsed)
+                logger.warning(
+                    "Aborted %s stream after %.2fs (typical %.2fs): %s",
+                    node, elapsed, typical, fatal,
+                )
+                return {}, fatal
+    except asyncio.CancelledError:
+        cancelled = True
+        if inflight.superseded():
+            inflight.record_cancelled_call(
+                time.monotonic() - start, hedge_policy.window(node).percentile(50)
+            )
+        raise
+    finally:
+        # Only completed calls count. Hedge losers, superseded runs and
+        # aborted streams stop early; their elapsed time would drag the
+        # percentiles down.
+        if not aborted and not cancelled:
+            hedge_policy.record_latency(node, time.monotonic() - start)
+    input_tokens, output_tokens, estimated = token_budget.usage_of(response, raw)
+    if (getattr(response, "response_metadata", None) or {}).get("stop_reason") == "max_tokens":
+        token_budget.budget_stats["truncated"] += 1
+        token_budget.record(node, input_tokens, output_tokens, complete=False, estimated=estimated)
+        logger.warning("%s response hit its output token limit (%d tokens)", node, output_tokens)
+        return {}, [TRUNCATED_ERROR]
+    token_budget.record(node, input_tokens, output_tokens, estimated=estimated)
+
+    tool_calls = getattr(response, "tool_calls", None)
+    if tool_calls:
+        data = tool_calls[0]["args"]
+    else:
+        data = json.loads(_extract_json(raw))
+    _, errors = validator_fn(data)
+    return data, errors
+
+
+async def _hedged_request(
+    llm: Runnable,
+    messages: list,
+    validator_fn: Callable[[dict], tuple[bool, list[str]]],
+    node: str,
+    stream_validator: Callable[[], IncrementalNodeValidator] | None = None,
+    hedge: bool = True,
+) -> tuple[dict, list[str]]:
+    """
+    Run _request, firing an identical second request if the first hasn't
+    finished by the node's latency percentile. The first valid response wins
+    and the other in-flight request is cancelled.
+    """
+    hedge_policy.stats["calls"] += 1
+    primary = asyncio.create_task(_request(llm, messages, validator_fn, node, stream_validator))
+    tasks = {primary}
+    try:
+        delay = hedge_policy.hedge_delay(node) if hedge else None
+        if delay is not None:
+            await asyncio.wait(tasks, timeout=delay)
+        if delay is None or primary.done() or not hedge_policy.can_hedge():
+            return await primary
+
+        logger.info("Hedging %s call after %.2fs", node, delay)
+        hedge_task = asyncio.create_task(_request(llm, messages, validator_fn, node, stream_validator))
+        tasks.add(hedge_task)
+        hedge_policy.record_hedge()
+
+        fallback: tuple[dict, list[str]] | None = None
+        error: BaseException | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                data, errors = task.result()
+                if not errors:
+                    hedge_policy.record_outcome(hedge_won=task is hedge_task)
+                    return data, errors
+                fallback = fallback or (data, errors)
+
+        # Neither response validated — hand one back so the caller can retry
+        hedge_policy.record_outcome(hedge_won=False)
+        if fallback is not None:
+            return fallback
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_claude_json(
     system_prompt: str,
     user_message: str,
     validator_fn: Callable[[dict], tuple[bool, list[str]]],
     max_retries: int = MAX_LLM_RETRIES,
+    node: str = "llm",
+    schema: type[BaseModel] | None = None,
+    stream_validator: Callable[[], IncrementalNodeValidator] | None = None,
 ) -> dict:
     """
     Call Claude, parse JSON, validate, retry on failure.
+    `node` names the caller so latency (and hedging thresholds) are tracked per node.
+    `schema` (see agent/schemas.py) makes Claude answer through a forced tool
+    call, so the response arrives already structured.
+    `stream_validator` (see agent/stream_validation.py) streams the response
+    and retries as soon as it is certain to fail validation.
+    Near the session's or tenant's token budget the call runs without
+    hedging or retries, on the fallback model if one is set.
     Returns the parsed dict on success.
-    Raises ValueError on exhausted retries.
+    Raises ValueError on exhausted retries, BudgetExhausted (no call made)
+    once the budget is spent.
     """
-    llm = get_llm()
+    budget_mode = token_budget.mode()
+    if budget_mode == token_budget.EXHAUSTED:
+        token_budget.budget_stats["exhausted_calls"] += 1
+        raise token_budget.BudgetExhausted(f"Token budget spent — {node} call skipped")
+    hedge = True
+    model = MODEL_NAME
+    if budget_mode == token_budget.DEGRADED:
+        token_budget.budget_stats["degraded_calls"] += 1
+        hedge = False
+        max_retries = 0
+        model = TOKEN_BUDGET_FALLBACK_MODEL or MODEL_NAME
+
+    structured = schema is not None and STRUCTURED_OUTPUT
+    cassette = get_cassette()
+
+    def build_llm(limit: int) -> Runnable:
+        if cassette is not None and cassette.replaying:
+            return cassette.wrap(None, node, schema.__name__ if structured else None)
+        llm = _limited_llm(schema if structured else None, model, limit)
+        if cassette is not None:
+            llm = cassette.wrap(llm, node, schema.__name__ if structured else None)
+        return llm
+
+    limit = token_budget.max_tokens(node)
+    llm = build_llm(limit)
+    if not STREAM_VALIDATION:
+        stream_validator = None
     current_user_msg = user_message
 
     last_data: dict = {}
     for attempt in range(max_retries + 1):
         try:
-            response = llm.invoke(
+            data, errors = await _hedged_request(
+                llm,
                 [
                     SystemMessage(content=system_prompt),
                     HumanMessage(content=current_user_msg),
-                ]
+                ],
+                validator_fn,
+                node,
+                stream_validator,
+                hedge,
             )
-            raw = response.content if isinstance(response.content, str) else str(response.content)
-            text = _extract_json(raw)
-            data = json.loads(text)
-            last_data = data
+            last_data = data or last_data
 
-            is_valid, errors = validator_fn(data)
-            if is_valid:
+            if not errors:
                 return data
+            if TRUNCATED_ERROR in errors and limit < MODEL_MAX_TOKENS:
+                limit = min(MODEL_MAX_TOKENS, limit * 2)
+                llm = build_llm(limit)
 
             # Retry with error context
             logger.warning(
@@ -84,7 +379,7 @@ def call_claude_json(
                 user_message
                 + "\n\n⚠️ Your previous response had these errors:\n"
                 + "\n".join(f"- {e}" for e in errors)
-                + "\n\nPlease fix ALL errors and regenerate valid JSON only."
+                + "\n\nPlease fix ALL errors and respond again."
             )
 
         except json.JSONDecodeError as e:
@@ -4,13 +4,20 @@ Node 2: Map Generator — generates the full solution space node tree after igni
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 from pathlib import Path
 
+from copilotkit.langgraph import copilotkit_emit_state
 from langchain_core.runnables import RunnableConfig
 
+from config import DEDUP_ENABLED, WARM_START_PAINT_SCORE
+from agent import speculation, warm_start
+from agent.schemas import MapResponse
+from agent.similarity import dedupe_nodes, remap_edges
 from agent.state import OracleState
+from agent.stream_validation import map_stream_validator
 from agent.validation import validate_map_response
 from agent.nodes.llm_caller import call_claude_json
 
@@ -57,43 +64,102 @@ def _fallback_map(problem: str) -> dict:
     }
 
 
-async def map_generator(state: OracleState, config: RunnableConfig) -> dict:
-    """
-    Given the full constraint set, generate the complete node tree.
-    Returns dict update with mapState and phase change.
-    """
-    problem = state.get("problem", "")
-    constraints = state.get("constraints", [])
+def drop_duplicate_nodes(nodes: list[dict], edges: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Merge near-duplicate nodes within a generated map, re-pointing children and edges."""
+    if not DEDUP_ENABLED:
+        return nodes, edges
+    kept, merged = dedupe_nodes(nodes)
+    if merged:
+        logger.info("Merged %d near-duplicate map nodes: %s", len(merged), merged)
+    return kept, remap_edges(edges, merged)
+
 
+async def generate_map(problem: str, constraints: list[dict]) -> dict:
+    """Generate and dedupe the full map for a constraint set. Returns {"nodes", "edges"}."""
     constraint_text = "\n".join(
         f"- [{c['dimension']}] ({c['type']}): {c['value']}"
         for c in constraints
     )
 
+    exemplar = ""
+    match = await warm_start.find(problem, constraints)
+    if match is not None:
+        exemplar = (
+            f"## Similar Past Map (similarity {match.score:.2f})\n"
+            f"Generated for a similar problem. Use its structure as a starting point, "
+            f"but tailor every node to THIS problem and constraints.\n"
+            f"{warm_start.exemplar_text(match)}\n\n"
+        )
+
     user_message = (
         f"## Problem\n{problem}\n\n"
         f"## Full Constraints\n{constraint_text}\n\n"
+        f"{exemplar}"
         f"Generate the complete solution space map with 12-15 nodes."
     )
 
+    generated = True
     try:
-        data = call_claude_json(
+        data = await call_claude_json(
             system_prompt=_get_system_prompt(),
             user_message=user_message,
             validator_fn=validate_map_response,
+            node="map_generator",
+            schema=MapResponse,
+            stream_validator=map_stream_validator,
         )
     except Exception:
         logger.exception("map_generator failed — using fallback map")
         data = _fallback_map(problem)
+        generated = False
 
     # Extra safety: if nodes are missing, use fallback
     if not data.get("nodes"):
         data = _fallback_map(problem)
+        generated = False
+
+    nodes, edges = drop_duplicate_nodes(data["nodes"], data.get("edges", []))
+    if generated:
+        await warm_start.record(problem, constraints, {"nodes": nodes, "edges": edges})
+    return {"nodes": nodes, "edges": edges}
+
+
+async def map_generator(state: OracleState, config: RunnableConfig) -> dict:
+    """
+    Given the full constraint set, generate the complete node tree.
+    Uses the speculative map started at the final question when the
+    constraints have not changed since. Otherwise a near-identical past map
+    (agent/warm_start.py) is painted while the new one is generated.
+    Returns dict update with mapState and phase change.
+    """
+    problem = state.get("problem", "")
+    constraints = state.get("constraints", [])
+    session_key = (config or {}).get("configurable", {}).get("thread_id") or state.get("sessionId", "")
+
+    generated = None
+    pending = speculation.take(session_key, problem, constraints)
+    if pending is not None:
+        try:
+            generated = await pending
+            logger.info("Using speculative map for session %s", session_key)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise  # this node itself was cancelled, not just the speculation
+    if generated is None:
+        # A near-identical past map is painted while the real one is generated
+        match = await warm_start.find(problem, constraints)
+        if match is not None and match.score >= WARM_START_PAINT_SCORE:
+            warm_start.warm_start_stats["painted"] += 1
+            await copilotkit_emit_state(config, {
+                **state,
+                "mapState": {"nodes": match.map["nodes"], "edges": match.map["edges"], "activeNodeId": None},
+            })
+        generated = await generate_map(problem, constraints)
 
     return {
         "mapState": {
-            "nodes": data["nodes"],
-            "edges": data.get("edges", []),
+            "nodes": generated["nodes"],
+            "edges": generated["edges"],
             "activeNodeId": None,
         },
         "phase": "exploration",
@@ -0,0 +1,214 @@
+"""
+On-demand profiling of graph runs.
+An admin arms a session (the next N runs on it are profiled) or a single
+request opts in through its forwardedProps; server.py profiles the run and
+keeps the result for the /admin/profiles endpoints. Two modes:
+
+- "cprofile": deterministic cProfile of the event loop thread → pstats
+  (marshal dump, loadable with pstats.Stats) or a text summary.
+- "sample": a background thread samples the loop thread's stack every
+  PROFILE_SAMPLE_INTERVAL_MS → collapsed stacks, the input format of
+  flamegraph.pl / speedscope. Time spent waiting on Claude shows as the
+  event loop's select().
+
+Both see everything on the loop thread while the run is in flight, so
+other sessions' runs at the same time are in the profile too; work sent to
+worker threads (asyncio.to_thread) is not. One profile runs at a time. With
+nothing armed, a run only pays one dict lookup.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from config import ADMIN_TOKEN, PROFILE_MAX_RESULTS, PROFILE_SAMPLE_INTERVAL_MS
+
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+MODES = (CPROFILE, SAMPLE)
+
+_MAX_STACK_DEPTH = 128
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+class _Sampler:
+    """Counts collapsed stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self._target = thread_id
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="oracle-profiler", daemon=True)
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._target)
+            names = []
+            while frame is not None and len(names) < _MAX_STACK_DEPTH:
+                code = frame.f_code
+                names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """One profiled run, in progress or finished."""
+
+    def __init__(self, session_key: str, run_id: Optional[str], mode: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_key = session_key
+        self.run_id = run_id
+        self.mode = mode
+        self.started = time.time()
+        self.seconds: Optional[float] = None
+        self.data = b""  # pstats dump, or collapsed stacks
+        self.samples = 0
+        self._t0 = time.perf_counter()
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+
+    def start(self) -> None:
+        if self.mode == CPROFILE:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = _Sampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self.seconds = time.perf_counter() - self._t0
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.create_stats()
+            self.data = marshal.dumps(self._profiler.stats)
+            self._profiler = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            self.samples = self._sampler.samples
+            self.data = self._sampler.collapsed().encode()
+            self._sampler = None
+
+    def text(self, limit: int = 60) -> str:
+        """A readable summary: top functions by cumulative time, or the collapsed stacks."""
+        if self.mode == SAMPLE:
+            return self.data.decode()
+        out = io.StringIO()
+        stats = pstats.Stats(_MarshalledStats(self.data), stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return out.getvalue()
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "sessionId": self.session_key,
+            "runId": self.run_id,
+            "mode": self.mode,
+            "started": self.started,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "samples": self.samples if self.mode == SAMPLE else None,
+            "bytes": len(self.data),
+        }
+
+
+class _MarshalledStats:
+    """What pstats.Stats needs to load a marshal dump from memory."""
+
+    def __init__(self, data: bytes):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self) -> None:
+        pass
+
+
+# session key → [mode, runs left]
+_armed: dict[str, list] = {}
+_active: Optional[Profile] = None
+_results: OrderedDict[str, Profile] = OrderedDict()
+
+
+def arm(session_key: str, mode: str = CPROFILE, runs: int = 1) -> None:
+    """Profile the next `runs` runs on a session."""
+    _armed[session_key] = [mode, runs]
+
+
+def disarm(session_key: str) -> bool:
+    return _armed.pop(session_key, None) is not None
+
+
+def armed() -> dict[str, dict]:
+    return {key: {"mode": mode, "runs": runs} for key, (mode, runs) in _armed.items()}
+
+
+def begin(session_key: str, run_id: Optional[str], props: dict) -> Optional[Profile]:
+    """
+    Start profiling this run if its session is armed or its forwardedProps ask
+    for it ({"profile": mode, "adminToken": ...}). Returns None otherwise, or
+    if another profile is running (an armed session then keeps its turn).
+    """
+    global _active
+    if not _armed and "profile" not in props:
+        return None
+    mode = props.get("profile")
+    if mode in MODES and is_admin(props.get("adminToken")):
+        entry = None
+    elif session_key in _armed:
+        entry = _armed[session_key]
+        mode = entry[0]
+    else:
+        return None
+    if _active is not None:
+        return None
+    if entry is not None:
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _armed[session_key]
+    _active = Profile(session_key, run_id, mode)
+    _active.start()
+    return _active
+
+
+def end(profile: Profile) -> None:
+    global _active
+    profile.stop()
+    if _active is profile:
+        _active = None
+    _results[profile.id] = profile
+    while len(_results) > PROFILE_MAX_RESULTS:
+        _results.popitem(last=False)
+
+
+def get(profile_id: str) -> Optional[Profile]:
+    return _results.get(profile_id)
+
+
+def results() -> list[dict]:
+    """Kept profiles, newest first."""
+    return [p.as_dict() for p in reversed(_results.values())]
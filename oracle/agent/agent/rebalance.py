@@ -0,0 +1,102 @@
+"""
+Move session keys to the shard that owns them after the shard list changes.
+
+    python -m agent.rebalance --from redis://a:6379 --to redis://a:6379,redis://b:6379 [--dry-run]
+
+Scans every instance in --from and --to, and moves each session key whose
+owner under the --to ring is a different instance. Pre-sharding keys
+(session:abc) are renamed to their hash-tagged form on the way. Keys are
+copied with DUMP/RESTORE REPLACE and deleted from the source only after the
+restore, so an interrupted run can simply be re-run. Run it while writes
+are paused, then restart the servers with REDIS_URLS set to the --to list.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent.redis_store import LAST_ACCESS_KEY, tagged_key
+from agent.shard_ring import Shard, ShardRing, hash_tag
+
+logger = logging.getLogger(__name__)
+
+_PATTERNS = ("session:*", "snapshot:*", "snapshot_index:*")
+
+
+async def rebalance(from_urls: list[str], to_urls: list[str], dry_run: bool = False, batch: int = 500) -> dict:
+    """Returns {"scanned", "moved", "renamed", "sessions"} counts."""
+    ring = ShardRing(to_urls)
+    sources = ShardRing(list(dict.fromkeys(from_urls + to_urls)))
+    by_url = {shard.url: shard for shard in ring.shards}
+    stats = {"scanned": 0, "moved": 0, "renamed": 0, "sessions": 0}
+    try:
+        # Plan every move before touching anything, so keys that land on a
+        # shard scanned later are not counted twice
+        plan: list[tuple[Shard, list[tuple[str, str, str]], set[str]]] = []
+        for source in sources.shards:
+            src = source.client()
+            moves: list[tuple[str, str, str]] = []  # (key, new key, target url)
+            for pattern in _PATTERNS:
+                async for key in src.scan_iter(pattern, count=batch):
+                    stats["scanned"] += 1
+                    new_key = tagged_key(key)
+                    target = ring.shard_for_key(new_key)
+                    if target.url != source.url or new_key != key:
+                        moves.append((key, new_key, target.url))
+            moved_sessions = {hash_tag(new_key) for _, new_key, url in moves if url != source.url}
+            stats["renamed"] += sum(1 for key, new_key, _ in moves if key != new_key)
+            stats["moved"] += len(moves)
+            stats["sessions"] += len(moved_sessions)
+            logger.info("%s: %d keys to move (%d sessions)", source.url, len(moves), len(moved_sessions))
+            plan.append((source, moves, moved_sessions))
+        if dry_run:
+            return stats
+
+        for source, moves, moved_sessions in plan:
+            src = source.client()
+            for i in range(0, len(moves), batch):
+                chunk = moves[i:i + batch]
+                async with src.pipeline(transaction=False) as pipe:
+                    for key, _, _ in chunk:
+                        pipe.dump(key)
+                        pipe.pttl(key)
+                    dumped = await pipe.execute()
+                for (key, new_key, url), payload, pttl in zip(chunk, dumped[::2], dumped[1::2]):
+                    if payload is None:
+                        continue  # deleted since the scan
+                    await by_url[url].client().restore(new_key, max(pttl, 0), payload, replace=True)
+                    if (url, new_key) != (source.url, key):
+                        await src.delete(key)
+
+            # Carry last-access scores so tiering keeps working on the new shard
+            for session_id in moved_sessions:
+                score = await src.zscore(LAST_ACCESS_KEY, session_id)
+                if score is not None:
+                    await ring.shard_for(session_id).client().zadd(LAST_ACCESS_KEY, {session_id: score})
+                    await src.zrem(LAST_ACCESS_KEY, session_id)
+    finally:
+        await ring.close()
+        await sources.close()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebalance ORACLE session keys across Redis shards")
+    parser.add_argument("--from", dest="from_urls", required=True, help="current comma-separated REDIS_URLS")
+    parser.add_argument("--to", dest="to_urls", required=True, help="new comma-separated REDIS_URLS")
+    parser.add_argument("--dry-run", action="store_true", help="count keys to move without moving them")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    split = lambda urls: [u.strip() for u in urls.split(",") if u.strip()]
+    stats = asyncio.run(rebalance(split(args.from_urls), split(args.to_urls), dry_run=args.dry_run))
+    logger.info("Done: %s", stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,532 @@
 """
 Redis persistence layer with automatic in-memory fallback.
-Stores sessions and map snapshots for timeline scrubbing.
+Stores sessions (one hash field per state section) and map snapshots for
+timeline scrubbing, sharded across REDIS_URLS by session id. Saves can go
+through a write-behind queue (see agent/write_behind.py).
+Idle sessions are tiered out to a compressed local archive and rehydrated
+on first access (see agent/archive_store.py).
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import Optional
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Iterable, NamedTuple, Optional, get_type_hints
 
 import redis.asyncio as aioredis
+from pydantic import TypeAdapter
+from redis.exceptions import ResponseError, WatchError
 
-from config import REDIS_URL
+from config import (
+    REDIS_SHARD_HEALTH_INTERVAL,
+    REDIS_SHARD_VNODES,
+    REDIS_URLS,
+    SESSION_ARCHIVE_DIR,
+    SESSION_ARCHIVE_IDLE_SECONDS,
+    SESSION_ARCHIVE_INTERVAL,
+    SESSION_ARCHIVE_SEGMENT_BYTES,
+    WRITE_BEHIND_BATCH,
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_FLUSH_MS,
+    WRITE_BEHIND_MAX_PENDING,
+)
+from agent.archive_store import SessionArchive
+from agent.shard_ring import Shard, ShardRing
 from agent.state import MapState, OracleState
+from agent.write_behind import WriteBehindQueue
 
 logger = logging.getLogger(__name__)
 
 # ── Connection ──────────────────────────────────────────────────────
 
-_pool: Optional[aioredis.ConnectionPool] = None
-_fallback: dict[str, str] = {}  # in-memory fallback if Redis is down
+_ring: Optional[ShardRing] = None
+_fallback: dict[str, str | dict[str, str]] = {}  # in-memory fallback if Redis is down
 
 
-async def _get_redis() -> aioredis.Redis:
-    global _pool
-    if _pool is None:
-        _pool = aioredis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
-    return aioredis.Redis(connection_pool=_pool)
+def get_ring() -> ShardRing:
+    global _ring
+    if _ring is None:
+        _ring = ShardRing(REDIS_URLS, REDIS_SHARD_VNODES)
+    return _ring
 
 
-# ── Session CRUD ────────────────────────────────────────────────────
+async def _get_redis(session_id: str) -> aioredis.Redis:
+    """Client for the shard that owns `session_id` (raises ConnectionError while it is down)."""
+    return get_ring().shard_for(session_id).client()
+
+
+async def run_shard_health_checks(interval: int = REDIS_SHARD_HEALTH_INTERVAL) -> None:
+    """Background loop started from server startup."""
+    while True:
+        try:
+            await get_ring().check_health()
+        except Exception:
+            # Shards stay in their last known state; the next round tries again
+            logger.exception("Redis shard health check failed")
+        await asyncio.sleep(interval)
+
+
+# ── Keys ────────────────────────────────────────────────────────────
+# Every key of a session carries the session id as a hash tag, so the shard
+# ring (and Redis Cluster) keeps all of them on one node.
+
+
+def session_key(session_id: str) -> str:
+    return f"session:{{{session_id}}}"
+
+
+def snapshot_key(session_id: str, index: int | str) -> str:
+    return f"snapshot:{{{session_id}}}:{index}"
+
+
+def snapshot_index_key(session_id: str) -> str:
+    return f"snapshot_index:{{{session_id}}}"
+
+
+def tagged_key(key: str) -> str:
+    """Hash-tagged form of a pre-sharding key (session:abc → session:{abc}); tagged keys pass through."""
+    if "{" in key:
+        return key
+    kind, _, rest = key.partition(":")
+    if kind == "session":
+        return session_key(rest)
+    if kind == "snapshot_index":
+        return snapshot_index_key(rest)
+    if kind == "snapshot":
+        session_id, _, index = rest.rpartition(":")
+        return snapshot_key(session_id, index)
+    return key
+
+
+# ── Tiering (hot Redis → cold local archive) ────────────────────────
+
+LAST_ACCESS_KEY = "session_last_access"  # per-shard zset: session id → last access (epoch s)
+_archive: Optional[SessionArchive] = None
+
+
+def _get_archive() -> Optional[SessionArchive]:
+    """The cold tier, or None when tiering is disabled (idle threshold <= 0)."""
+    global _archive
+    if _archive is None and SESSION_ARCHIVE_IDLE_SECONDS > 0:
+        _archive = SessionArchive(SESSION_ARCHIVE_DIR, SESSION_ARCHIVE_SEGMENT_BYTES)
+    return _archive
+
+
+def _session_keys(session_id: str) -> tuple[str, str]:
+    return session_key(session_id), snapshot_index_key(session_id)
+
+
+async def _touch(r: aioredis.Redis, session_id: str) -> None:
+    if SESSION_ARCHIVE_IDLE_SECONDS > 0:
+        await r.zadd(LAST_ACCESS_KEY, {session_id: time.time()})
+
+
+async def _rehydrate(r: aioredis.Redis, session_id: str) -> bool:
+    """Restore an archived session into Redis. Returns True if anything was restored."""
+    archive = _get_archive()
+    if archive is None or session_id not in archive:
+        return False
+    record = await asyncio.to_thread(archive.get, session_id)
+    if record is None:
+        return False
+    async with r.pipeline(transaction=True) as pipe:
+        # Records archived before sharding hold untagged key names
+        for key, value in record.get("strings", {}).items():
+            pipe.set(tagged_key(key), value, nx=True)  # never clobber a newer hot write
+        for key, fields in record.get("hashes", {}).items():
+            for field, value in fields.items():
+                pipe.hsetnx(tagged_key(key), field, value)
+        for key, members in record.get("zsets", {}).items():
+            if members:
+                pipe.zadd(tagged_key(key), {m: score for m, score in members})
+        pipe.zadd(LAST_ACCESS_KEY, {session_id: time.time()})
+        await pipe.execute()
+    await asyncio.to_thread(archive.remove, session_id)
+    logger.info("Rehydrated archived session %s", session_id)
+    return True
+
+
+async def _archive_session(r: aioredis.Redis, session_id: str, cutoff: float) -> bool:
+    """
+    Move one session to the archive. WATCH guards against a write landing
+    between the read and the delete; on conflict the archive copy is dropped.
+    """
+    archive = _get_archive()
+    session_key, index_key = _session_keys(session_id)
+    async with r.pipeline(transaction=True) as pipe:
+        await pipe.watch(session_key, index_key)
+        score = await pipe.zscore(LAST_ACCESS_KEY, session_id)
+        if score is not None and score > cutoff:
+            await pipe.unwatch()
+            return False
+        snapshot_keys = [k async for k in r.scan_iter(f"{snapshot_key(session_id, '')}*")]
+        string_keys = [session_key] + snapshot_keys  # MGET skips a hash session key
+        values = await pipe.mget(string_keys)
+        sections = await pipe.hgetall(session_key) if await pipe.type(session_key) == "hash" else {}
+        index_members = await pipe.zrange(index_key, 0, -1, withscores=True)
+        record = {
+            "strings": {k: v for k, v in zip(string_keys, values) if v is not None},
+            "hashes": {session_key: sections} if sections else {},
+            "zsets": {index_key: [[m, s] for m, s in index_members]},
+        }
+        await asyncio.to_thread(archive.put_many, {session_id: record})
+        try:
+            pipe.multi()
+            pipe.delete(*string_keys, index_key)
+            pipe.zrem(LAST_ACCESS_KEY, session_id)
+            await pipe.execute()
+        except WatchError:
+            await asyncio.to_thread(archive.remove, session_id)
+            return False
+    _section_digests.pop(session_id, None)
+    return True
+
+
+async def archive_idle_sessions(
+    idle_seconds: int = SESSION_ARCHIVE_IDLE_SECONDS, batch: int = 100
+) -> int:
+    """Move sessions idle longer than idle_seconds to the archive. Returns the count moved."""
+    if _get_archive() is None:
+        return 0
+    cutoff = time.time() - idle_seconds
+    moved = 0
+    for shard in get_ring().shards:
+        try:
+            r = shard.client()
+            idle = await r.zrangebyscore(LAST_ACCESS_KEY, "-inf", cutoff, start=0, num=batch)
+            for session_id in idle:
+                if await _archive_session(r, session_id, cutoff):
+                    moved += 1
+        except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
+            logger.warning("Redis shard %s unavailable — skipping its archive pass", shard.url)
+    if moved:
+        logger.info("Archived %d idle sessions", moved)
+    return moved
+
+
+async def run_archiver(interval: int = SESSION_ARCHIVE_INTERVAL) -> None:
+    """Background loop started from server startup."""
+    while True:
+        try:
+            while await archive_idle_sessions() > 0:
+                pass
+        except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
+            logger.warning("Redis unavailable — skipping archive pass")
+        except Exception:
+            # One bad session must not stop archiving for the life of the process
+            logger.exception("Archive pass failed")
+        await asyncio.sleep(interval)
+
+
+# ── Session sections ────────────────────────────────────────────────
+# A session is a Redis hash with one field per top-level OracleState key, so
+# callers can load or save only the sections they need. Each field holds that
+# section's JSON and is validated on its own; VERSION_FIELD counts writes.
+
+_SECTION_TYPES = {
+    name: hint
+    for name, hint in get_type_hints(OracleState, include_extras=True).items()
+    if name != "copilotkit"  # injected by CopilotKit on every run, never persisted
+}
+SESSION_SECTIONS = tuple(_SECTION_TYPES)
+
+# Hash field counting writes to the session; every section write bumps it
+# in the same transaction
+VERSION_FIELD = "_v"
+
+# Session id → (version, digest of each section as of that version), as
+# last written or read by this process. A flush skips unchanged sections
+# only while Redis still holds that version, i.e. nobody else wrote since.
+_section_digests: OrderedDict[str, tuple[int, dict[str, bytes]]] = OrderedDict()
+_MAX_DIGEST_SESSIONS = 1024
+
+
+@lru_cache(maxsize=None)
+def _section_adapter(section: str) -> TypeAdapter:
+    return TypeAdapter(_SECTION_TYPES[section])
+
+
+def _digest(raw: str) -> bytes:
+    return hashlib.blake2b(raw.encode(), digest_size=8).digest()
+
+
+def _remember_digests(session_id: str, version: int, raw: dict[str, str], carry: bool = False) -> None:
+    """Record `raw` as the session's sections at `version`; `carry` keeps digests from the version before."""
+    old_version, digests = _section_digests.pop(session_id, (None, {}))
+    if old_version != version and not carry:
+        digests = {}
+    digests.update({name: _digest(value) for name, value in raw.items()})
+    _section_digests[session_id] = (version, digests)
+    if len(_section_digests) > _MAX_DIGEST_SESSIONS:
+        _section_digests.popitem(last=False)
+
+
+def _dump_sections(state: dict) -> dict[str, str]:
+    return {
+        name: _section_adapter(name).dump_json(value, warnings=False).decode()
+        for name, value in state.items()
+        if name in _SECTION_TYPES
+    }
+
+
+def _load_sections(raw: dict[str, str]) -> dict:
+    return {
+        name: _section_adapter(name).validate_json(value)
+        for name, value in raw.items()
+        if value is not None and name in _SECTION_TYPES
+    }
+
+
+async def _migrate_legacy_session(r: aioredis.Redis, key: str) -> None:
+    """Convert a session stored as one JSON string into a section hash."""
+    async with r.pipeline(transaction=True) as pipe:
+        await pipe.watch(key)
+        if await pipe.type(key) != "string":
+            await pipe.unwatch()
+            return
+        fields = _dump_sections(json.loads(await pipe.get(key)))
+        pipe.multi()
+        pipe.delete(key)
+        if fields:
+            pipe.hset(key, mapping=fields)
+        await pipe.execute()
+    logger.info("Migrated %s to a section hash", key)
+
+
+# ── Writes (inline or write-behind) ─────────────────────────────────
+# Session and snapshot saves go through _flush_writes: directly, or — with
+# WRITE_BEHIND_ENABLED — via a background queue that coalesces writes per key
+# and pipelines one batch per shard. Loaders overlay queued writes, so a
+# process always reads its own writes.
+
+
+class _Write(NamedTuple):
+    kind: str  # "session" | "snapshot"
+    session_id: str
+    data: Any  # session: {section: json}, snapshot: json
+    index: int = 0
+
 
+def _merge_writes(old: _Write, new: _Write) -> _Write:
+    if new.kind == "session":
+        return new._replace(data={**old.data, **new.data})
+    return new
 
-async def save_session(session_id: str, state: OracleState) -> None:
-    key = f"session:{session_id}"
-    data = state.model_dump_json()
+
+def _queue_write(pipe, key: str, write: _Write) -> int:
+    """Add a write's commands to `pipe`. Returns how many were added."""
+    count = 0
+    if write.kind != "session":
+        pipe.set(key, write.data)
+        pipe.zadd(snapshot_index_key(write.session_id), {str(write.index): write.index})
+        count = 2
+    elif write.data:
+        pipe.hset(key, mapping=write.data)
+        pipe.hincrby(key, VERSION_FIELD, 1)
+        count = 2
+    if SESSION_ARCHIVE_IDLE_SECONDS > 0:
+        pipe.zadd(LAST_ACCESS_KEY, {write.session_id: time.time()})
+        count += 1
+    return count
+
+
+async def _read_versions(r: aioredis.Redis, writes: list[tuple[str, _Write]]) -> dict[str, int]:
+    """Current version of the sessions this process holds digests for."""
+    keys = [key for key, write in writes if write.kind == "session" and write.session_id in _section_digests]
+    if not keys:
+        return {}
+    async with r.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hget(key, VERSION_FIELD)
+        values = await pipe.execute(raise_on_error=False)
+    return {key: int(v) for key, v in zip(keys, values) if v is not None and not isinstance(v, ResponseError)}
+
+
+def _drop_unchanged(write: _Write, version: Optional[int]) -> tuple[_Write, dict[str, str]]:
+    """Split off the sections Redis already holds at `version`. Returns (write, skipped sections)."""
+    known_version, digests = _section_digests.get(write.session_id, (None, {}))
+    if version is None or known_version != version:
+        return write, {}
+    skipped = {n: v for n, v in write.data.items() if digests.get(n) == _digest(v)}
+    if not skipped:
+        return write, {}
+    return write._replace(data={n: v for n, v in write.data.items() if n not in skipped}), skipped
+
+
+def _fallback_write(key: str, write: _Write) -> None:
+    if write.kind == "session":
+        _fallback.setdefault(key, {}).update(write.data)
+    else:
+        _fallback[key] = write.data
+
+
+async def _flush_shard(shard: Shard, writes: list[tuple[str, _Write]]) -> None:
     try:
-        r = await _get_redis()
-        await r.set(key, data)
+        r = shard.client()
+        versions = await _read_versions(r, writes)
+        plan = [
+            (key, *_drop_unchanged(write, versions.get(key))) if write.kind == "session" else (key, write, {})
+            for key, write in writes
+        ]
+        # A transaction, so each section write and its version bump are applied together
+        async with r.pipeline(transaction=True) as pipe:
+            counts = [_queue_write(pipe, key, write) for key, write, _ in plan]
+            results = await pipe.execute(raise_on_error=False)
+        pos = 0
+        for (key, write, skipped), count in zip(plan, counts):
+            if write.kind == "session" and write.data:
+                session_id = write.session_id
+                version = results[pos + 1]
+                if isinstance(results[pos], ResponseError):
+                    # Pre-hash session stored as a single string
+                    await _migrate_legacy_session(r, key)
+                    await r.hset(key, mapping=write.data)
+                    _section_digests.pop(session_id, None)
+                elif key in versions and version != versions[key] + 1 and skipped:
+                    # Another writer got in after the version read — write what was skipped too
+                    await r.hset(key, mapping=skipped)
+                    _section_digests.pop(session_id, None)
+                else:
+                    carry = key in versions and version == versions[key] + 1
+                    _remember_digests(session_id, version, write.data, carry=carry)
+            pos += count
     except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
-        logger.warning("Redis unavailable — using in-memory fallback for save_session")
-        _fallback[key] = data
+        logger.warning("Redis unavailable — using in-memory fallback for %d writes", len(writes))
+        for key, write in writes:
+            _fallback_write(key, write)
+            _section_digests.pop(write.session_id, None)
+
+
+async def _flush_writes(batch: dict[str, _Write]) -> None:
+    by_shard: dict[str, list[tuple[str, _Write]]] = {}
+    ring = get_ring()
+    for key, write in batch.items():
+        by_shard.setdefault(ring.shard_for(write.session_id).url, []).append((key, write))
+    shards = {shard.url: shard for shard in ring.shards}
+    await asyncio.gather(*(_flush_shard(shards[url], writes) for url, writes in by_shard.items()))
+
+
+_write_queue: Optional[WriteBehindQueue] = None
+
+
+def get_write_queue() -> WriteBehindQueue:
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = WriteBehindQueue(
+            _flush_writes,
+            max_pending=WRITE_BEHIND_MAX_PENDING,
+            interval=WRITE_BEHIND_FLUSH_MS / 1000,
+            batch_size=WRITE_BEHIND_BATCH,
+        )
+    return _write_queue
+
+
+async def _write(key: str, write: _Write) -> None:
+    if WRITE_BEHIND_ENABLED:
+        await get_write_queue().put(key, write, merge=_merge_writes)
+    else:
+        await _flush_writes({key: write})
+
+
+def _queued(key: str) -> Optional[_Write]:
+    return _write_queue.get(key) if _write_queue is not None else None
+
+
+async def flush_writes() -> None:
+    """Persist every queued write (server shutdown)."""
+    if _write_queue is not None:
+        await _write_queue.close()
+
+
+# ── Session CRUD ────────────────────────────────────────────────────
+
+
+async def save_session(session_id: str, state: dict) -> None:
+    """
+    Save the sections present in `state` — a full OracleState or a partial
+    dict like {"mapState": ...}. At flush, sections whose JSON matches what
+    this process last wrote or read are left out, as long as the session's
+    version in Redis shows nobody else has written since.
+    """
+    fields = _dump_sections(state)
+    if fields:
+        await _write(session_key(session_id), _Write("session", session_id, fields))
 
 
-async def load_session(session_id: str) -> Optional[OracleState]:
-    key = f"session:{session_id}"
+async def load_session(
+    session_id: str, sections: Iterable[str] | None = None
+) -> Optional[dict]:
+    """
+    Load a session. With `sections`, fetch and validate only those (e.g.
+    ("mapState",)) and return a partial dict; missing sections are omitted.
+    Returns None if the session does not exist.
+    """
+    key = session_key(session_id)
+    names = list(sections) if sections is not None else None
     try:
-        r = await _get_redis()
-        data = await r.get(key)
+        r = await _get_redis(session_id)
+        # A save after archiving starts a new, partial hash — restore the rest under it
+        await _rehydrate(r, session_id)
+        raw = await _read_sections(r, key, names)
+        version = raw.pop(VERSION_FIELD, None)
+        if raw:
+            await _touch(r, session_id)
+        if version is not None:
+            queued = _queued(key)
+            pending = queued.data if queued is not None else {}
+            _remember_digests(session_id, int(version), {n: v for n, v in raw.items() if n not in pending})
     except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
         logger.warning("Redis unavailable — using in-memory fallback for load_session")
-        data = _fallback.get(key)
+        stored = _fallback.get(key) or {}
+        raw = {n: stored[n] for n in (names if names is not None else stored) if n in stored}
 
-    if data is None:
+    queued = _queued(key)
+    if queued is not None:
+        raw.update({n: v for n, v in queued.data.items() if names is None or n in names})
+    if not raw:
         return None
-    return OracleState.model_validate_json(data)
+    return _load_sections(raw)
+
+
+async def _read_sections(
+    r: aioredis.Redis, key: str, names: list[str] | None
+) -> dict[str, str]:
+    for _ in range(2):
+        try:
+            if names is None:
+                return await r.hgetall(key)
+            fields = [*names, VERSION_FIELD]
+            values = await r.hmget(key, fields)
+            return {n: v for n, v in zip(fields, values) if v is not None}
+        except ResponseError:
+            await _migrate_legacy_session(r, key)
+    return {}
 
 
 async def delete_session(session_id: str) -> None:
+    if _write_queue is not None:
+        _write_queue.discard(list(_write_queue.keys(session_key(session_id))))
+        _write_queue.discard(list(_write_queue.keys(snapshot_key(session_id, ""))))
+        await _write_queue.flush()  # let in-flight writes land before deleting
     try:
-        r = await _get_redis()
-        keys = []
-        async for k in r.scan_iter(f"session:{session_id}"):
-            keys.append(k)
-        async for k in r.scan_iter(f"snapshot:{session_id}:*"):
+        r = await _get_redis(session_id)
+        keys = [session_key(session_id), snapshot_index_key(session_id)]
+        async for k in r.scan_iter(f"{snapshot_key(session_id, '')}*"):
             keys.append(k)
-        if keys:
-            await r.delete(*keys)
+        await r.delete(*keys)
+        await r.zrem(LAST_ACCESS_KEY, session_id)
+        archive = _get_archive()
+        if archive is not None:
+            await asyncio.to_thread(archive.remove, session_id)
     except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
         logger.warning("Redis unavailable — skipping delete_session")
+    finally:
+        _section_digests.pop(session_id, None)
         # Also clean fallback
         to_del = [k for k in _fallback if session_id in k]
         for k in to_del:
@@ -79,21 +537,21 @@ async def delete_session(session_id: str) -> None:
 
 
 async def save_snapshot(session_id: str, index: int, map_state: MapState) -> None:
-    key = f"snapshot:{session_id}:{index}"
-    data = map_state.model_dump_json()
-    try:
-        r = await _get_redis()
-        await r.set(key, data)
-    except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
-        logger.warning("Redis unavailable — using in-memory fallback for save_snapshot")
-        _fallback[key] = data
+    key = snapshot_key(session_id, index)
+    await _write(key, _Write("snapshot", session_id, map_state.model_dump_json(), index))
 
 
 async def load_snapshot(session_id: str, index: int) -> Optional[MapState]:
-    key = f"snapshot:{session_id}:{index}"
+    key = snapshot_key(session_id, index)
+    queued = _queued(key)
     try:
-        r = await _get_redis()
-        data = await r.get(key)
+        if queued is not None:
+            data = queued.data
+        else:
+            r = await _get_redis(session_id)
+            data = await r.get(key)
+            if data is None and await _rehydrate(r, session_id):
+                data = await r.get(key)
     except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
         logger.warning("Redis unavailable — using in-memory fallback for load_snapshot")
         data = _fallback.get(key)
@@ -101,3 +559,68 @@ async def load_snapshot(session_id: str, index: int) -> Optional[MapState]:
     if data is None:
         return None
     return MapState.model_validate_json(data)
+
+
+# ── Raw snapshot access (timeline HTTP API) ─────────────────────────
+# These return the stored JSON text as-is so the API can hash and stream
+# it without a validate/re-serialize round trip.
+
+
+async def list_snapshot_indices(session_id: str) -> list[int]:
+    prefix = snapshot_key(session_id, "")
+    queued = [int(k[len(prefix):]) for k in _write_queue.keys(prefix)] if _write_queue is not None else []
+    try:
+        r = await _get_redis(session_id)
+        await _rehydrate(r, session_id)  # also when snapshots were saved after archiving
+        members = await r.zrange(snapshot_index_key(session_id), 0, -1)
+        if members:
+            return sorted({int(m) for m in members}.union(queued))
+        # Sessions saved before the index existed — fall back to a key scan
+        keys = [k async for k in r.scan_iter(f"{prefix}*")]
+    except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
+        logger.warning("Redis unavailable — using in-memory fallback for list_snapshot_indices")
+        keys = [k for k in _fallback if k.startswith(prefix)]
+
+    indices = set(queued)
+    for k in keys:
+        suffix = k[len(prefix):]
+        if suffix.isdigit():
+            indices.add(int(suffix))
+    return sorted(indices)
+
+
+async def load_snapshot_raw(session_id: str, index: int) -> Optional[str]:
+    key = snapshot_key(session_id, index)
+    queued = _queued(key)
+    if queued is not None:
+        return queued.data
+    try:
+        r = await _get_redis(session_id)
+        data = await r.get(key)
+        if data is None and await _rehydrate(r, session_id):
+            data = await r.get(key)
+        return data
+    except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
+        logger.warning("Redis unavailable — using in-memory fallback for load_snapshot_raw")
+        return _fallback.get(key)
+
+
+async def load_snapshot_range_raw(
+    session_id: str, start: int, end: int
+) -> list[tuple[int, str]]:
+    """Snapshots with start <= index < end, as (index, json) pairs, in one round trip."""
+    indices = [i for i in await list_snapshot_indices(session_id) if start <= i < end]
+    if not indices:
+        return []
+    keys = [snapshot_key(session_id, i) for i in indices]
+    try:
+        r = await _get_redis(session_id)
+        values = await r.mget(keys)
+    except (aioredis.ConnectionError, aioredis.TimeoutError, OSError):
+        logger.warning("Redis unavailable — using in-memory fallback for load_snapshot_range_raw")
+        values = [_fallback.get(k) for k in keys]
+    for pos, key in enumerate(keys):
+        queued = _queued(key)
+        if queued is not None:
+            values[pos] = queued.data
+    return [(i, v) for i, v in zip(indices, values) if v is not None]
@@ -0,0 +1,75 @@
+"""
+Response schemas for every Claude output format, built from the models in
+agent/state.py. They are bound as forced tools so Claude returns structured
+tool input instead of free text — no JSON extraction, no parse failures.
+Every field the validators in agent/validation.py require is required in
+the schema too; the validators still enforce the semantic rules.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from agent.state import CONFIDENCE, CONSTRAINT_TYPES, DIMENSIONS, MapEdge, MapNode
+
+
+class ExtractedConstraint(BaseModel):
+    dimension: DIMENSIONS
+    value: str = Field(description="The constraint in the user's words, condensed")
+    type: CONSTRAINT_TYPES = "shaper"
+    confidence: CONFIDENCE
+
+
+class ResponseNode(MapNode):
+    """A map node as Claude must return it: position and parent are required, as the validators expect."""
+
+    parentId: Optional[str] = Field(description="Id of the parent node; null only for the depth-0 root")
+    x: float = Field(ge=0, le=100)
+    y: float = Field(ge=0, le=100)
+
+
+class InterrogatorResponse(BaseModel):
+    """Submit constraints extracted from the latest answer and the next question."""
+
+    extractedConstraints: list[ExtractedConstraint] = Field(default_factory=list)
+    question: str = Field(description="One targeted question — never compound")
+    targetDimension: DIMENSIONS
+    constraintType: Optional[CONSTRAINT_TYPES] = None
+    isLastQuestion: bool
+
+
+class MapResponse(BaseModel):
+    """Submit the complete solution space map (12-15 nodes, one depth-0 root)."""
+
+    nodes: list[ResponseNode]
+    edges: list[MapEdge]
+
+
+class ExpanderResponse(BaseModel):
+    """Submit 3-5 child nodes for the clicked node."""
+
+    childNodes: list[ResponseNode]
+    childEdges: list[MapEdge] = Field(default_factory=list)
+
+
+class ExpanderGroup(BaseModel):
+    parentId: str
+    childNodes: list[ResponseNode]
+
+
+class MultiExpanderResponse(BaseModel):
+    """Submit 3-5 child nodes for each requested parent, one group per parent."""
+
+    groups: list[ExpanderGroup]
+
+
+class ForkPatchResponse(BaseModel):
+    """Submit replacement nodes for the affected part of the map."""
+
+    nodes: list[ResponseNode]
+
+
+# Fork regeneration returns a whole map
+ForkResponse = MapResponse
@@ -5,22 +5,39 @@ Exposes the LangGraph agent via AG-UI protocol for CopilotKit.
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import logging
 import sys
 from pathlib import Path
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Ensure the agent package is importable
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from ag_ui.core import EventType, RunErrorEvent, RunFinishedEvent, RunStartedEvent
 from ag_ui_langgraph import add_langgraph_fastapi_endpoint
 from copilotkit import LangGraphAGUIAgent
 
-from config import AGENT_HOST, AGENT_PORT
+from config import (
+    ADMIN_TOKEN,
+    AGENT_HOST,
+    AGENT_PORT,
+    SERIALIZE_SESSION_RUNS,
+    SESSION_ARCHIVE_IDLE_SECONDS,
+    TENANT_HEADER,
+)
+from agent import branch_store, inflight, lod, profiling, token_budget, warm_start
 from agent.graph import oracle_graph, init_async_checkpointer
+from agent.map_api import router as map_router
+from agent.nodes import http_pool
+from agent.nodes.llm_caller import hedge_policy, stream_report, warm_connections
+from agent.redis_store import flush_writes, get_ring, run_archiver, run_shard_health_checks
+from agent.timeline_api import router as timeline_router
 
 logging.basicConfig(
     level=logging.INFO,
@@ -44,11 +61,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# The tenant of the current request, from the header a trusted auth proxy sets.
+# Never taken from the request body: a client could pick a fresh tenant per run.
+_request_tenant: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "oracle_request_tenant", default=None
+)
+
+
+@app.middleware("http")
+async def bind_request_tenant(request: Request, call_next):
+    _request_tenant.set(request.headers.get(TENANT_HEADER) if TENANT_HEADER else None)
+    return await call_next(request)
+
+
 # ── Register the agent via AG-UI protocol ────────────────────────────
 
+
+class OracleAGUIAgent(LangGraphAGUIAgent):
+    """
+    Sends large maps as level-of-detail views (agent/lod.py) and leaves the
+    branch node pool out of snapshots (agent/branch_store.py), runs a thread's
+    requests one at a time, merging queued clicks (agent/inflight.py), and
+    profiles runs an admin asked for (agent/profiling.py).
+    """
+
+    async def run(self, input):
+        # Claude calls made for this run count against its session's and tenant's budgets
+        props = input.forwarded_props if isinstance(input.forwarded_props, dict) else {}
+        token_budget.bind(input.thread_id, _request_tenant.get())
+        profile = profiling.begin(input.thread_id, input.run_id, props)
+        try:
+            if not SERIALIZE_SESSION_RUNS:
+                async for event in super().run(input):
+                    yield event
+                return
+            started = False
+            try:
+                async for event in inflight.stream(input.thread_id, input, super().run):
+                    started = True
+                    yield event
+            except inflight.Merged:
+                # This click was expanded as part of another request's run, which has finished
+                yield RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input.thread_id, run_id=input.run_id)
+                yield RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=input.thread_id, run_id=input.run_id)
+            except inflight.MergedRunFailed:
+                yield RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input.thread_id, run_id=input.run_id)
+                yield RunErrorEvent(
+                    type=EventType.RUN_ERROR, message="The run this request was merged into failed", code="merged_run_failed"
+                )
+            except inflight.Superseded:
+                if not started:
+                    yield RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input.thread_id, run_id=input.run_id)
+                yield RunErrorEvent(type=EventType.RUN_ERROR, message="Superseded by a newer run", code="superseded")
+        finally:
+            if profile is not None:
+                profiling.end(profile)
+
+    def get_state_snapshot(self, state):
+        # The node pool stays in the checkpoint; branch maps are served by map_api
+        return lod.view_state(branch_store.without_pool(super().get_state_snapshot(state)))
+
+    async def prepare_stream(self, input, agent_state, config):
+        # A client holding a view sends it back — run on the checkpoint's full map.
+        # So does a run that waited behind another: its map predates that run's result.
+        if input.state and "mapState" in input.state:
+            input.state["mapState"] = lod.restore_map_state(
+                input.state["mapState"], agent_state.values.get("mapState"), stale=inflight.queued()
+            )
+        return await super().prepare_stream(input, agent_state, config)
+
+
 add_langgraph_fastapi_endpoint(
     app=app,
-    agent=LangGraphAGUIAgent(
+    agent=OracleAGUIAgent(
         name="oracle_agent",
         description="ORACLE strategic advisor — interrogates, maps, expands, and forks solution spaces.",
         graph=oracle_graph,
@@ -57,18 +142,111 @@ add_langgraph_fastapi_endpoint(
 )
 
 
-# ── Health check ─────────────────────────────────────────────────────
+# ── Timeline scrubber API ─────────────────────────────────────────────
+
+app.include_router(timeline_router)
+app.include_router(map_router)
+
+
+# ── Metrics ──────────────────────────────────────────────────────────
+# GET /health belongs to the AG-UI endpoint (ag_ui_langgraph registers it on
+# this app), so the process's reports live here.
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "agent": "oracle_agent",
+        "redisShards": get_ring().status(),
+        "warmStart": warm_start.report(),
+        "inflight": inflight.report(),
+        "tokens": token_budget.report(),
+        "llmHttp": http_pool.report(),
+        "llmHedging": hedge_policy.snapshot(),
+        "llmStreams": stream_report(),
+    }
+
+
+@app.get("/sessions/{session_id}/usage")
+async def session_usage(session_id: str):
+    """Claude token usage of one session (this process), per node."""
+    usage = token_budget.session_usage(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="No Claude calls recorded for this session")
+    return usage
 
-@app.get("/health")
-async def health():
-    return {"status": "ok", "agent": "oracle_agent"}
 
+# ── Admin: on-demand profiling ───────────────────────────────────────
 
-# ── Startup: swap in async Redis checkpointer ───────────────────────
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiling.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+admin = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@admin.post("/profiles/sessions/{session_id}")
+async def arm_session_profile(
+    session_id: str,
+    mode: str = Query(profiling.CPROFILE, pattern="^(cprofile|sample)$"),
+    runs: int = Query(1, ge=1, le=100),
+):
+    """Profile the session's next `runs` graph runs."""
+    profiling.arm(session_id, mode, runs)
+    return {"sessionId": session_id, "mode": mode, "runs": runs}
+
+
+@admin.delete("/profiles/sessions/{session_id}")
+async def disarm_session_profile(session_id: str):
+    if not profiling.disarm(session_id):
+        raise HTTPException(status_code=404, detail="Session is not armed for profiling")
+    return {"sessionId": session_id}
+
+
+@admin.get("/profiles")
+async def list_profiles():
+    return {"armed": profiling.armed(), "profiles": profiling.results()}
+
+
+@admin.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("text", pattern="^(text|raw)$")):
+    """A profile as text (pstats summary or collapsed stacks), or raw (pstats dump or collapsed stacks)."""
+    profile = profiling.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return PlainTextResponse(profile.text())
+    if profile.mode == profiling.SAMPLE:
+        return PlainTextResponse(profile.data)
+    return Response(
+        content=profile.data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile.id}.pstats"'},
+    )
+
+
+app.include_router(admin)
+
+
+# ── Startup: swap in async Redis checkpointer, start shard health checks and session tiering, load the warm start index, warm Claude connections ─
 
 @app.on_event("startup")
 async def on_startup():
     await init_async_checkpointer()
+    app.state.shard_health = asyncio.create_task(run_shard_health_checks())
+    if SESSION_ARCHIVE_IDLE_SECONDS > 0:
+        app.state.archiver = asyncio.create_task(run_archiver())
+    await warm_start.load()
+    # In the background: an unreachable API must not hold up startup
+    app.state.llm_warmup = asyncio.create_task(warm_connections())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await flush_writes()
+    await http_pool.close()
 
 
 # ── Run ──────────────────────────────────────────────────────────────
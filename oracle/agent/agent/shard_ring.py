@@ -0,0 +1,112 @@
+"""
+Client-side sharding of session data across several Redis instances.
+Every session key carries a hash tag — session:{sid}, snapshot:{sid}:3 — and
+the ring hashes only the tag, so all keys of a session live on one shard.
+Consistent hashing with virtual nodes means adding a shard moves only about
+1/N of the sessions (see agent/rebalance.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Backoff before an unhealthy shard is tried again
+_RETRY_BASE = 1.0
+_RETRY_MAX = 30.0
+
+
+def hash_tag(key: str) -> str:
+    """The part of `key` between the first '{' and the next '}' (Redis Cluster rules), else the key."""
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class Shard:
+    """One Redis instance: its connection pool and health."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.pool = aioredis.ConnectionPool.from_url(url, decode_responses=True)
+        self.healthy = True
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = ""
+
+    def client(self) -> aioredis.Redis:
+        """A client on this shard's pool. Raises ConnectionError while the shard is marked down."""
+        if not self.healthy and time.monotonic() < self.retry_at:
+            raise aioredis.ConnectionError(f"shard {self.url} is down: {self.last_error}")
+        return aioredis.Redis(connection_pool=self.pool)
+
+    def record_failure(self, exc: BaseException) -> None:
+        self.failures += 1
+        self.healthy = False
+        self.last_error = str(exc) or type(exc).__name__
+        self.retry_at = time.monotonic() + min(_RETRY_MAX, _RETRY_BASE * 2 ** (self.failures - 1))
+        logger.warning("Redis shard %s marked down (%d failures): %s", self.url, self.failures, self.last_error)
+
+    def record_success(self) -> None:
+        if not self.healthy:
+            logger.info("Redis shard %s is back up", self.url)
+        self.healthy = True
+        self.failures = 0
+
+    def status(self) -> dict:
+        return {"url": self.url, "healthy": self.healthy, "failures": self.failures, "lastError": self.last_error}
+
+
+class ShardRing:
+    """Consistent-hash ring over Redis shards, keyed by session id."""
+
+    def __init__(self, urls: list[str], vnodes: int = 160):
+        if not urls:
+            raise ValueError("ShardRing needs at least one Redis URL")
+        self.shards = [Shard(url) for url in dict.fromkeys(urls)]
+        points = sorted(
+            (_point(f"{shard.url}#{v}"), i)
+            for i, shard in enumerate(self.shards)
+            for v in range(vnodes)
+        )
+        self._points = [p for p, _ in points]
+        self._owners = [i for _, i in points]
+
+    def shard_for(self, session_id: str) -> Shard:
+        i = bisect.bisect(self._points, _point(session_id)) % len(self._points)
+        return self.shards[self._owners[i]]
+
+    def shard_for_key(self, key: str) -> Shard:
+        return self.shard_for(hash_tag(key))
+
+    async def check_health(self, timeout: float = 2.0) -> None:
+        async def ping(shard: Shard) -> None:
+            try:
+                client = aioredis.Redis(connection_pool=shard.pool)
+                await asyncio.wait_for(client.ping(), timeout)
+                shard.record_success()
+            except (aioredis.ConnectionError, aioredis.TimeoutError, asyncio.TimeoutError, OSError) as exc:
+                shard.record_failure(exc)
+
+        await asyncio.gather(*(ping(shard) for shard in self.shards))
+
+    def status(self) -> list[dict]:
+        return [shard.status() for shard in self.shards]
+
+    async def close(self) -> None:
+        for shard in self.shards:
+            await shard.pool.disconnect()
@@ -0,0 +1,190 @@
+"""
+Local near-duplicate detection for node labels.
+Character 3-gram shingles → MinHash signatures → LSH buckets, so each lookup
+only compares against a handful of candidates instead of every node. Used by
+the map nodes to drop or merge near-duplicate nodes without another LLM call.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from collections import OrderedDict
+
+from config import DEDUP_THRESHOLD
+
+_NUM_PERM = 64
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+
+_BIN_BITS = 6  # 2**6 == _NUM_PERM bins
+_BIN_MASK = _NUM_PERM - 1
+
+
+def normalize_label(label: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", label.lower()).split())
+
+
+def shingles(label: str, k: int = 3) -> frozenset[int]:
+    text = f" {normalize_label(label)} "
+    if len(text) <= k:
+        return frozenset({zlib.crc32(text.encode())})
+    return frozenset(zlib.crc32(text[i:i + k].encode()) for i in range(len(text) - k + 1))
+
+
+def minhash(shingle_set: frozenset[int]) -> tuple[int, ...]:
+    """
+    One-permutation MinHash: each shingle hash lands in one of _NUM_PERM bins
+    and every bin keeps its minimum, so a signature costs one pass over the
+    shingles instead of one per permutation. Empty bins borrow the next
+    filled bin's value (rotation densification) so short labels still get
+    comparable signatures. Candidates are re-checked with exact Jaccard.
+    """
+    sig: list[int | None] = [None] * _NUM_PERM
+    for h in shingle_set:
+        b = h & _BIN_MASK
+        v = h >> _BIN_BITS
+        if sig[b] is None or v < sig[b]:
+            sig[b] = v
+    if None in sig:
+        for i in range(_NUM_PERM):
+            if sig[i] is None:
+                step = 1
+                while sig[(i + step) % _NUM_PERM] is None:
+                    step += 1
+                # Offset by distance so borrowed values differ from the original
+                sig[i] = sig[(i + step) % _NUM_PERM] + (step << 26)
+    return tuple(sig)
+
+
+def jaccard(a: frozenset[int], b: frozenset[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class LabelIndex:
+    """Incremental near-duplicate index over node labels."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._shingles: dict[str, frozenset[int]] = {}
+        self._labels: dict[str, str] = {}
+        self._signatures: dict[str, tuple[int, ...]] = {}
+        self._buckets: list[dict[tuple[int, ...], list[str]]] = [{} for _ in range(_BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._labels
+
+    def add(self, node_id: str, label: str) -> None:
+        """Index a node; an id already indexed is relabelled."""
+        self.remove(node_id)
+        sh = shingles(label)
+        sig = minhash(sh)
+        self._shingles[node_id] = sh
+        self._labels[node_id] = label
+        self._signatures[node_id] = sig
+        for band in range(_BANDS):
+            key = sig[band * _ROWS:(band + 1) * _ROWS]
+            self._buckets[band].setdefault(key, []).append(node_id)
+
+    def remove(self, node_id: str) -> None:
+        sig = self._signatures.pop(node_id, None)
+        if sig is None:
+            return
+        del self._shingles[node_id]
+        del self._labels[node_id]
+        for band in range(_BANDS):
+            key = sig[band * _ROWS:(band + 1) * _ROWS]
+            bucket = self._buckets[band][key]
+            bucket.remove(node_id)
+            if not bucket:
+                del self._buckets[band][key]
+
+    def sync(self, nodes: list[dict]) -> None:
+        """Bring the index in line with `nodes`, hashing only new or relabelled nodes."""
+        current = {n["id"]: n["label"] for n in nodes}
+        for node_id in [i for i in self._labels if i not in current]:
+            self.remove(node_id)
+        for node_id, label in current.items():
+            if self._labels.get(node_id) != label:
+                self.add(node_id, label)
+
+    def find_duplicate(self, label: str) -> str | None:
+        """Id of the most similar indexed node at or above the threshold, else None."""
+        sh = shingles(label)
+        sig = minhash(sh)
+        candidates: set[str] = set()
+        for band in range(_BANDS):
+            candidates.update(self._buckets[band].get(sig[band * _ROWS:(band + 1) * _ROWS], ()))
+        best_id, best_score = None, self.threshold
+        for node_id in candidates:
+            score = jaccard(sh, self._shingles[node_id])
+            if score >= best_score:
+                best_id, best_score = node_id, score
+        return best_id
+
+
+# Per-session indexes so each expansion only hashes the nodes added since the last one
+_session_indexes: OrderedDict[str, LabelIndex] = OrderedDict()
+_MAX_SESSION_INDEXES = 256
+
+
+def index_for(session_key: str, nodes: list[dict]) -> LabelIndex:
+    """The cached index for a session, synced to `nodes`."""
+    index = _session_indexes.pop(session_key, None) or LabelIndex()
+    _session_indexes[session_key] = index
+    if len(_session_indexes) > _MAX_SESSION_INDEXES:
+        _session_indexes.popitem(last=False)
+    index.sync(nodes)
+    return index
+
+
+def dedupe_nodes(
+    nodes: list[dict], index: LabelIndex | None = None
+) -> tuple[list[dict], dict[str, str]]:
+    """
+    Drop nodes whose label near-duplicates one already in `index` (or an
+    earlier node in the list). Children of a dropped node are re-parented
+    onto the node it duplicated. Root nodes are never dropped.
+    Returns (kept_nodes, merged) where merged maps dropped id → surviving id.
+    The index is updated in place with the kept nodes, so their ids must not
+    collide with indexed nodes — rename colliding ids first.
+    """
+    index = index if index is not None else LabelIndex()
+    kept: list[dict] = []
+    merged: dict[str, str] = {}
+    for node in nodes:
+        dup = None if node.get("depth") == 0 else index.find_duplicate(node["label"])
+        if dup is not None:
+            merged[node["id"]] = dup
+            continue
+        index.add(node["id"], node["label"])
+        kept.append(node)
+
+    if merged:
+        for node in kept:
+            parent_id = node.get("parentId")
+            while parent_id in merged:
+                parent_id = merged[parent_id]
+            node["parentId"] = parent_id
+    return kept, merged
+
+
+def remap_edges(edges: list[dict], merged: dict[str, str]) -> list[dict]:
+    """Point edges at surviving nodes; drop self-loops and repeats left by merges."""
+    if not merged:
+        return edges
+    seen: set[tuple[str, str]] = set()
+    out: list[dict] = []
+    for edge in edges:
+        src = merged.get(edge["sourceId"], edge["sourceId"])
+        tgt = merged.get(edge["targetId"], edge["targetId"])
+        if src == tgt or (src, tgt) in seen:
+            continue
+        seen.add((src, tgt))
+        out.append({"sourceId": src, "targetId": tgt})
+    return out
@@ -0,0 +1,186 @@
+"""
+Spatial index over node positions on the 0–100 map plane.
+A uniform grid (the plane is bounded, so no tree is needed): each cell keeps
+the ids of the nodes inside it, and range / radius / nearest-neighbour
+queries only visit the cells that overlap the query. Used to fan expander
+children out to collision-free spots and to cut viewport views (agent/lod.py).
+"""
+
+from __future__ import annotations
+
+import math
+from collections import OrderedDict
+from typing import Optional
+
+from config import NODE_MIN_DISTANCE, SPATIAL_CELL_SIZE
+
+PLANE_MIN = 0.0
+PLANE_MAX = 100.0
+# Placed children keep this far from the plane's edges
+_EDGE_MARGIN = 2.0
+_FAN_STEPS = 24
+_FAN_RINGS = 6
+
+
+def _clamp(value: float, lo: float = PLANE_MIN, hi: float = PLANE_MAX) -> float:
+    return min(hi, max(lo, value))
+
+
+class GridIndex:
+    """Incremental point index: node id → (x, y), bucketed by grid cell."""
+
+    def __init__(self, cell_size: float = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells_per_side = max(1, math.ceil((PLANE_MAX - PLANE_MIN) / cell_size))
+        self._points: dict[str, tuple[float, float]] = {}
+        self._cells: dict[tuple[int, int], set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._points
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        last = self._cells_per_side - 1
+        return (
+            min(last, max(0, int((x - PLANE_MIN) // self.cell_size))),
+            min(last, max(0, int((y - PLANE_MIN) // self.cell_size))),
+        )
+
+    def add(self, node_id: str, x: float, y: float) -> None:
+        if node_id in self._points:
+            self.remove(node_id)
+        self._points[node_id] = (x, y)
+        self._cells.setdefault(self._cell(x, y), set()).add(node_id)
+
+    def remove(self, node_id: str) -> None:
+        point = self._points.pop(node_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(node_id)
+            if not members:
+                del self._cells[cell]
+
+    def sync(self, nodes: list[dict]) -> None:
+        """Bring the index in line with `nodes`, touching only new, moved or removed nodes."""
+        current = {n["id"]: (n.get("x", 50.0), n.get("y", 50.0)) for n in nodes}
+        for node_id in [i for i in self._points if i not in current]:
+            self.remove(node_id)
+        for node_id, point in current.items():
+            if self._points.get(node_id) != point:
+                self.add(node_id, *point)
+
+    def _cells_in(self, x0: float, y0: float, x1: float, y1: float):
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                members = self._cells.get((cx, cy))
+                if members:
+                    yield members
+
+    def range(self, x0: float, y0: float, x1: float, y1: float) -> list[str]:
+        """Ids of nodes inside the rectangle (edges inclusive)."""
+        out = []
+        for members in self._cells_in(x0, y0, x1, y1):
+            for node_id in members:
+                x, y = self._points[node_id]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    out.append(node_id)
+        return out
+
+    def within(self, x: float, y: float, radius: float, exclude: Optional[str] = None) -> list[str]:
+        """Ids of nodes closer than `radius` to (x, y)."""
+        r2 = radius * radius
+        out = []
+        for members in self._cells_in(x - radius, y - radius, x + radius, y + radius):
+            for node_id in members:
+                px, py = self._points[node_id]
+                if node_id != exclude and (px - x) ** 2 + (py - y) ** 2 < r2:
+                    out.append(node_id)
+        return out
+
+    def nearest(self, x: float, y: float, k: int = 1, exclude: Optional[str] = None) -> list[tuple[float, str]]:
+        """Up to `k` (distance, id) pairs, closest first. Searches rings of cells outwards."""
+        cx, cy = self._cell(x, y)
+        found: list[tuple[float, str]] = []
+        for ring in range(self._cells_per_side):
+            for i in range(cx - ring, cx + ring + 1):
+                for j in range(cy - ring, cy + ring + 1):
+                    if ring and i not in (cx - ring, cx + ring) and j not in (cy - ring, cy + ring):
+                        continue  # interior cells were visited by earlier rings
+                    for node_id in self._cells.get((i, j), ()):
+                        if node_id != exclude:
+                            px, py = self._points[node_id]
+                            found.append((math.hypot(px - x, py - y), node_id))
+            # Anything in ring r+1 or beyond is at least r cells away
+            if len(found) >= k and sorted(found)[k - 1][0] <= ring * self.cell_size:
+                break
+        found.sort()
+        return found[:k]
+
+
+def _is_free(index: GridIndex, x: float, y: float, min_distance: float) -> bool:
+    return not index.within(x, y, min_distance)
+
+
+def place_children(
+    index: GridIndex,
+    parent: dict,
+    children: list[dict],
+    min_distance: float = NODE_MIN_DISTANCE,
+) -> int:
+    """
+    Keep each child where Claude put it unless another node is closer than
+    `min_distance`. Otherwise move it to the nearest free spot on a fan of
+    rings around the parent, starting in the direction Claude chose. Children
+    are added to the index as they are placed, so siblings avoid each other too.
+    Returns the number of children moved.
+    """
+    px, py = parent.get("x", 50.0), parent.get("y", 50.0)
+    lo, hi = PLANE_MIN + _EDGE_MARGIN, PLANE_MAX - _EDGE_MARGIN
+    moved = 0
+    for child in children:
+        x = _clamp(float(child.get("x", px)))
+        y = _clamp(float(child.get("y", py)))
+        if not _is_free(index, x, y, min_distance):
+            angle = math.atan2(y - py, x - px) if (x, y) != (px, py) else 0.0
+            radius = max(min_distance * 1.5, math.hypot(x - px, y - py))
+            spot = None
+            for ring in range(_FAN_RINGS):
+                r = radius + ring * min_distance
+                for step in range(_FAN_STEPS):
+                    # 0, +1, -1, +2, -2, ... steps away from the preferred direction
+                    offset = (step + 1) // 2 * (1 if step % 2 else -1)
+                    a = angle + offset * 2 * math.pi / _FAN_STEPS
+                    cx, cy = px + r * math.cos(a), py + r * math.sin(a)
+                    if lo <= cx <= hi and lo <= cy <= hi and _is_free(index, cx, cy, min_distance):
+                        spot = (cx, cy)
+                        break
+                if spot is not None:
+                    break
+            if spot is not None:
+                x, y = spot
+                moved += 1
+        child["x"], child["y"] = round(x, 1), round(y, 1)
+        index.add(child["id"], child["x"], child["y"])
+    return moved
+
+
+# Per-session indexes so each expansion only re-buckets nodes added or moved since the last one
+_session_indexes: OrderedDict[str, GridIndex] = OrderedDict()
+_MAX_SESSION_INDEXES = 256
+
+
+def index_for(session_key: str, nodes: list[dict]) -> GridIndex:
+    """The cached index for a session, synced to `nodes`."""
+    index = _session_indexes.pop(session_key, None) or GridIndex()
+    _session_indexes[session_key] = index
+    if len(_session_indexes) > _MAX_SESSION_INDEXES:
+        _session_indexes.popitem(last=False)
+    index.sync(nodes)
+    return index
@@ -0,0 +1,113 @@
+"""
+Speculative map generation.
+Once the interrogator asks its final confirmation question the constraints
+are effectively settled, so the map is generated in the background while the
+user reads the question. When the answer arrives, map_generator adopts the
+speculative result if the constraints are unchanged; otherwise it is
+cancelled and the map is regenerated.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import re
+from typing import Awaitable, Callable
+
+from config import SPECULATIVE_MAP_TTL
+from agent import token_budget
+
+logger = logging.getLogger(__name__)
+
+# Answers made only of these words carry no new constraint ("looks good",
+# "that's everything", ...). Whether "yes" or "no" confirms depends on the
+# question: "Is this right?" is confirmed by a yes, "Anything else?" by a no.
+_CONFIRMATION_WORDS = frozenset(
+    "sure ok okay looks look sounds good great fine that thats s it is its all "
+    "everything go ahead confirmed confirm please generate the map lgtm i m im "
+    "think so me we are set done thanks thank you".split()
+)
+_AFFIRMATIVE_WORDS = frozenset("yes yeah yep yup correct right exactly perfect".split())
+_NEGATIVE_WORDS = frozenset("no nope nah nothing none else to add changes".split())
+# Questions asking for more input ("Is there anything else ...?")
+_OPEN_QUESTION = re.compile(r"\b(anything|any|else|add|change|missing)\b")
+_MAX_CONFIRMATION_WORDS = 8
+
+# session key → (constraint fingerprint, task, expiry handle)
+_pending: dict[str, tuple[str, asyncio.Task, asyncio.TimerHandle]] = {}
+
+speculation_stats = {"started": 0, "used": 0, "discarded": 0, "expired": 0}
+
+
+def constraints_fingerprint(problem: str, constraints: list[dict]) -> str:
+    payload = json.dumps(
+        [problem] + [[c["dimension"], c["type"], c["value"]] for c in constraints]
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def is_confirmation(answer: str, question: str = "") -> bool:
+    """True if the answer only confirms `question` — no word in it could change a constraint."""
+    words = re.sub(r"[^a-z]+", " ", answer.lower()).split()
+    polar = _NEGATIVE_WORDS if _OPEN_QUESTION.search(question.lower()) else _AFFIRMATIVE_WORDS
+    return 0 < len(words) <= _MAX_CONFIRMATION_WORDS and all(
+        w in _CONFIRMATION_WORDS or w in polar for w in words
+    )
+
+
+def start(
+    session_key: str,
+    problem: str,
+    constraints: list[dict],
+    generate: Callable[[str, list[dict]], Awaitable[dict]],
+) -> None:
+    """Begin generating the map for `constraints` in the background."""
+    discard(session_key)
+    # Fresh context: the task outlives this graph run and must not stream
+    # its tokens into the run's callbacks. Its tokens still count against
+    # the session's budget.
+    context = contextvars.Context()
+    context.run(token_budget.bind, *token_budget.current())
+    task = asyncio.get_running_loop().create_task(generate(problem, list(constraints)), context=context)
+    expiry = asyncio.get_running_loop().call_later(SPECULATIVE_MAP_TTL, _expire, session_key, task)
+    _pending[session_key] = (constraints_fingerprint(problem, constraints), task, expiry)
+    speculation_stats["started"] += 1
+
+
+def take(session_key: str, problem: str, constraints: list[dict]) -> asyncio.Task | None:
+    """
+    The speculative task for this session if it was started from exactly these
+    constraints (it may still be running), else None. Mismatches are cancelled.
+    """
+    entry = _pending.pop(session_key, None)
+    if entry is None:
+        return None
+    fingerprint, task, expiry = entry
+    expiry.cancel()
+    if fingerprint != constraints_fingerprint(problem, constraints) or task.cancelled():
+        task.cancel()
+        speculation_stats["discarded"] += 1
+        logger.info("Final answer changed the constraints — discarding speculative map")
+        return None
+    speculation_stats["used"] += 1
+    return task
+
+
+def discard(session_key: str) -> None:
+    entry = _pending.pop(session_key, None)
+    if entry is not None:
+        entry[1].cancel()
+        entry[2].cancel()
+        speculation_stats["discarded"] += 1
+
+
+def _expire(session_key: str, task: asyncio.Task) -> None:
+    # Never answered — free the result
+    entry = _pending.get(session_key)
+    if entry is not None and entry[1] is task:
+        del _pending[session_key]
+        task.cancel()
+        speculation_stats["expired"] += 1
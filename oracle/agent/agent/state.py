@@ -22,6 +22,7 @@ DIMENSIONS = Literal[
 CONSTRAINT_TYPES = Literal["eliminator", "shaper", "anchor"]
 PHASES = Literal["entry", "interrogation", "ignition", "exploration", "map_generation"]
 CATEGORIES = Literal["financial", "strategic", "operational", "tactical"]
+CONFIDENCE = Literal["high", "medium", "low"]
 
 
 class Constraint(BaseModel):
@@ -33,6 +34,7 @@ class Constraint(BaseModel):
         default_factory=lambda: datetime.now(timezone.utc).isoformat()
     )
     timelineIndex: int = 0
+    confidence: Optional[CONFIDENCE] = None  # set when extracted from a multi-dimension answer
 
 
 class DimensionCoverage(BaseModel):
@@ -92,6 +94,15 @@ class MapState(BaseModel):
     activeNodeId: Optional[str] = None
 
 
+class Viewport(BaseModel):
+    """Visible region of the canvas on the 0–100 plane (see agent/lod.py)."""
+    x0: float = 0.0
+    y0: float = 0.0
+    x1: float = 100.0
+    y1: float = 100.0
+    maxDepth: Optional[int] = None  # None → MAP_LOD_MAX_DEPTH
+
+
 class ExplorationEntry(BaseModel):
     index: int
     timestamp: str = Field(
@@ -108,7 +119,12 @@ class Branch(BaseModel):
     forkIndex: int
     label: str = ""
     explorationHistory: list[ExplorationEntry] = Field(default_factory=list)
-    mapSnapshot: MapState = Field(default_factory=MapState)
+    mapSnapshot: MapState = Field(default_factory=MapState)  # legacy full copy; empty when pooled (GET /sessions/{id}/map/branches/{branchId})
+    # Copy-on-write: keys into OracleState.nodePool (see agent/branch_store.py)
+    parentBranchId: str = "main"
+    baseRefs: list[str] = Field(default_factory=list)  # parent map at the fork point
+    addedRefs: list[str] = Field(default_factory=list)  # nodes new or changed on this branch
+    removedIds: list[str] = Field(default_factory=list)  # parent node ids dropped on this branch
 
 
 # ── Main Agent State ────────────────────────────────────────────────
@@ -127,14 +143,17 @@ class OracleState(CopilotKitState):
     currentQuestion: str = ""
     currentTargetDimension: str = ""
     isLastQuestion: bool = False
+    conversationSummary: str = ""  # condensed older turns trimmed from `messages`
 
     # Map
     mapState: MapState = Field(default_factory=MapState)
+    viewport: Optional[Viewport] = None  # set by the canvas; large maps are sent as a view of it
 
     # Exploration history + branching
     explorationHistory: list[ExplorationEntry] = Field(default_factory=list)
     branches: list[Branch] = Field(default_factory=list)
     activeBranchId: str = "main"
+    nodePool: dict[str, MapNode] = Field(default_factory=dict)  # interned nodes shared by branches; checkpoint only
 
     # Fork context (set before calling fork_regenerator)
     forkIndex: int = -1
@@ -144,3 +163,4 @@ class OracleState(CopilotKitState):
 
     # Expansion context (set before calling expander)
     expandNodeId: str = ""
+    expandNodeIds: list[str] = Field(default_factory=list)  # batch expand (multi_expander)
@@ -0,0 +1,160 @@
+"""
+Incremental validation of streamed Claude output.
+Scans the JSON as it arrives and checks each node the moment its object
+closes, so a response that is already certain to fail validate_map_response
+(or validate_expander_response) can be cancelled mid-stream and retried
+instead of waiting for the whole generation.
+"""
+
+from __future__ import annotations
+
+import json
+
+
+class NodeStreamScanner:
+    """
+    Minimal streaming JSON scanner. Emits every object that is a direct
+    element of an array stored under `array_key`, as soon as it closes.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._text = ""
+        self._pos = 0
+        self.closed = False  # the target array has been fully streamed
+        # Container stack: ("{", None) or ("[", key-the-array-was-stored-under)
+        self._stack: list[tuple[str, str | None]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._current_key: str | None = None
+        self._object_start: int | None = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        self._text += chunk
+        text = self._text
+        found: list[dict] = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch == ":":
+                self._current_key = self._last_string
+            elif ch == "{":
+                if self._in_target_array():
+                    self._object_start = i
+                self._stack.append(("{", None))
+                self._current_key = None
+            elif ch == "[":
+                parent_is_object = bool(self._stack) and self._stack[-1][0] == "{"
+                self._stack.append(("[", self._current_key if parent_is_object else None))
+            elif ch in "}]":
+                if ch == "]" and self._in_target_array():
+                    self.closed = True
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._object_start is not None and self._in_target_array():
+                    try:
+                        found.append(json.loads(text[self._object_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass  # malformed element — the final parse will report it
+                    self._object_start = None
+        self._pos = len(text)
+        return found
+
+    def _in_target_array(self) -> bool:
+        return bool(self._stack) and self._stack[-1] == ("[", self.array_key)
+
+
+class IncrementalNodeValidator:
+    """
+    Checks streamed nodes against the same rules as the final validators.
+    Only errors the final validator would also report are raised, so an
+    abort never throws away a response that would have passed.
+    """
+
+    def __init__(
+        self,
+        array_key: str = "nodes",
+        required: tuple[str, ...] = ("id", "label", "depth", "x", "y"),
+        require_root: bool = True,
+        min_nodes: int = 0,
+        unique_ids: bool = True,
+    ):
+        self._scanner = NodeStreamScanner(array_key)
+        self.required = required
+        self.require_root = require_root
+        self.min_nodes = min_nodes
+        self.unique_ids = unique_ids
+        self._ids: set[str] = set()
+        self._has_root = False
+        self._checked_close = False
+        self.nodes_seen = 0
+
+    def feed(self, chunk: str) -> list[str]:
+        """Feed more streamed text. Returns the fatal errors found so far (empty = keep going)."""
+        errors: list[str] = []
+        for node in self._scanner.feed(chunk):
+            i = self.nodes_seen
+            self.nodes_seen += 1
+            if not isinstance(node, dict):
+                continue
+            for field in self.required:
+                if field not in node:
+                    errors.append(f"Node {i} missing required field '{field}'")
+            nid = node.get("id", f"__missing_{i}")
+            if self.unique_ids and nid in self._ids:
+                errors.append(f"Duplicate node id: {nid}")
+            self._ids.add(nid)
+            for axis in ("x", "y"):
+                value = node.get(axis)
+                if axis in self.required and isinstance(value, (int, float)) and not (0 <= value <= 100):
+                    errors.append(f"Node '{nid}' {axis}={value} out of range 0-100")
+            if node.get("depth") == 0:
+                self._has_root = True
+
+        # Once the node array has closed, whole-list rules can be decided
+        # without waiting for the edges to stream
+        if self._scanner.closed and not self._checked_close:
+            self._checked_close = True
+            if self.require_root and not self._has_root:
+                errors.append("No depth-0 root node found")
+            if self.nodes_seen < self.min_nodes:
+                errors.append(f"Expected at least 12 nodes, got {self.nodes_seen}")
+        return errors
+
+
+# Mirrors validate_map_response (which also requires at least 5 nodes)
+def map_stream_validator() -> IncrementalNodeValidator:
+    return IncrementalNodeValidator("nodes", min_nodes=5)
+
+
+# Mirrors validate_expander_response's per-child field check (works for
+# multi-expander groups too, since every group streams a "childNodes" array)
+def expander_stream_validator() -> IncrementalNodeValidator:
+    return IncrementalNodeValidator(
+        "childNodes",
+        required=("id", "label", "depth", "parentId", "x", "y"),
+        require_root=False,
+        unique_ids=False,
+    )
+
+
+# Mirrors validate_fork_patch_response's per-node checks
+def fork_patch_stream_validator() -> IncrementalNodeValidator:
+    return IncrementalNodeValidator(
+        "nodes",
+        required=("id", "label", "depth", "parentId", "x", "y"),
+        require_root=False,
+    )
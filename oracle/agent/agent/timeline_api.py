@@ -0,0 +1,117 @@
+"""
+Timeline scrubber HTTP API.
+REST access to stored map snapshots so the frontend can fetch only the
+frames it scrubs to: list indices, fetch one, or stream a range as NDJSON.
+Responses carry ETags (conditional GET → 304) and are gzipped on request;
+a gzipped body's ETag has a "-gz" suffix, since it is a different
+representation of the same frames.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import zlib
+from typing import AsyncIterator, Iterable
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from agent import redis_store
+
+router = APIRouter(prefix="/sessions/{session_id}/snapshots", tags=["timeline"])
+
+MAX_RANGE = 500  # frames per range request
+GZIP_MIN_BYTES = 512
+
+
+def _etag(parts: Iterable[str]) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\n")
+    return f'"{h.hexdigest()}"'
+
+
+def _gzip_etag(etag: str) -> str:
+    """Gzipped bodies are a different representation, so they get their own strong ETag."""
+    return f'{etag[:-1]}-gz"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    candidates = request.headers.get("if-none-match", "")
+    tags = {c.strip().removeprefix("W/") for c in candidates.split(",")}
+    return etag in tags or candidates.strip() == "*"
+
+
+def _accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _json_response(request: Request, body: str, etag: str) -> Response:
+    payload = body.encode()
+    use_gzip = _accepts_gzip(request) and len(payload) >= GZIP_MIN_BYTES
+    if use_gzip:
+        etag = _gzip_etag(etag)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        payload = gzip.compress(payload, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@router.get("")
+async def list_snapshots(session_id: str, request: Request) -> Response:
+    indices = await redis_store.list_snapshot_indices(session_id)
+    body = json.dumps({"sessionId": session_id, "indices": indices})
+    return _json_response(request, body, _etag([body]))
+
+
+@router.get("/range")
+async def stream_snapshots(
+    session_id: str,
+    request: Request,
+    start: int = Query(0, ge=0),
+    end: int = Query(..., ge=0),
+) -> Response:
+    """Stream snapshots with start <= index < end as NDJSON, one frame per line."""
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range too large (max {MAX_RANGE} frames)")
+
+    frames = await redis_store.load_snapshot_range_raw(session_id, start, end)
+    use_gzip = _accepts_gzip(request)
+    etag = _etag(f"{i}:{data}" for i, data in frames)
+    if use_gzip:
+        etag = _gzip_etag(etag)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    async def lines() -> AsyncIterator[bytes]:
+        # wbits=31 → gzip container; SYNC_FLUSH after each frame so the
+        # client can render frames as they arrive.
+        compressor = zlib.compressobj(5, zlib.DEFLATED, 31) if use_gzip else None
+        for index, data in frames:
+            line = f'{{"index":{index},"mapState":{data}}}\n'.encode()
+            if compressor is None:
+                yield line
+            else:
+                yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressor is not None:
+            yield compressor.flush()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
+@router.get("/{index}")
+async def get_snapshot(session_id: str, index: int, request: Request) -> Response:
+    data = await redis_store.load_snapshot_raw(session_id, index)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return _json_response(request, data, _etag([data]))
@@ -0,0 +1,196 @@
+"""
+Token accounting, adaptive output limits and budgets for Claude calls.
+Every call's input and output tokens are recorded per node, per session and
+per tenant. Once a node has TOKEN_LIMIT_MIN_SAMPLES outputs, its max_tokens
+is the p99 output size times TOKEN_LIMIT_HEADROOM instead of
+MODEL_MAX_TOKENS, so a runaway response is cut off early.
+
+Sessions and tenants have token budgets. Past TOKEN_BUDGET_DEGRADE_AT of
+either, calls run in a cheaper mode (see llm_caller); once either is spent
+call_claude_json raises BudgetExhausted and nodes use their non-LLM
+fallbacks. The session and tenant are bound per AG-UI run (server.py) and
+inherited by every task the run starts. Accounting is per process.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import (
+    MODEL_MAX_TOKENS,
+    TOKEN_BUDGET_DEGRADE_AT,
+    TOKEN_BUDGET_SESSION,
+    TOKEN_BUDGET_TENANT,
+    TOKEN_BUDGET_TENANT_WINDOW,
+    TOKEN_LIMIT_ADAPTIVE,
+    TOKEN_LIMIT_HEADROOM,
+    TOKEN_LIMIT_MIN,
+    TOKEN_LIMIT_MIN_SAMPLES,
+)
+from agent.nodes.hedging import LatencyWindow
+
+NORMAL = "normal"
+DEGRADED = "degraded"
+EXHAUSTED = "exhausted"
+
+DEFAULT_TENANT = "default"
+# Limits are rounded up to this, so bound LLM instances can be cached
+_LIMIT_STEP = 128
+# Rough size of a token, for responses that carry no usage (aborted streams)
+_CHARS_PER_TOKEN = 4
+_MAX_SESSIONS = 10000
+
+
+class BudgetExhausted(RuntimeError):
+    """The session's or tenant's token budget is spent — no Claude call was made."""
+
+
+class _Tally:
+    __slots__ = ("calls", "input", "output")
+
+    def __init__(self):
+        self.calls = self.input = self.output = 0
+
+    @property
+    def total(self) -> int:
+        return self.input + self.output
+
+    def add(self, input_tokens: int, output_tokens: int) -> None:
+        self.calls += 1
+        self.input += input_tokens
+        self.output += output_tokens
+
+    def as_dict(self) -> dict:
+        return {"calls": self.calls, "inputTokens": self.input, "outputTokens": self.output}
+
+
+# (session key, tenant) of the run the current task belongs to
+_binding: contextvars.ContextVar[tuple[str, str]] = contextvars.ContextVar(
+    "oracle_token_binding", default=("", DEFAULT_TENANT)
+)
+
+_nodes: dict[str, _Tally] = {}
+_output_sizes: dict[str, LatencyWindow] = {}
+# session key → node → tally; least recently used sessions are dropped
+_sessions: OrderedDict[str, dict[str, _Tally]] = OrderedDict()
+# tenant → (window start, tally)
+_tenants: dict[str, tuple[float, _Tally]] = {}
+
+budget_stats = {"truncated": 0, "estimated": 0, "degraded_calls": 0, "exhausted_calls": 0}
+
+
+def bind(session_key: str, tenant: Optional[str] = None) -> None:
+    """Account calls made from the current context to this session and tenant."""
+    _binding.set((session_key or "", tenant or DEFAULT_TENANT))
+
+
+def current() -> tuple[str, str]:
+    return _binding.get()
+
+
+def _tenant_tally(tenant: str) -> _Tally:
+    now = time.time()
+    start, tally = _tenants.get(tenant, (0.0, None))
+    if tally is None or now - start >= TOKEN_BUDGET_TENANT_WINDOW:
+        start, tally = now - now % TOKEN_BUDGET_TENANT_WINDOW, _Tally()
+        _tenants[tenant] = (start, tally)
+    return tally
+
+
+def session_total(session_key: str) -> int:
+    return sum(t.total for t in _sessions.get(session_key, {}).values())
+
+
+def mode() -> str:
+    """NORMAL, DEGRADED or EXHAUSTED for the bound session and tenant."""
+    session_key, tenant = current()
+    used = 0.0
+    if TOKEN_BUDGET_SESSION > 0 and session_key:
+        used = session_total(session_key) / TOKEN_BUDGET_SESSION
+    if TOKEN_BUDGET_TENANT > 0:
+        used = max(used, _tenant_tally(tenant).total / TOKEN_BUDGET_TENANT)
+    if used >= 1.0:
+        return EXHAUSTED
+    if used >= TOKEN_BUDGET_DEGRADE_AT:
+        return DEGRADED
+    return NORMAL
+
+
+def max_tokens(node: str) -> int:
+    """The output limit for the node's next call."""
+    window = _output_sizes.get(node)
+    if not TOKEN_LIMIT_ADAPTIVE or window is None or len(window) < TOKEN_LIMIT_MIN_SAMPLES:
+        return MODEL_MAX_TOKENS
+    limit = math.ceil(window.percentile(99) * TOKEN_LIMIT_HEADROOM / _LIMIT_STEP) * _LIMIT_STEP
+    return max(TOKEN_LIMIT_MIN, min(MODEL_MAX_TOKENS, limit))
+
+
+def usage_of(message, text: str = "") -> tuple[int, int, bool]:
+    """(input, output, estimated) tokens of a response; estimated from `text` if it has no usage."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    if output_tokens or not text:
+        return input_tokens, output_tokens, False
+    return input_tokens, math.ceil(len(text) / _CHARS_PER_TOKEN), True
+
+
+def record(node: str, input_tokens: int, output_tokens: int, complete: bool = True, estimated: bool = False) -> None:
+    """
+    Account one response. Only complete responses feed the node's output-size
+    window; aborted or truncated ones would skew the limit.
+    """
+    session_key, tenant = current()
+    _nodes.setdefault(node, _Tally()).add(input_tokens, output_tokens)
+    if session_key:
+        session = _sessions.pop(session_key, None) or {}
+        _sessions[session_key] = session
+        if len(_sessions) > _MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        session.setdefault(node, _Tally()).add(input_tokens, output_tokens)
+    _tenant_tally(tenant).add(input_tokens, output_tokens)
+    if estimated:
+        budget_stats["estimated"] += 1
+    if complete and output_tokens:
+        _output_sizes.setdefault(node, LatencyWindow()).record(output_tokens)
+
+
+def session_usage(session_key: str) -> Optional[dict]:
+    """Per-node usage of one session, or None if it has made no calls."""
+    session = _sessions.get(session_key)
+    if session is None:
+        return None
+    total = _Tally()
+    for tally in session.values():
+        total.calls += tally.calls
+        total.input += tally.input
+        total.output += tally.output
+    return {
+        "nodes": {node: tally.as_dict() for node, tally in session.items()},
+        "total": total.as_dict(),
+        "budget": TOKEN_BUDGET_SESSION or None,
+    }
+
+
+def report() -> dict:
+    """Token summary for /metrics."""
+    return {
+        "nodes": {
+            node: {
+                **tally.as_dict(),
+                "p50Output": _output_sizes[node].percentile(50) if node in _output_sizes else None,
+                "p99Output": _output_sizes[node].percentile(99) if node in _output_sizes else None,
+                "maxTokens": max_tokens(node),
+            }
+            for node, tally in _nodes.items()
+        },
+        "sessions": len(_sessions),
+        "truncated": budget_stats["truncated"],
+        "estimated": budget_stats["estimated"],
+        "degradedCalls": budget_stats["degraded_calls"],
+        "exhaustedCalls": budget_stats["exhausted_calls"],
+    }
@@ -9,12 +9,17 @@ import copy
 import uuid
 from datetime import datetime, timezone
 
+from langchain_core.messages import RemoveMessage
+
+from agent.branch_store import collect_pool, intern_nodes
+
 
 def make_constraint(
     answer: str,
     dimension: str,
     constraint_type: str,
     timeline_index: int,
+    confidence: str | None = None,
 ) -> dict:
     """Create a new constraint dict."""
     return {
@@ -24,27 +29,49 @@ def make_constraint(
         "value": answer,
         "answeredAt": datetime.now(timezone.utc).isoformat(),
         "timelineIndex": timeline_index,
+        "confidence": confidence,
     }
 
 
 def update_constraints(
     state: dict,
-    answer: str,
-    dimension: str,
+    answer: str | None,
+    dimension: str | None,
     constraint_type: str = "shaper",
+    extracted: list[dict] | None = None,
+    accept_confidence: tuple[str, ...] = ("high", "medium"),
 ) -> dict:
-    """Add a constraint and update dimension coverage. Returns partial state update."""
+    """
+    Add a constraint and update dimension coverage. Returns partial state update.
+    `extracted` carries extra constraints pulled from the same answer for other
+    dimensions; those at an accepted confidence level are recorded too and
+    mark their dimension covered, so it isn't asked about again.
+    Pass answer/dimension as None to record only extracted constraints.
+    """
     constraints = list(state.get("constraints", []))
-    constraint = make_constraint(
-        answer=answer,
-        dimension=dimension,
-        constraint_type=constraint_type,
-        timeline_index=len(constraints),
-    )
-    constraints.append(constraint)
-
     coverage = dict(state.get("dimensionCoverage", {}))
-    coverage[dimension] = True
+
+    if answer and dimension:
+        constraints.append(make_constraint(
+            answer=answer,
+            dimension=dimension,
+            constraint_type=constraint_type,
+            timeline_index=len(constraints),
+        ))
+        coverage[dimension] = True
+
+    for item in extracted or []:
+        dim = item.get("dimension")
+        if dim == dimension or coverage.get(dim) or item.get("confidence") not in accept_confidence:
+            continue
+        constraints.append(make_constraint(
+            answer=item["value"],
+            dimension=dim,
+            constraint_type=item.get("type") or "shaper",
+            timeline_index=len(constraints),
+            confidence=item["confidence"],
+        ))
+        coverage[dim] = True
 
     return {
         "constraints": constraints,
@@ -52,6 +79,43 @@ def update_constraints(
     }
 
 
+def _message_line(msg) -> str:
+    if isinstance(msg, dict):
+        role, content = msg.get("role", ""), msg.get("content", "")
+    else:
+        role, content = getattr(msg, "type", ""), msg.content
+    if not isinstance(content, str):
+        content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    speaker = "User" if role in ("human", "user") else "Oracle"
+    text = " ".join(content.split())
+    return f"{speaker}: {text[:157] + '...' if len(text) > 160 else text}"
+
+
+def window_messages(
+    messages: list,
+    summary: str,
+    keep: int,
+    max_summary_chars: int = 2000,
+) -> dict:
+    """
+    Trim `messages` to the last `keep`. Returns partial state update: RemoveMessage
+    markers for the older messages (applied by the add_messages reducer) and
+    conversationSummary extended with one condensed line per removed message.
+    Keeps the most recent lines when the summary outgrows max_summary_chars.
+    Returns {} when nothing needs trimming.
+    """
+    if keep <= 0 or len(messages) <= keep:
+        return {}
+    old = messages[:len(messages) - keep]
+    lines = [line for line in summary.split("\n") if line] + [_message_line(m) for m in old]
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_summary_chars:
+        lines.pop(0)
+    return {
+        "messages": [RemoveMessage(id=m["id"] if isinstance(m, dict) else m.id) for m in old],
+        "conversationSummary": "\n".join(lines),
+    }
+
+
 def snapshot_map(
     state: dict,
     event_type: str,
@@ -75,11 +139,17 @@ def snapshot_map(
 def create_branch(state: dict, fork_index: int, new_answer: str) -> dict:
     """
     Create a new branch entry and set fork context fields.
-    The actual map regeneration happens in the fork_regenerator node.
+    The branch references the current map's nodes through the shared node pool
+    instead of copying them. The actual map regeneration happens in the
+    fork_regenerator node.
     """
     constraints = state.get("constraints", [])
     original_constraint = constraints[fork_index] if fork_index < len(constraints) else {}
 
+    pool, base_refs = intern_nodes(
+        state.get("nodePool", {}), state.get("mapState", {}).get("nodes", [])
+    )
+
     branch_id = str(uuid.uuid4())
     branches = list(state.get("branches", []))
     branches.append({
@@ -88,10 +158,15 @@ def create_branch(state: dict, fork_index: int, new_answer: str) -> dict:
         "label": f"Fork at Q{fork_index + 1}",
         "explorationHistory": [],
         "mapSnapshot": {},
+        "parentBranchId": state.get("activeBranchId", "main"),
+        "baseRefs": base_refs,
+        "addedRefs": [],
+        "removedIds": [],
     })
 
     return {
         "branches": branches,
+        "nodePool": collect_pool(pool, branches),
         "activeBranchId": branch_id,
         "forkIndex": fork_index,
         "forkNewAnswer": new_answer,
@@ -15,6 +15,8 @@ VALID_DIMENSIONS = {
 
 VALID_CATEGORIES = {"financial", "strategic", "operational", "tactical"}
 
+VALID_CONFIDENCE = {"high", "medium", "low"}
+
 
 def validate_interrogator_response(data: dict) -> tuple[bool, list[str]]:
     errors: list[str] = []
@@ -29,6 +31,19 @@ def validate_interrogator_response(data: dict) -> tuple[bool, list[str]]:
         )
     if "isLastQuestion" not in data or not isinstance(data.get("isLastQuestion"), bool):
         errors.append("Missing or invalid 'isLastQuestion' field (must be boolean)")
+    extracted = data.get("extractedConstraints", [])
+    if not isinstance(extracted, list):
+        errors.append("'extractedConstraints' must be a list")
+    else:
+        for i, item in enumerate(extracted):
+            if item.get("dimension") not in VALID_DIMENSIONS:
+                errors.append(f"extractedConstraints[{i}] has invalid dimension '{item.get('dimension')}'")
+            if not isinstance(item.get("value"), str) or not item.get("value"):
+                errors.append(f"extractedConstraints[{i}] missing 'value'")
+            if item.get("confidence") not in VALID_CONFIDENCE:
+                errors.append(
+                    f"extractedConstraints[{i}] confidence must be one of {sorted(VALID_CONFIDENCE)}"
+                )
     return (len(errors) == 0, errors)
 
 
@@ -103,5 +118,82 @@ def validate_expander_response(data: dict) -> tuple[bool, list[str]]:
     return (len(errors) == 0, errors)
 
 
+def validate_multi_expander_response(
+    data: dict, parent_ids: list[str] | None = None
+) -> tuple[bool, list[str]]:
+    """Validate {"groups": [{"parentId", "childNodes", ...}]} — each group as an expander response."""
+    errors: list[str] = []
+    groups = data.get("groups", [])
+
+    if not isinstance(groups, list):
+        errors.append("'groups' must be a list")
+        return (False, errors)
+
+    seen: set[str] = set()
+    for i, group in enumerate(groups):
+        parent_id = group.get("parentId")
+        if not parent_id:
+            errors.append(f"Group {i} missing 'parentId'")
+            continue
+        if parent_ids is not None and parent_id not in parent_ids:
+            errors.append(f"Group {i} parentId '{parent_id}' was not requested")
+        if parent_id in seen:
+            errors.append(f"Duplicate group for parentId '{parent_id}' — return one group per node")
+        seen.add(parent_id)
+        _, group_errors = validate_expander_response(group)
+        errors.extend(f"Group '{parent_id}': {e}" for e in group_errors)
+
+    if parent_ids is not None:
+        for pid in parent_ids:
+            if pid not in seen:
+                errors.append(f"Missing group for parentId '{pid}'")
+
+    return (len(errors) == 0, errors)
+
+
+def validate_fork_patch_response(
+    data: dict, kept_ids: set[str] | None = None
+) -> tuple[bool, list[str]]:
+    """
+    Validate an incremental fork patch: replacement nodes for the affected part
+    of the map. Every node must hang off a kept node or another patch node.
+    """
+    errors: list[str] = []
+    nodes = data.get("nodes", [])
+    kept_ids = kept_ids or set()
+
+    if not isinstance(nodes, list):
+        errors.append("'nodes' must be a list")
+        return (False, errors)
+
+    patch_ids: set[str] = set()
+    for i, node in enumerate(nodes):
+        for field in ("id", "label", "depth", "parentId", "x", "y"):
+            if field not in node:
+                errors.append(f"Node {i} missing required field '{field}'")
+        nid = node.get("id", f"__missing_{i}")
+        if nid in patch_ids:
+            errors.append(f"Duplicate node id: {nid}")
+        if nid in kept_ids:
+            errors.append(f"Node id '{nid}' collides with a kept node")
+        patch_ids.add(nid)
+        if node.get("depth") == 0:
+            errors.append(f"Node '{nid}' has depth 0 — the root is kept, do not regenerate it")
+
+        x = node.get("x", -1)
+        y = node.get("y", -1)
+        if not (0 <= x <= 100):
+            errors.append(f"Node '{nid}' x={x} out of range 0-100")
+        if not (0 <= y <= 100):
+            errors.append(f"Node '{nid}' y={y} out of range 0-100")
+
+    for node in nodes:
+        parent_id = node.get("parentId")
+        if parent_id not in kept_ids and parent_id not in patch_ids:
+            errors.append(f"Node '{node.get('id')}' parentId '{parent_id}' not found")
+
+    return (len(errors) == 0, errors)
+
+
 # Fork response uses the same schema as map response
 validate_fork_response = validate_map_response
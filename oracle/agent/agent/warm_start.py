@@ -0,0 +1,333 @@
+"""
+Cross-session warm start for map generation.
+Every generated map is recorded with its problem and constraints. A new
+session's text is matched against past ones (TF-IDF over hashed word and
+character n-grams, cosine similarity), and a close match is used as a
+compact exemplar in the map prompt — or, when very close, painted on the
+canvas while the new map is generated.
+
+Off by default: it stores users' problems and shows past maps to new
+sessions. Indexes are per tenant, in WARM_START_DIR/<tenant hash>/, each
+with two append-only files:
+  maps.jsonl   one {"problem", "constraints", "map"} record per line
+  vectors.bin  per record: uint32 n, n uint32 buckets, n float32 weights
+Maps stay on disk and are read by offset on a hit; only vectors, postings
+and line offsets are held in memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from config import WARM_START_DIR, WARM_START_ENABLED, WARM_START_MIN_SCORE
+from agent import token_budget
+
+logger = logging.getLogger(__name__)
+
+MAPS_FILE = "maps.jsonl"
+VECTORS_FILE = "vectors.bin"
+
+_BUCKET_BITS = 18
+_BUCKET_MASK = (1 << _BUCKET_BITS) - 1
+# Buckets in more than this share of records carry almost no signal; left out of scoring
+_MAX_DF_SHARE = 0.5
+_MIN_RECORDS_FOR_STOP = 20
+# Recompute record norms once the record count has grown this much (IDF drifts)
+_RENORM_GROWTH = 1.1
+# A new map this close to a recorded one isn't recorded again
+_DUPLICATE_SCORE = 0.98
+_EXEMPLAR_MAX_NODES = 30
+
+
+class WarmMatch(NamedTuple):
+    score: float
+    problem: str
+    constraints: list[dict]
+    map: dict
+
+
+def problem_text(problem: str, constraints: list[dict]) -> str:
+    return " ".join([problem, *(f"{c.get('dimension', '')} {c.get('value', '')}" for c in constraints)])
+
+
+def features(text: str) -> dict[int, float]:
+    """Hashed word unigrams/bigrams and character 3-grams → log-scaled term frequencies."""
+    words = re.sub(r"[^a-z0-9$]+", " ", text.lower()).split()
+    grams: list[str] = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    counts = Counter(zlib.crc32(g.encode()) & _BUCKET_MASK for g in grams)
+    return {bucket: 1.0 + math.log(n) for bucket, n in counts.items()}
+
+
+class WarmStartIndex:
+    """In-memory TF-IDF index over recorded maps. Thread-safe; call via asyncio.to_thread."""
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._offsets = array("Q")  # byte offset of each record in maps.jsonl
+        self._df = array("I", bytes(4 << _BUCKET_BITS))
+        self._postings: dict[int, tuple[array, array]] = {}  # bucket → (record ids, weights)
+        self._norms = array("f")
+        self._stop: set[int] = set()  # buckets above _MAX_DF_SHARE as of the last renorm
+        self._normed_at = 0  # record count when norms were last recomputed
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _idf(self, bucket: int) -> float:
+        return math.log((1 + len(self._offsets)) / (1 + self._df[bucket])) + 1.0
+
+    def _add_vector(self, record: int, vector: dict[int, float]) -> None:
+        for bucket, weight in vector.items():
+            self._df[bucket] += 1
+            ids, weights = self._postings.setdefault(bucket, (array("I"), array("f")))
+            ids.append(record)
+            weights.append(weight)
+        self._norms.append(math.sqrt(sum((w * self._idf(b)) ** 2 for b, w in vector.items() if b not in self._stop)))
+
+    def _renorm(self) -> None:
+        """Recompute norms under the current IDF and stop set, so scores stay true cosines."""
+        n = len(self._offsets)
+        max_df = n * _MAX_DF_SHARE
+        self._stop = {b for b in self._postings if self._df[b] > max_df} if n >= _MIN_RECORDS_FOR_STOP else set()
+        norms = [0.0] * n
+        for bucket, (ids, weights) in self._postings.items():
+            if bucket in self._stop:
+                continue
+            idf = self._idf(bucket)
+            for record, weight in zip(ids, weights):
+                norms[record] += (weight * idf) ** 2
+        self._norms = array("f", (math.sqrt(n) for n in norms))
+        self._normed_at = n
+
+    def _load(self) -> None:
+        maps_path = self.directory / MAPS_FILE
+        vectors_path = self.directory / VECTORS_FILE
+        if not maps_path.exists():
+            return
+        offsets, texts = [], []
+        with open(maps_path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn by a crash mid-append
+                offsets.append(offset)
+                texts.append(line)
+                offset += len(line)
+        if maps_path.stat().st_size > offset:
+            os.truncate(maps_path, offset)
+
+        vectors: list[dict[int, float]] = []
+        if vectors_path.exists():
+            data = vectors_path.read_bytes()
+            pos = 0
+            while pos + 4 <= len(data) and len(vectors) < len(offsets):
+                (n,) = struct.unpack_from("<I", data, pos)
+                end = pos + 4 + 8 * n
+                if end > len(data):
+                    break
+                buckets = array("I", data[pos + 4:pos + 4 + 4 * n])
+                weights = array("f", data[pos + 4 + 4 * n:end])
+                vectors.append(dict(zip(buckets, weights)))
+                pos = end
+            if pos != len(data) or len(vectors) != len(offsets):
+                # Out of step with maps.jsonl — keep what matches, rewrite the rest below
+                vectors_path.write_bytes(data[:pos])
+        missing = len(offsets) - len(vectors)
+        for line in texts[len(vectors):]:
+            record = json.loads(line)
+            vector = features(problem_text(record["problem"], record["constraints"]))
+            vectors.append(vector)
+            self._append_vector_file(vector)
+        if missing:
+            logger.info("Warm start: hashed %d records missing from %s", missing, VECTORS_FILE)
+
+        for record, vector in enumerate(vectors):
+            self._offsets.append(offsets[record])
+            for bucket, weight in vector.items():
+                self._df[bucket] += 1
+                ids, weights = self._postings.setdefault(bucket, (array("I"), array("f")))
+                ids.append(record)
+                weights.append(weight)
+        self._renorm()
+        logger.info("Warm start index loaded: %d maps", len(self._offsets))
+
+    def _append_vector_file(self, vector: dict[int, float]) -> None:
+        buckets = array("I", vector.keys())
+        weights = array("f", vector.values())
+        with open(self.directory / VECTORS_FILE, "ab") as f:
+            f.write(struct.pack("<I", len(buckets)) + buckets.tobytes() + weights.tobytes())
+
+    def _read_record(self, record: int) -> dict:
+        with open(self.directory / MAPS_FILE, "rb") as f:
+            f.seek(self._offsets[record])
+            return json.loads(f.readline())
+
+    def _best(self, vector: dict[int, float]) -> tuple[int, float]:
+        if len(self._offsets) > self._normed_at * _RENORM_GROWTH:
+            self._renorm()
+        dots: dict[int, float] = {}
+        query_norm = 0.0
+        for bucket, weight in vector.items():
+            if bucket in self._stop:
+                continue
+            idf = self._idf(bucket)
+            q = weight * idf
+            query_norm += q * q
+            entry = self._postings.get(bucket)
+            if entry is None:
+                continue
+            scale = q * idf
+            for record, w in zip(*entry):
+                dots[record] = dots.get(record, 0.0) + scale * w
+        if not dots or query_norm == 0.0:
+            return -1, 0.0
+        query_norm = math.sqrt(query_norm)
+        record, dot = max(dots.items(), key=lambda kv: kv[1] / (self._norms[kv[0]] or 1.0))
+        return record, min(1.0, dot / ((self._norms[record] or 1.0) * query_norm))
+
+    def find(self, problem: str, constraints: list[dict]) -> Optional[WarmMatch]:
+        """The most similar recorded map (any score), or None if nothing overlaps."""
+        vector = features(problem_text(problem, constraints))
+        with self._lock:
+            record, score = self._best(vector)
+            if record < 0:
+                return None
+            data = self._read_record(record)
+        return WarmMatch(score, data["problem"], data["constraints"], data["map"])
+
+    def add(self, problem: str, constraints: list[dict], map_data: dict) -> bool:
+        """Record a generated map. Returns False if a near-identical one is already recorded."""
+        vector = features(problem_text(problem, constraints))
+        line = json.dumps({"problem": problem, "constraints": constraints, "map": map_data}).encode() + b"\n"
+        with self._lock:
+            if self._offsets and self._best(vector)[1] >= _DUPLICATE_SCORE:
+                return False
+            path = self.directory / MAPS_FILE
+            offset = path.stat().st_size if path.exists() else 0
+            with open(path, "ab") as f:
+                f.write(line)
+            self._append_vector_file(vector)
+            self._offsets.append(offset)
+            self._add_vector(len(self._offsets) - 1, vector)
+        return True
+
+
+def exemplar_text(match: WarmMatch) -> str:
+    """A compact outline of a matched map for the prompt: one indented line per node."""
+    nodes = match.map.get("nodes", [])[:_EXEMPLAR_MAX_NODES]
+    lines = []
+    for node in sorted(nodes, key=lambda n: n.get("depth", 0)):
+        tags = "/".join(t for t in (node.get("dimension"), node.get("category")) if t)
+        conflict = " (conflict)" if node.get("conflictFlag") else ""
+        lines.append(f"{'  ' * node.get('depth', 0)}- {node['label']} [{tags}]{conflict}")
+    return f"Problem: {match.problem}\n" + "\n".join(lines)
+
+
+# ── Per-tenant indexes and hit-rate accounting ──────────────────────
+# Maps are only matched within the tenant that recorded them (the tenant
+# bound to the run from TENANT_HEADER, see server.py), each in its own
+# subdirectory.
+
+_indexes: dict[str, WarmStartIndex] = {}
+_index_locks: dict[str, asyncio.Lock] = {}
+# Recent lookups, so the node and generate_map share one query per constraint set
+_recent: OrderedDict[str, Optional[WarmMatch]] = OrderedDict()
+_MAX_RECENT = 64
+
+warm_start_stats = {"queries": 0, "hits": 0, "painted": 0, "recorded": 0, "score_sum": 0.0}
+
+
+def _tenant_dir(tenant: str) -> Path:
+    return Path(WARM_START_DIR) / hashlib.sha256(tenant.encode()).hexdigest()[:16]
+
+
+async def _get_index() -> Optional[WarmStartIndex]:
+    """The bound tenant's index; loaded in a worker thread on first use."""
+    if not WARM_START_ENABLED:
+        return None
+    tenant = token_budget.current()[1]
+    index = _indexes.get(tenant)
+    if index is None:
+        async with _index_locks.setdefault(tenant, asyncio.Lock()):
+            index = _indexes.get(tenant)
+            if index is None:
+                index = await asyncio.to_thread(WarmStartIndex, _tenant_dir(tenant))
+                _indexes[tenant] = index
+    return index
+
+
+async def load() -> None:
+    """Load the default tenant's index ahead of the first map (server startup)."""
+    try:
+        await _get_index()
+    except OSError:
+        logger.exception("Could not load the warm start index")
+
+
+async def find(problem: str, constraints: list[dict]) -> Optional[WarmMatch]:
+    """The best past map of the bound tenant scoring at least WARM_START_MIN_SCORE, else None."""
+    index = await _get_index()
+    if index is None:
+        return None
+    key = json.dumps([token_budget.current()[1], problem, [[c["dimension"], c["value"]] for c in constraints]])
+    if key in _recent:
+        _recent.move_to_end(key)
+        return _recent[key]
+    match = await asyncio.to_thread(index.find, problem, constraints) if len(index) else None
+    if match is not None and match.score < WARM_START_MIN_SCORE:
+        match = None
+    warm_start_stats["queries"] += 1
+    if match is not None:
+        warm_start_stats["hits"] += 1
+        warm_start_stats["score_sum"] += match.score
+    _recent[key] = match
+    if len(_recent) > _MAX_RECENT:
+        _recent.popitem(last=False)
+    return match
+
+
+async def record(problem: str, constraints: list[dict], map_data: dict) -> None:
+    try:
+        index = await _get_index()
+        if index is None:
+            return
+        constraints = [{k: c.get(k) for k in ("dimension", "type", "value")} for c in constraints]
+        if await asyncio.to_thread(index.add, problem, constraints, map_data):
+            warm_start_stats["recorded"] += 1
+    except OSError:
+        logger.exception("Could not record map for warm start")
+
+
+def report() -> dict:
+    """Hit-rate summary for /metrics."""
+    queries, hits = warm_start_stats["queries"], warm_start_stats["hits"]
+    return {
+        "tenants": len(_indexes),
+        "maps": sum(len(index) for index in _indexes.values()),
+        "queries": queries,
+        "hits": hits,
+        "hitRate": round(hits / queries, 3) if queries else None,
+        "meanHitScore": round(warm_start_stats["score_sum"] / hits, 3) if hits else None,
+        "painted": warm_start_stats["painted"],
+        "recorded": warm_start_stats["recorded"],
+    }
@@ -0,0 +1,143 @@
+"""
+Write-behind buffer for Redis persistence.
+Callers enqueue keyed writes and return immediately; a background task hands
+batches to a flush function (which pipelines them). A newer write to a key
+that is still pending replaces — or merges into — the older one, so a burst
+of saves to one session costs a single Redis write. Pending and in-flight
+writes stay readable through get(), which gives read-your-writes within the
+process. A batch the flush function fails on goes back into the queue and is
+retried on the next flush.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        flush_fn: Callable[[dict[str, Any]], Awaitable[None]],
+        max_pending: int = 10_000,
+        interval: float = 0.05,
+        batch_size: int = 500,
+    ):
+        self._flush_fn = flush_fn
+        self.max_pending = max_pending
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending: OrderedDict[str, Any] = OrderedDict()
+        self._inflight: dict[str, Any] = {}
+        self._space = asyncio.Condition()
+        self._wake = asyncio.Event()
+        self._drain_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "coalesced": 0, "flushed": 0, "batches": 0, "waits": 0, "requeued": 0}
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._inflight)
+
+    async def put(
+        self, key: str, value: Any, merge: Optional[Callable[[Any, Any], Any]] = None
+    ) -> None:
+        """Enqueue a write. Waits (backpressure) while the buffer is full and `key` isn't already pending."""
+        self._ensure_started()
+        if key not in self._pending and len(self) >= self.max_pending:
+            self.stats["waits"] += 1
+            self._wake.set()
+            async with self._space:
+                await self._space.wait_for(
+                    lambda: key in self._pending or len(self) < self.max_pending
+                )
+        self.stats["enqueued"] += 1
+        if key in self._pending:
+            self.stats["coalesced"] += 1
+            old = self._pending.pop(key)
+            value = merge(old, value) if merge else value
+        elif merge and key in self._inflight:
+            # Merge onto the in-flight value so the follow-up write is complete on its own
+            value = merge(self._inflight[key], value)
+        self._pending[key] = value
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def get(self, key: str) -> Any:
+        """The newest not-yet-persisted value for `key`, else None."""
+        if key in self._pending:
+            return self._pending[key]
+        return self._inflight.get(key)
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        for key in list(self._pending) + list(self._inflight):
+            if key.startswith(prefix):
+                yield key
+
+    def discard(self, keys: list[str]) -> None:
+        """Drop pending writes (in-flight ones still land — flush() to wait for them)."""
+        for key in keys:
+            self._pending.pop(key, None)
+
+    async def flush(self) -> None:
+        """Persist everything enqueued so far."""
+        async with self._drain_lock:
+            while self._pending:
+                await self._flush_batch()
+
+    async def close(self) -> None:
+        """Flush and stop the background task (server shutdown)."""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("write-behind flush failed")
+
+    async def _flush_batch(self) -> None:
+        batch: dict[str, Any] = {}
+        while self._pending and len(batch) < self.batch_size:
+            key, value = self._pending.popitem(last=False)
+            batch[key] = value
+        self._inflight.update(batch)
+        try:
+            await self._flush_fn(batch)
+            self.stats["flushed"] += len(batch)
+            self.stats["batches"] += 1
+        except BaseException:
+            self._requeue(batch)
+            raise
+        finally:
+            for key in batch:
+                self._inflight.pop(key, None)
+            async with self._space:
+                self._space.notify_all()
+
+    def _requeue(self, batch: dict[str, Any]) -> None:
+        """Put a failed batch back at the head of the queue, except keys a newer write has replaced."""
+        for key in reversed(batch):
+            if key not in self._pending:
+                self._pending[key] = batch[key]
+                self._pending.move_to_end(key, last=False)
+                self.stats["requeued"] += 1
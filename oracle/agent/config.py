@@ -15,9 +15,35 @@ MODEL_NAME = os.getenv("MODEL_NAME", "claude-sonnet-4-20250514")
 MODEL_MAX_TOKENS = int(os.getenv("MODEL_MAX_TOKENS", "4096"))
 MODEL_TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0"))
 
+# ── Anthropic HTTP connection pool ───────────────────────────────────
+# One shared async HTTP client for all Claude calls. Connections idle longer
+# than LLM_HTTP_KEEPALIVE_EXPIRY are closed; LLM_HTTP_WARM_CONNECTIONS are
+# opened at server startup so the first calls skip TCP/TLS setup. HTTP/2
+# needs the `h2` package (httpx[http2]); without it HTTP/1.1 is used.
+# LLM_HTTP_CA_BUNDLE points at extra CA certificates (e.g. a local TLS stub).
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", "120"))
+LLM_HTTP_WRITE_TIMEOUT = float(os.getenv("LLM_HTTP_WRITE_TIMEOUT", "30"))
+LLM_HTTP_POOL_TIMEOUT = float(os.getenv("LLM_HTTP_POOL_TIMEOUT", "10"))
+LLM_HTTP_WARM_CONNECTIONS = int(os.getenv("LLM_HTTP_WARM_CONNECTIONS", "4"))
+LLM_HTTP_CA_BUNDLE = os.getenv("LLM_HTTP_CA_BUNDLE", "")
+
 # ── Redis ────────────────────────────────────────────────────────────
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 
+# ── Session sharding ─────────────────────────────────────────────────
+# Comma-separated Redis URLs; session data is spread across them by
+# consistent hashing on session id. Defaults to REDIS_URL alone. The
+# LangGraph checkpointer stays on REDIS_URL. After changing the list, move
+# existing sessions with: python -m agent.rebalance --from OLD --to NEW
+REDIS_URLS = [u.strip() for u in os.getenv("REDIS_URLS", REDIS_URL).split(",") if u.strip()]
+REDIS_SHARD_VNODES = int(os.getenv("REDIS_SHARD_VNODES", "160"))
+REDIS_SHARD_HEALTH_INTERVAL = int(os.getenv("REDIS_SHARD_HEALTH_INTERVAL", "5"))
+
 # ── Server ───────────────────────────────────────────────────────────
 AGENT_HOST = os.getenv("AGENT_HOST", "0.0.0.0")
 AGENT_PORT = int(os.getenv("AGENT_PORT", "8000"))
@@ -34,3 +60,148 @@ FORK_REGENERATOR_TIMEOUT = int(os.getenv("FORK_REGENERATOR_TIMEOUT", "15"))
 
 # ── Retry config ─────────────────────────────────────────────────────
 MAX_LLM_RETRIES = int(os.getenv("MAX_LLM_RETRIES", "1"))
+
+# ── Request hedging (tail latency) ───────────────────────────────────
+# When enabled, a second identical Claude request is fired if the first has
+# not returned by LLM_HEDGE_PERCENTILE of that node's recent latency.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+# ── Token limits and budgets ─────────────────────────────────────────
+# max_tokens adapts per node to the p99 of its recent output sizes times
+# TOKEN_LIMIT_HEADROOM (within [TOKEN_LIMIT_MIN, MODEL_MAX_TOKENS]); a
+# response cut off by it is retried with twice the limit. Budgets are total
+# (input + output) tokens per session and per tenant per window; 0 = no limit.
+# Past TOKEN_BUDGET_DEGRADE_AT of a budget, calls run without hedging or
+# retries and on TOKEN_BUDGET_FALLBACK_MODEL if set; once spent, nodes use
+# their non-LLM fallbacks. A run's tenant is read from the TENANT_HEADER
+# request header, which must be set by a trusted auth proxy in front of the
+# agent (clients could otherwise pick a fresh tenant per request). Unset, every
+# run is the "default" tenant, so TOKEN_BUDGET_TENANT caps all sessions together.
+TENANT_HEADER = os.getenv("TENANT_HEADER", "")
+TOKEN_LIMIT_ADAPTIVE = os.getenv("TOKEN_LIMIT_ADAPTIVE", "true").lower() == "true"
+TOKEN_LIMIT_HEADROOM = float(os.getenv("TOKEN_LIMIT_HEADROOM", "1.5"))
+TOKEN_LIMIT_MIN = int(os.getenv("TOKEN_LIMIT_MIN", "512"))
+TOKEN_LIMIT_MIN_SAMPLES = int(os.getenv("TOKEN_LIMIT_MIN_SAMPLES", "20"))
+TOKEN_BUDGET_SESSION = int(os.getenv("TOKEN_BUDGET_SESSION", "250000"))
+TOKEN_BUDGET_TENANT = int(os.getenv("TOKEN_BUDGET_TENANT", "0"))
+TOKEN_BUDGET_TENANT_WINDOW = int(os.getenv("TOKEN_BUDGET_TENANT_WINDOW", "86400"))
+TOKEN_BUDGET_DEGRADE_AT = float(os.getenv("TOKEN_BUDGET_DEGRADE_AT", "0.8"))
+TOKEN_BUDGET_FALLBACK_MODEL = os.getenv("TOKEN_BUDGET_FALLBACK_MODEL", "")
+
+# ── Fork regeneration ────────────────────────────────────────────────
+# Incremental mode regenerates only nodes touched by the forked dimension
+# (plus conflict-flagged nodes) and keeps the rest of the map as-is. Falls
+# back to a full regeneration when more than MAX_AFFECTED of the map is hit.
+FORK_INCREMENTAL = os.getenv("FORK_INCREMENTAL", "true").lower() == "true"
+FORK_INCREMENTAL_MAX_AFFECTED = float(os.getenv("FORK_INCREMENTAL_MAX_AFFECTED", "0.6"))
+
+# ── Session tiering ──────────────────────────────────────────────────
+# Sessions idle longer than SESSION_ARCHIVE_IDLE_SECONDS are moved from Redis
+# to compressed segment files under SESSION_ARCHIVE_DIR and rehydrated on
+# first access. Set the idle threshold to 0 to disable tiering.
+SESSION_ARCHIVE_DIR = os.getenv("SESSION_ARCHIVE_DIR", "./session_archive")
+SESSION_ARCHIVE_IDLE_SECONDS = int(os.getenv("SESSION_ARCHIVE_IDLE_SECONDS", "86400"))
+SESSION_ARCHIVE_INTERVAL = int(os.getenv("SESSION_ARCHIVE_INTERVAL", "600"))
+SESSION_ARCHIVE_SEGMENT_BYTES = int(os.getenv("SESSION_ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+
+# ── Near-duplicate node detection ────────────────────────────────────
+# Generated nodes whose label 3-gram Jaccard similarity to an existing node
+# is at or above DEDUP_THRESHOLD are dropped (or merged into that node).
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.75"))
+
+# ── Node placement ───────────────────────────────────────────────────
+# Expanded children that land closer than NODE_MIN_DISTANCE (0–100 plane
+# units) to another node are fanned out around their parent. Set to 0 to
+# keep Claude's coordinates. SPATIAL_CELL_SIZE is the grid cell of the
+# position index (agent/spatial.py).
+NODE_MIN_DISTANCE = float(os.getenv("NODE_MIN_DISTANCE", "4.0"))
+SPATIAL_CELL_SIZE = float(os.getenv("SPATIAL_CELL_SIZE", "5.0"))
+
+# ── Cross-session warm start ─────────────────────────────────────────
+# Generated maps are recorded in WARM_START_DIR and matched (TF-IDF over
+# hashed n-grams) against new sessions' problem + constraints. A match at or
+# above WARM_START_MIN_SCORE is given to Claude as a compact exemplar; at or
+# above WARM_START_PAINT_SCORE it is also shown on the canvas while the new
+# map is generated. Maps are only matched within one tenant (TENANT_HEADER;
+# without it all sessions share one). Off by default: it keeps users'
+# problems on disk and shows past maps to new sessions.
+WARM_START_ENABLED = os.getenv("WARM_START_ENABLED", "false").lower() == "true"
+WARM_START_DIR = os.getenv("WARM_START_DIR", "./warm_start")
+WARM_START_MIN_SCORE = float(os.getenv("WARM_START_MIN_SCORE", "0.5"))
+WARM_START_PAINT_SCORE = float(os.getenv("WARM_START_PAINT_SCORE", "0.85"))
+
+# ── Map level of detail ──────────────────────────────────────────────
+# Maps with more than MAP_LOD_MIN_NODES nodes reach the frontend as a view:
+# nodes inside the client's viewport down to MAP_LOD_MAX_DEPTH, at most
+# MAP_LOD_MAX_NODES of them, with collapsed counts for hidden branches.
+# The full map stays in the checkpoint; subtrees are fetched on demand.
+MAP_LOD_ENABLED = os.getenv("MAP_LOD_ENABLED", "true").lower() == "true"
+MAP_LOD_MIN_NODES = int(os.getenv("MAP_LOD_MIN_NODES", "150"))
+MAP_LOD_MAX_DEPTH = int(os.getenv("MAP_LOD_MAX_DEPTH", "3"))
+MAP_LOD_MAX_NODES = int(os.getenv("MAP_LOD_MAX_NODES", "200"))
+
+# ── Structured output ────────────────────────────────────────────────
+# Bind each node's response schema (agent/schemas.py) as a forced tool so
+# Claude returns structured tool input instead of free-text JSON.
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# ── Streaming validation ─────────────────────────────────────────────
+# Stream map/expander responses and check each node as it closes; abort and
+# retry as soon as the response is certain to fail validation.
+STREAM_VALIDATION = os.getenv("STREAM_VALIDATION", "true").lower() == "true"
+
+# ── Speculative map generation ───────────────────────────────────────
+# Start map generation in the background when the final confirmation question
+# is asked; the result is used if the answer leaves the constraints unchanged.
+# Unclaimed results are dropped after SPECULATIVE_MAP_TTL seconds.
+SPECULATIVE_MAP_ENABLED = os.getenv("SPECULATIVE_MAP_ENABLED", "true").lower() == "true"
+SPECULATIVE_MAP_TTL = int(os.getenv("SPECULATIVE_MAP_TTL", "600"))
+
+# ── Per-session run serialization ────────────────────────────────────
+# Runs on a thread execute one at a time; node clicks queued behind a run
+# are merged into one multi-node expansion. A new answer or fork cancels the
+# run in flight (its Claude requests are closed and nothing it was computing
+# reaches the checkpoint) unless CANCEL_SUPERSEDED_RUNS is off, then it queues.
+SERIALIZE_SESSION_RUNS = os.getenv("SERIALIZE_SESSION_RUNS", "true").lower() == "true"
+CANCEL_SUPERSEDED_RUNS = os.getenv("CANCEL_SUPERSEDED_RUNS", "true").lower() == "true"
+
+# ── Conversation memory ──────────────────────────────────────────────
+# Keep only the last MESSAGE_WINDOW chat messages in state; older turns are
+# condensed into conversationSummary (capped at MESSAGE_SUMMARY_MAX_CHARS).
+# Set the window to 0 to keep every message.
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", "12"))
+MESSAGE_SUMMARY_MAX_CHARS = int(os.getenv("MESSAGE_SUMMARY_MAX_CHARS", "2000"))
+
+# ── Write-behind persistence ─────────────────────────────────────────
+# Session/snapshot saves are queued and flushed in the background every
+# WRITE_BEHIND_FLUSH_MS (or once WRITE_BEHIND_BATCH writes are waiting),
+# coalescing repeated writes to the same key. Saves wait for room once
+# WRITE_BEHIND_MAX_PENDING writes are queued. The queue is flushed on
+# shutdown; a crash can lose up to one flush interval of writes.
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "500"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
+# ── LLM cassettes ────────────────────────────────────────────────────
+# "record" passes Claude calls through and appends each response (with its
+# latency and token usage) to LLM_CASSETTE_PATH; "replay" serves them back
+# without calling the API, sleeping recorded latency × LLM_CASSETTE_LATENCY_SCALE.
+# Empty (the default) disables cassettes. test_cli.py has --record/--replay flags.
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "").lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "./cassettes/llm.jsonl")
+LLM_CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "1.0"))
+
+# ── Admin and profiling ──────────────────────────────────────────────
+# /admin endpoints need an X-Admin-Token header equal to ADMIN_TOKEN; empty
+# (the default) disables them. A profiled run is either cProfiled or stack-
+# sampled every PROFILE_SAMPLE_INTERVAL_MS; the last PROFILE_MAX_RESULTS
+# profiles are kept in memory.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_RESULTS = int(os.getenv("PROFILE_MAX_RESULTS", "20"))
@@ -6,13 +6,17 @@ Runs the Priya scenario (or a custom scenario) interactively in the terminal.
 Usage:
     python test_cli.py                     # interactive mode
     python test_cli.py --auto              # auto-run Priya scenario
+    python test_cli.py --auto --record cassettes/priya.jsonl
+    python test_cli.py --auto --replay cassettes/priya.jsonl [--latency-scale 0]
 """
 
 from __future__ import annotations
 
+import argparse
 import asyncio
 import json
 import sys
+import time
 from pathlib import Path
 from uuid import uuid4
 
@@ -20,6 +24,7 @@ from uuid import uuid4
 sys.path.insert(0, str(Path(__file__).parent))
 
 from agent.graph import oracle_graph
+from agent.nodes.cassette import use_cassette
 from agent.state import OracleState
 from agent.transitions import update_constraints, create_branch
 
@@ -72,7 +77,7 @@ async def run_interrogation(auto: bool = False):
 
     while True:
         _print_header("Interrogator")
-        result = await aalekh_graph.ainvoke(state, config)
+        result = await oracle_graph.ainvoke(state, config)
 
         question = result.get("currentQuestion", "")
         dimension = result.get("currentTargetDimension", "")
@@ -122,7 +127,7 @@ async def run_interrogation(auto: bool = False):
 
     _print_header("Map Generator")
     state["phase"] = "map_generation"
-    result = await aalekh_graph.ainvoke(state, config)
+    result = await oracle_graph.ainvoke(state, config)
     _print_map_summary(result)
 
     # ── Phase: exploration (expand a node) ───────────────────────────
@@ -143,7 +148,7 @@ async def run_interrogation(auto: bool = False):
                 "phase": "exploration",
                 "expandNodeId": target["id"],
             }
-            expand_result = await aalekh_graph.ainvoke(expand_state, config)
+            expand_result = await oracle_graph.ainvoke(expand_state, config)
             _print_map_summary(expand_result)
         else:
             print("  [No expandable nodes found]")
@@ -163,7 +168,7 @@ async def run_interrogation(auto: bool = False):
             **branch_partial,
             "phase": "fork",
         }
-        fork_result = await aalekh_graph.ainvoke(fork_state, config)
+        fork_result = await oracle_graph.ainvoke(fork_state, config)
         branches = fork_result.get("branches", [])
         print(f"  Branches created: {len(branches)}")
         if branches:
@@ -175,8 +180,33 @@ async def run_interrogation(auto: bool = False):
 
 
 def main():
-    auto = "--auto" in sys.argv
-    asyncio.run(run_interrogation(auto=auto))
+    parser = argparse.ArgumentParser(description="ORACLE CLI test harness")
+    parser.add_argument("--auto", action="store_true", help="auto-play the Priya scenario")
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", metavar="PATH", help="record Claude responses to a cassette")
+    cassette_group.add_argument("--replay", metavar="PATH", help="replay a cassette instead of calling Claude")
+    parser.add_argument(
+        "--latency-scale", type=float, default=1.0,
+        help="multiply recorded latencies on replay (0 = no waiting)",
+    )
+    args = parser.parse_args()
+
+    cassette = None
+    if args.record:
+        cassette = use_cassette(args.record, "record")
+    elif args.replay:
+        cassette = use_cassette(args.replay, "replay", args.latency_scale)
+
+    start = time.monotonic()
+    asyncio.run(run_interrogation(auto=args.auto))
+    if cassette is not None:
+        elapsed = time.monotonic() - start
+        llm = cassette.stats["llm_seconds"]
+        print(f"  Cassette {cassette.mode}: {cassette.stats['recorded']} recorded, "
+              f"{cassette.stats['replayed']} replayed")
+        if cassette.replaying:
+            print(f"  Wall time {elapsed:.2f}s — LLM (replayed) {llm:.2f}s, "
+                  f"ORACLE overhead {elapsed - llm:.2f}s\n")
 
 
 if __name__ == "__main__":
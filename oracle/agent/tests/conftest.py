@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Same layout as test_cli.py: the agent package and config.py live one level up
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,54 @@
+"""Hedged Claude requests: accounting against the hedge-rate cap, and the stats on /metrics."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent.nodes import llm_caller
+from agent.nodes.hedging import HedgePolicy
+from agent import server
+
+
+class _SlowLLM:
+    async def ainvoke(self, messages):
+        await asyncio.sleep(30)
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    policy = HedgePolicy(enabled=True, percentile=50, max_rate=1.0, min_samples=1)
+    policy.record_latency("map_generator", 0.02)
+    monkeypatch.setattr(llm_caller, "hedge_policy", policy)
+    return policy
+
+
+def test_hedge_counts_when_fired_even_if_caller_is_cancelled(policy):
+    async def run():
+        call = asyncio.create_task(
+            llm_caller._hedged_request(_SlowLLM(), [], lambda data: (True, []), "map_generator")
+        )
+        await asyncio.sleep(0.1)  # past the 20 ms hedge delay
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(run())
+    assert policy.stats["calls"] == 1
+    assert policy.stats["hedged"] == 1
+    # The cancelled hedge counts against the cap: a second call may not hedge under 50%
+    policy.max_rate = 0.5
+    policy.stats["calls"] += 1
+    assert not policy.can_hedge()
+
+
+def test_hedge_stats_reach_metrics(monkeypatch):
+    policy = HedgePolicy(enabled=True, percentile=95, max_rate=1.0, min_samples=1)
+    policy.record_latency("expander", 2.0)
+    policy.stats.update(calls=10, hedged=2, hedge_wins=1, primary_wins=1)
+    monkeypatch.setattr(server, "hedge_policy", policy)
+
+    hedging = TestClient(server.app).get("/metrics").json()["llmHedging"]
+    assert hedging["hedgeRate"] == 0.2
+    assert hedging["hedgeWinRate"] == 0.5
+    assert hedging["thresholds"] == {"expander": 2.0}
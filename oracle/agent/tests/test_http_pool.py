@@ -0,0 +1,51 @@
+import asyncio
+
+from agent.nodes import http_pool
+from agent.nodes.llm_caller import PooledChatAnthropic
+
+
+def _fake_send(opened: list):
+    """Stand-in for the network: the first request opens a connection, later ones reuse it."""
+
+    async def handle_async_request(self, request):
+        trace = request.extensions.get("trace")
+        if trace is not None and not opened:
+            await trace("connection.connect_tcp.complete", {})
+        opened.append(request)
+        return http_pool.httpx.Response(200, request=request)
+
+    return handle_async_request
+
+
+def test_warm_up_requests_are_not_counted(monkeypatch):
+    opened: list = []
+    monkeypatch.setattr(http_pool.httpx.AsyncHTTPTransport, "handle_async_request", _fake_send(opened))
+    monkeypatch.setattr(http_pool, "pool_stats", {k: 0 for k in http_pool.pool_stats})
+
+    async def scenario():
+        try:
+            assert await http_pool.warm("https://api.example.com", connections=2) == 2
+            before = http_pool.report()
+            for _ in range(4):
+                await http_pool.get_client().get("https://api.example.com/v1/messages")
+            return before, http_pool.report()
+        finally:
+            await http_pool.close()
+
+    before, after = asyncio.run(scenario())
+    assert (before["requests"], before["warmed"], before["reuseRate"]) == (0, 2, None)
+    assert after["requests"] == 4
+    assert after["connectionsOpened"] == 0  # the warm-up already opened it
+    assert after["reuseRate"] == 1.0
+
+
+def test_llm_sends_through_the_shared_client():
+    async def scenario():
+        try:
+            client = http_pool.get_client()
+            llm = PooledChatAnthropic(model="claude-test", anthropic_api_key="k", http_async_client=client)
+            return llm._async_client._client is client, llm._async_client.timeout == client.timeout
+        finally:
+            await http_pool.close()
+
+    assert asyncio.run(scenario()) == (True, True)
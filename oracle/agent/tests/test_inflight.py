@@ -0,0 +1,88 @@
+"""Per-session run serializer: superseded runs, cancelled Claude calls and merged clicks, as seen on /metrics."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent import inflight
+from agent.nodes import llm_caller
+from agent.server import app
+
+client = TestClient(app)
+
+
+def _inflight_metrics() -> dict:
+    return client.get("/metrics").json()["inflight"]
+
+
+class _SlowLLM:
+    async def ainvoke(self, messages):
+        await asyncio.sleep(30)
+
+
+def test_superseded_call_savings_reach_metrics():
+    for _ in range(5):
+        llm_caller.hedge_policy.record_latency("expander", 4.0)
+    before = _inflight_metrics()
+
+    async def click(input):
+        yield "started"
+        await llm_caller._request(_SlowLLM(), [], lambda data: (True, []), "expander")
+
+    async def answer(input):
+        yield "answered"
+
+    async def run():
+        clicked = inflight.stream(
+            "s-supersede", SimpleNamespace(state={"phase": "exploration", "expandNodeId": "n1"}), click
+        )
+        assert await clicked.__anext__() == "started"
+        await asyncio.sleep(0.05)  # the Claude call is in flight
+        answered = [e async for e in inflight.stream("s-supersede", SimpleNamespace(state={"phase": "interrogation"}), answer)]
+        with pytest.raises(inflight.Superseded):
+            await clicked.__anext__()
+        return answered
+
+    assert asyncio.run(run()) == ["answered"]
+    after = _inflight_metrics()
+    assert after["superseded"] == before["superseded"] + 1
+    assert after["llmCallsCancelled"] == before["llmCallsCancelled"] + 1
+    # Median latency 4 s, cancelled after ~0.05 s
+    assert after["llmSecondsSaved"] - before["llmSecondsSaved"] == pytest.approx(3.95, abs=0.1)
+
+
+def test_merged_clicks_reach_metrics():
+    before = _inflight_metrics()
+    release = asyncio.Event()
+    expanded: list[list[str]] = []
+
+    def click_input(node_id: str) -> SimpleNamespace:
+        return SimpleNamespace(state={"phase": "exploration", "expandNodeId": node_id})
+
+    async def expand(input):
+        expanded.append(input.state.get("expandNodeIds") or [input.state["expandNodeId"]])
+        await release.wait()
+        yield "expanded"
+
+    async def consume(node_id: str):
+        try:
+            return [e async for e in inflight.stream("s-merge", click_input(node_id), expand)]
+        except inflight.Merged:
+            return "merged"
+
+    async def run():
+        first = asyncio.create_task(consume("n1"))
+        await asyncio.sleep(0.01)
+        queued = [asyncio.create_task(consume(n)) for n in ("n2", "n3")]
+        await asyncio.sleep(0.01)
+        assert _inflight_metrics()["queued"] == 2
+        release.set()
+        return await asyncio.gather(first, *queued)
+
+    assert asyncio.run(run()) == [["expanded"], "merged", ["expanded"]]
+    assert expanded == [["n1"], ["n2", "n3"]]
+    after = _inflight_metrics()
+    assert after["merged"] == before["merged"] + 1
+    assert after["queued"] == 0
@@ -0,0 +1,69 @@
+"""Interrogation once the token budget is spent: fixed questions, then the fallback map."""
+
+import asyncio
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+
+from agent import token_budget
+from agent.graph import oracle_graph
+from agent.nodes import interrogator
+
+ALL_COVERED = {d: True for d in ("resources", "timeline", "riskTolerance", "market", "founderContext")}
+
+
+def _run_turns(answers: list[str], state: dict) -> list[dict]:
+    config = {"configurable": {"thread_id": str(uuid4())}}
+
+    async def run() -> list[dict]:
+        results = []
+        for answer in answers:
+            results.append(await oracle_graph.ainvoke(
+                {**state, "messages": [HumanMessage(content=answer, id=str(uuid4()))]}, config
+            ))
+            state.clear()  # later turns continue from the checkpoint
+        return results
+
+    return asyncio.run(run())
+
+
+def test_exhausted_budget_reaches_map_generation(monkeypatch):
+    monkeypatch.setattr(token_budget, "mode", lambda: token_budget.EXHAUSTED)
+    monkeypatch.setattr(interrogator, "SPECULATIVE_MAP_ENABLED", False)
+
+    first, second = _run_turns(
+        ["We are opening a second cafe.", "No, that's everything."],
+        {
+            "phase": "interrogation",
+            "problem": "Expand a coffee shop",
+            "dimensionCoverage": ALL_COVERED,
+            "currentQuestion": "What experience or advantages do you bring to this?",
+            "currentTargetDimension": "founderContext",
+        },
+    )
+
+    assert first["isLastQuestion"] is True
+    assert first["currentTargetDimension"] == "founderContext"
+    assert first["phase"] == "interrogation"
+
+    assert second["phase"] == "exploration"
+    assert second["mapState"]["nodes"]
+
+
+def test_final_answer_without_target_dimension_still_moves_on(monkeypatch):
+    monkeypatch.setattr(token_budget, "mode", lambda: token_budget.EXHAUSTED)
+
+    (result,) = _run_turns(
+        ["Nope"],
+        {
+            "phase": "interrogation",
+            "problem": "Expand a coffee shop",
+            "dimensionCoverage": ALL_COVERED,
+            "currentQuestion": "Is there anything else I should know before I map this out?",
+            "currentTargetDimension": "",
+            "isLastQuestion": True,
+        },
+    )
+
+    assert result["phase"] == "exploration"
+    assert result["mapState"]["nodes"]
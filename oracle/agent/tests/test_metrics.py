@@ -0,0 +1,18 @@
+"""GET /metrics serves the process's reports; GET /health stays the AG-UI endpoint's."""
+
+from fastapi.testclient import TestClient
+
+from agent.server import app
+
+client = TestClient(app)  # not entered: no startup hooks, so no Redis or Claude connections
+
+
+def test_health_is_the_ag_ui_liveness_check():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+def test_metrics_reports_http_pool():
+    llm_http = client.get("/metrics").json()["llmHttp"]
+    assert {"requests", "connectionsOpened", "reuseRate", "meanConnectMs", "warmed"} <= llm_http.keys()
@@ -0,0 +1,22 @@
+"""Redis shard health as reported on /metrics."""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from agent import redis_store
+from agent.server import app
+from agent.shard_ring import ShardRing
+
+client = TestClient(app)
+
+
+def test_unreachable_shard_shows_unhealthy_on_metrics(monkeypatch):
+    ring = ShardRing(["redis://127.0.0.1:1/0", "redis://127.0.0.1:2/0"])
+    monkeypatch.setattr(redis_store, "_ring", ring)
+
+    asyncio.run(ring.check_health(timeout=0.5))
+
+    shards = client.get("/metrics").json()["redisShards"]
+    assert [s["url"] for s in shards] == ["redis://127.0.0.1:1/0", "redis://127.0.0.1:2/0"]
+    assert all(not s["healthy"] and s["failures"] == 1 and s["lastError"] for s in shards)
@@ -0,0 +1,44 @@
+"""Early abort of streamed responses that are already invalid, and its savings on /metrics."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk
+
+from agent.nodes import llm_caller
+from agent.server import app
+from agent.stream_validation import map_stream_validator
+
+NODE = '{"id": "n1", "label": "Option", "depth": 1, "parentId": "root", "x": 10, "y": 20}'
+
+
+class _StreamingLLM:
+    """Streams a map whose second node repeats the first one's id, then would keep going."""
+
+    def __init__(self):
+        self.chunks_sent = 0
+
+    async def astream(self, messages):
+        for piece in ['{"nodes": [', NODE, ", ", NODE, ", "] + [NODE] * 50:
+            self.chunks_sent += 1
+            yield AIMessageChunk(content=piece)
+            await asyncio.sleep(0)
+
+
+def test_invalid_stream_is_aborted_and_savings_reach_metrics(monkeypatch):
+    monkeypatch.setattr(llm_caller, "stream_stats", {"aborted": 0, "seconds_saved": 0.0})
+    for _ in range(5):
+        llm_caller.hedge_policy.record_latency("stream_test", 6.0)
+    llm = _StreamingLLM()
+
+    data, errors = asyncio.run(
+        llm_caller._request(llm, [], lambda data: (True, []), "stream_test", map_stream_validator)
+    )
+
+    assert data == {} and any("n1" in e for e in errors)
+    assert llm.chunks_sent == 4  # closed on the duplicate, not after all 55 chunks
+    streams = TestClient(app).get("/metrics").json()["llmStreams"]
+    assert streams["aborted"] == 1
+    assert streams["secondsSaved"] == pytest.approx(6.0, abs=0.1)
+    assert streams["meanSecondsSaved"] == streams["secondsSaved"]
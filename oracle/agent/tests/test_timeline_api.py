@@ -0,0 +1,57 @@
+"""Timeline snapshot API: ETags per content encoding and conditional GETs."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent import redis_store
+from agent.server import app
+
+client = TestClient(app)
+
+MAP = json.dumps({"nodes": [{"id": f"n{i}", "label": "Option " * 8} for i in range(20)], "edges": []})
+IDENTITY = {"Accept-Encoding": "identity"}
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture(autouse=True)
+def snapshots(monkeypatch):
+    async def load_snapshot_raw(session_id, index):
+        return MAP if index == 0 else None
+
+    async def load_snapshot_range_raw(session_id, start, end):
+        return [(i, MAP) for i in range(start, min(end, 3))]
+
+    monkeypatch.setattr(redis_store, "load_snapshot_raw", load_snapshot_raw)
+    monkeypatch.setattr(redis_store, "load_snapshot_range_raw", load_snapshot_range_raw)
+
+
+@pytest.mark.parametrize("path", ["/sessions/s1/snapshots/0", "/sessions/s1/snapshots/range?start=0&end=3"])
+def test_encodings_get_distinct_etags(path):
+    plain = client.get(path, headers=IDENTITY)
+    zipped = client.get(path, headers=GZIP)
+
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gz"'
+    for response in (plain, zipped):
+        assert "Accept-Encoding" in response.headers["vary"]
+
+    # A tag only matches the representation it was issued for
+    assert client.get(path, headers={**IDENTITY, "If-None-Match": plain.headers["etag"]}).status_code == 304
+    assert client.get(path, headers={**GZIP, "If-None-Match": zipped.headers["etag"]}).status_code == 304
+    assert client.get(path, headers={**GZIP, "If-None-Match": plain.headers["etag"]}).status_code == 200
+    assert client.get(path, headers={**IDENTITY, "If-None-Match": zipped.headers["etag"]}).status_code == 200
+
+
+def test_weak_validator_matches():
+    etag = client.get("/sessions/s1/snapshots/0", headers=IDENTITY).headers["etag"]
+    response = client.get("/sessions/s1/snapshots/0", headers={**IDENTITY, "If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+
+
+def test_gzipped_body_decodes_to_the_snapshot():
+    response = client.get("/sessions/s1/snapshots/0", headers=GZIP)
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(response.content) == json.loads(MAP)  # decoded by the client
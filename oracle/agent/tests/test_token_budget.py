@@ -0,0 +1,27 @@
+"""Token accounting as reported on /metrics and per session."""
+
+import contextvars
+
+from fastapi.testclient import TestClient
+
+from agent import token_budget
+from agent.server import app
+
+client = TestClient(app)
+
+
+def test_recorded_usage_reaches_metrics_and_session_usage():
+    def call():
+        token_budget.bind("s-tokens")
+        token_budget.record("map_generator", 1200, 800)
+
+    contextvars.copy_context().run(call)
+
+    tokens = client.get("/metrics").json()["tokens"]
+    node = tokens["nodes"]["map_generator"]
+    assert node["calls"] >= 1 and node["outputTokens"] >= 800
+    assert {"maxTokens", "p99Output"} <= node.keys()
+    assert {"truncated", "degradedCalls", "exhaustedCalls"} <= tokens.keys()
+
+    usage = client.get("/sessions/s-tokens/usage").json()
+    assert usage["total"] == {"calls": 1, "inputTokens": 1200, "outputTokens": 800}
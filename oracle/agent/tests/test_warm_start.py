@@ -0,0 +1,45 @@
+"""Warm start hit rate as reported on /metrics."""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from agent import warm_start
+from agent.server import app
+
+client = TestClient(app)
+
+CONSTRAINTS = [
+    {"dimension": "market", "type": "shaper", "value": "Gen Z shoppers who buy online"},
+    {"dimension": "resources", "type": "shaper", "value": "$50,000 and a solo founder"},
+]
+MAP = {
+    "nodes": [
+        {"id": "root", "label": "Sustainable fashion brand", "depth": 0, "parentId": None, "x": 50, "y": 50},
+        {"id": "d2c", "label": "Direct to consumer", "depth": 1, "parentId": "root", "x": 30, "y": 40},
+    ],
+    "edges": [{"sourceId": "root", "targetId": "d2c"}],
+}
+
+
+def test_hit_rate_reaches_metrics(monkeypatch, tmp_path):
+    monkeypatch.setattr(warm_start, "WARM_START_ENABLED", True)
+    monkeypatch.setattr(warm_start, "WARM_START_DIR", str(tmp_path))
+    monkeypatch.setattr(warm_start, "_indexes", {})
+    monkeypatch.setattr(warm_start, "_index_locks", {})
+    monkeypatch.setattr(warm_start, "_recent", type(warm_start._recent)())
+    monkeypatch.setattr(warm_start, "warm_start_stats", dict.fromkeys(warm_start.warm_start_stats, 0))
+
+    async def run():
+        await warm_start.record("A sustainable fashion brand for Gen Z", CONSTRAINTS, MAP)
+        hit = await warm_start.find("A sustainable fashion brand for Gen Z shoppers", CONSTRAINTS)
+        miss = await warm_start.find("Opening a dental clinic", [])
+        return hit, miss
+
+    hit, miss = asyncio.run(run())
+    assert hit is not None and miss is None
+
+    report = client.get("/metrics").json()["warmStart"]
+    assert report["recorded"] == 1 and report["maps"] == 1
+    assert report["queries"] == 2 and report["hits"] == 1
+    assert report["hitRate"] == 0.5